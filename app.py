@@ -2,192 +2,3625 @@
 from flask import Flask, request, jsonify, render_template
 import os
 import base64
-import difflib
 import urllib.parse
 import html
+import hashlib
+import ijson
+import heapq
+import codecs
+import copy
+import csv
+import cProfile
+import functools
+import inspect
+import io
+import difflib
+import itertools
+import json
+import multiprocessing
+import pstats
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager, nullcontext
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import speech_recognition as sr
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, g, has_request_context, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import PyPDF2
 from sumy.parsers.plaintext import PlaintextParser
 from sumy.nlp.tokenizers import Tokenizer
 from sumy.summarizers.lsa import LsaSummarizer
 from deep_translator import GoogleTranslator
-from transformers import pipeline
 from werkzeug.utils import secure_filename
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+from pdf_worker import extract_pdf_page_range
+
+class UploadRequest(Request):
+    """Request whose uploaded files are kept in memory up to UPLOAD_SPOOL_BYTES.
+
+    Larger files roll over to an anonymous temporary file in UPLOAD_FOLDER,
+    so concurrent uploads never share a path.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_BYTES'], dir=app.config['UPLOAD_FOLDER'])
+
+app = Flask(__name__)
+app.request_class = UploadRequest
+CORS(app)  # Enable CORS for all routes
+
+UPLOAD_FOLDER = "./uploads"
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['UPLOAD_SPOOL_BYTES'] = int(os.environ.get("DOCGPT_UPLOAD_SPOOL_BYTES", 16 * 1024 * 1024))
+ALLOWED_EXTENSIONS = {'pdf', 'txt', 'json', 'xml', 'html', 'csv', 'md'}
+
+# Extracted text is cached on disk keyed by the content hash of the upload
+DOCUMENT_CACHE_FOLDER = os.environ.get("DOCGPT_DOCUMENT_CACHE", "./document_cache")
+app.config['DOCUMENT_CACHE_FOLDER'] = DOCUMENT_CACHE_FOLDER
+app.config['DOCUMENT_CACHE_MAX_BYTES'] = int(os.environ.get("DOCGPT_DOCUMENT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+app.config['DOCUMENT_CACHE_MAX_DOCUMENTS'] = int(os.environ.get("DOCGPT_DOCUMENT_CACHE_MAX_DOCUMENTS", 1000))
+# Upper bound on the pages extracted from a single PDF (0 for no limit)
+app.config['PDF_MAX_PAGES'] = int(os.environ.get("DOCGPT_PDF_MAX_PAGES", 2000))
+# PDFs with at least this many pages are extracted across a process pool
+app.config['PDF_PARALLEL_MIN_PAGES'] = int(os.environ.get("DOCGPT_PDF_PARALLEL_MIN_PAGES", 64))
+app.config['PDF_PARALLEL_BATCH_PAGES'] = int(os.environ.get("DOCGPT_PDF_PARALLEL_BATCH_PAGES", 16))
+app.config['PDF_WORKERS'] = int(os.environ.get("DOCGPT_PDF_WORKERS", os.cpu_count() or 1))
+# How PDF worker processes are started: "fork", "forkserver" or "spawn" (empty for the platform default)
+app.config['PDF_START_METHOD'] = os.environ.get("DOCGPT_PDF_START_METHOD", "")
+# Text, CSV, JSON, XML, HTML and Markdown files are split into pages of about this many characters
+app.config['TEXT_PAGE_CHARS'] = int(os.environ.get("DOCGPT_TEXT_PAGE_CHARS", 100000))
+
+# Questions are answered over overlapping windows of the document in batches
+app.config['QA_WINDOW_WORDS'] = int(os.environ.get("DOCGPT_QA_WINDOW_WORDS", 200))
+app.config['QA_WINDOW_OVERLAP'] = int(os.environ.get("DOCGPT_QA_WINDOW_OVERLAP", 50))
+app.config['QA_BATCH_SIZE'] = int(os.environ.get("DOCGPT_QA_BATCH_SIZE", 16))
+app.config['QA_TOP_K'] = int(os.environ.get("DOCGPT_QA_TOP_K", 4))
+app.config['PASSAGE_INDEX_CACHE_SIZE'] = int(os.environ.get("DOCGPT_PASSAGE_INDEX_CACHE_SIZE", 32))
+
+# Keyword search uses a positional index per document
+app.config['SEARCH_INDEX_CACHE_SIZE'] = int(os.environ.get("DOCGPT_SEARCH_INDEX_CACHE_SIZE", 32))
+app.config['SEARCH_SNIPPET_CHARS'] = int(os.environ.get("DOCGPT_SEARCH_SNIPPET_CHARS", 80))
+app.config['SEARCH_MAX_HITS'] = int(os.environ.get("DOCGPT_SEARCH_MAX_HITS", 100))
+app.config['SEARCH_FUZZY_CUTOFF'] = float(os.environ.get("DOCGPT_SEARCH_FUZZY_CUTOFF", 0.6))
+
+# Long texts are summarized section by section, then the section summaries are summarized
+app.config['SUMMARY_LSA_MAX_CHARS'] = int(os.environ.get("DOCGPT_SUMMARY_LSA_MAX_CHARS", 100000))
+app.config['SUMMARY_SECTION_CHARS'] = int(os.environ.get("DOCGPT_SUMMARY_SECTION_CHARS", 20000))
+app.config['SUMMARY_WORKERS'] = int(os.environ.get("DOCGPT_SUMMARY_WORKERS", os.cpu_count() or 1))
+
+# Regions without unique common lines are diffed with Myers' algorithm up to this many edits
+app.config['DIFF_MAX_EDITS'] = int(os.environ.get("DOCGPT_DIFF_MAX_EDITS", 1000))
+
+# Uploads are encoded and decoded in chunks of this many bytes (a multiple of 3 for base64)
+app.config['CODEC_CHUNK_SIZE'] = int(os.environ.get("DOCGPT_CODEC_CHUNK_SIZE", 3 * 64 * 1024))
+
+# Batch endpoints share one worker pool; codec items are grouped into tasks of this size
+app.config['BATCH_WORKERS'] = int(os.environ.get("DOCGPT_BATCH_WORKERS", 8))
+app.config['BATCH_CHUNK_SIZE'] = int(os.environ.get("DOCGPT_BATCH_CHUNK_SIZE", 256))
+app.config['BATCH_MAX_ITEMS'] = int(os.environ.get("DOCGPT_BATCH_MAX_ITEMS", 100000))
+
+# Texts are translated in sentence-aligned chunks that fit the provider's request limit
+app.config['TRANSLATION_BACKEND'] = os.environ.get("DOCGPT_TRANSLATION_BACKEND", "google")
+app.config['TRANSLATION_CHUNK_CHARS'] = int(os.environ.get("DOCGPT_TRANSLATION_CHUNK_CHARS", 4500))
+app.config['TRANSLATION_WORKERS'] = int(os.environ.get("DOCGPT_TRANSLATION_WORKERS", 8))
+app.config['TRANSLATION_MEMORY_SIZE'] = int(os.environ.get("DOCGPT_TRANSLATION_MEMORY_SIZE", 10000))
+
+# Audio is transcribed in segments that are recognized concurrently
+app.config['SPEECH_BACKEND'] = os.environ.get("DOCGPT_SPEECH_BACKEND", "google")
+app.config['SPEECH_LANGUAGE'] = os.environ.get("DOCGPT_SPEECH_LANGUAGE", "en-US")
+app.config['SPEECH_SEGMENT_SECONDS'] = float(os.environ.get("DOCGPT_SPEECH_SEGMENT_SECONDS", 30))
+app.config['SPEECH_SILENCE_SPLIT'] = os.environ.get("DOCGPT_SPEECH_SILENCE_SPLIT", "1") == "1"
+app.config['SPEECH_WORKERS'] = int(os.environ.get("DOCGPT_SPEECH_WORKERS", 4))
+
+# Summaries and answers are memoized per document, operation and parameters
+app.config['RESULT_CACHE_SIZE'] = int(os.environ.get("DOCGPT_RESULT_CACHE_SIZE", 1024))
+app.config['RESULT_CACHE_PERSIST'] = os.environ.get("DOCGPT_RESULT_CACHE_PERSIST", "1") == "1"
+
+# A corpus groups cached documents so questions and summaries run across all of them
+app.config['CORPUS_FOLDER'] = os.environ.get("DOCGPT_CORPUS_FOLDER", "./corpora")
+app.config['CORPUS_MAX_DOCUMENTS'] = int(os.environ.get("DOCGPT_CORPUS_MAX_DOCUMENTS", 200))
+app.config['CORPUS_INDEX_CACHE_SIZE'] = int(os.environ.get("DOCGPT_CORPUS_INDEX_CACHE_SIZE", 8))
+app.config['CORPUS_WORKERS'] = int(os.environ.get("DOCGPT_CORPUS_WORKERS", os.cpu_count() or 1))
+# Passages read by the QA model per question, answers returned per question and passages in a focused summary
+app.config['CORPUS_TOP_K'] = int(os.environ.get("DOCGPT_CORPUS_TOP_K", 8))
+app.config['CORPUS_ANSWERS'] = int(os.environ.get("DOCGPT_CORPUS_ANSWERS", 3))
+app.config['CORPUS_SUMMARY_PASSAGES'] = int(os.environ.get("DOCGPT_CORPUS_SUMMARY_PASSAGES", 20))
+
+# Long-running operations can be submitted as background jobs
+app.config['JOB_WORKERS'] = int(os.environ.get("DOCGPT_JOB_WORKERS", 4))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get("DOCGPT_JOB_QUEUE_SIZE", 64))
+app.config['JOB_TIMEOUT'] = float(os.environ.get("DOCGPT_JOB_TIMEOUT", 600))
+app.config['JOB_RETENTION'] = float(os.environ.get("DOCGPT_JOB_RETENTION", 3600))
+# Job state is kept on disk so any serving process can report on a job
+app.config['JOB_FOLDER'] = os.environ.get("DOCGPT_JOB_FOLDER", "./jobs")
+
+# Models are loaded on first use ("lazy") or when the app is imported ("eager")
+app.config['MODEL_LOADING'] = os.environ.get("DOCGPT_MODEL_LOADING", "lazy")
+app.config['MODEL_WARMUP'] = os.environ.get("DOCGPT_MODEL_WARMUP", "1") == "1"
+# A model that failed to load is tried again after this many seconds, doubling per failure up to an hour
+app.config['MODEL_RETRY_SECONDS'] = float(os.environ.get("DOCGPT_MODEL_RETRY_SECONDS", 30))
+app.config['QA_MODEL_NAME'] = os.environ.get("DOCGPT_QA_MODEL", "distilbert-base-uncased-distilled-squad")
+# Number of intra-op threads torch may use per process (0 keeps the torch default)
+app.config['TORCH_THREADS'] = int(os.environ.get("DOCGPT_TORCH_THREADS", 0))
+app.config['TORCH_INFERENCE_MODE'] = os.environ.get("DOCGPT_TORCH_INFERENCE_MODE", "1") == "1"
+
+# Request and stage timings are exported on /metrics
+app.config['METRICS_ENABLED'] = os.environ.get("DOCGPT_METRICS", "1") == "1"
+# Per-request cProfile sampling; the rate can be changed at runtime through /debug/profiling
+app.config['PROFILING_CONTROL'] = os.environ.get("DOCGPT_PROFILING_CONTROL", "0") == "1"
+app.config['PROFILING_SAMPLE_RATE'] = float(os.environ.get("DOCGPT_PROFILING_SAMPLE_RATE", 0))
+app.config['PROFILING_HISTORY'] = int(os.environ.get("DOCGPT_PROFILING_HISTORY", 20))
+
+# ===== Metrics =====
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+class MetricCounter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+class MetricHistogram:
+    """Histogram of observed values in cumulative buckets, with optional labels."""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+class MetricGauge:
+    """Value read from a callback when metrics are collected.
+
+    The callback returns a number, or a dict from label value tuples to
+    numbers. Counters kept elsewhere, such as cache hits, are exported the
+    same way with kind="counter".
+    """
+
+    def __init__(self, name, help, callback, labels=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {float(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(MetricCounter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(MetricHistogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, callback, labels=(), kind="gauge"):
+        return self._add(MetricGauge(name, help, callback, labels, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+request_count = metrics.counter("docgpt_requests_total", "HTTP requests by endpoint, method and status.", ("endpoint", "method", "status"))
+request_duration = metrics.histogram("docgpt_request_duration_seconds", "Time to produce a response, by endpoint.", ("endpoint",))
+stage_duration = metrics.histogram("docgpt_stage_duration_seconds", "Time spent in each processing stage.", ("stage",))
+stage_errors = metrics.counter("docgpt_stage_errors_total", "Exceptions raised by each processing stage.", ("stage",))
+model_inferences = metrics.counter("docgpt_model_inferences_total", "Inputs run through each model.", ("model",))
+
+def record_stage(stage, seconds):
+    """Record the duration of a stage, and add it to the current request's timings if any."""
+    stage_duration.observe(seconds, stage=stage)
+    if has_request_context():
+        timings = g.setdefault("stage_timings", {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+def timed_stage(stage):
+    """Decorator timing every call of a function as a stage.
+
+    For generator functions only the time spent producing items is
+    counted, not the time the consumer spends between them.
+    """
+    def decorate(func):
+        if not app.config['METRICS_ENABLED']:
+            return func
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                elapsed = 0.0
+                generator = func(*args, **kwargs)
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                except Exception:
+                    stage_errors.inc(stage=stage)
+                    raise
+                finally:
+                    generator.close()
+                    record_stage(stage, elapsed)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                stage_errors.inc(stage=stage)
+                raise
+            finally:
+                record_stage(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that records serialization time as a stage."""
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_stage("json_serialize", time.perf_counter() - start)
+
+if app.config['METRICS_ENABLED']:
+    app.json = TimedJSONProvider(app)
+
+class RequestProfiler:
+    """Opt-in cProfile sampling of whole requests.
+
+    A sampled request runs under cProfile and the functions with the most
+    cumulative time are kept in a short history. Only one request is
+    profiled at a time, and work handed to pool threads is not included.
+    """
+
+    def __init__(self, sample_rate, history):
+        self.sample_rate = sample_rate
+        self.profiles = deque(maxlen=history)
+        self._active = threading.Lock()
+
+    def start(self):
+        """Return a running profiler if this request is sampled, else None."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def finish(self, profiler, endpoint, seconds, limit=25):
+        profiler.disable()
+        self._active.release()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+        self.profiles.append({
+            "endpoint": endpoint,
+            "duration": seconds,
+            "finished_at": time.time(),
+            "stats": output.getvalue(),
+        })
+
+request_profiler = RequestProfiler(app.config['PROFILING_SAMPLE_RATE'], app.config['PROFILING_HISTORY'])
+
+# ===== Model Registry =====
+
+class ModelRegistry:
+    """Thread-safe registry of models that are loaded once and shared.
+
+    Each model is loaded under its own lock the first time it is requested
+    (or up front by ``load_all``). A model that fails to load is reported as
+    unavailable and loaded again by the first request after a backoff of
+    ``retry_seconds``, doubled after every further failure up to
+    ``MAX_RETRY_SECONDS``; ``load_all`` retries at once.
+    """
+
+    MAX_RETRY_SECONDS = 3600
+
+    def __init__(self, retry_seconds):
+        self.retry_seconds = retry_seconds
+        self._loaders = {}
+        self._warmups = {}
+        self._models = {}
+        self._errors = {}
+        self._locks = {}
+
+    def register(self, name, loader, warmup=None):
+        self._loaders[name] = loader
+        self._warmups[name] = warmup
+        self._locks[name] = threading.Lock()
+
+    def _retry_due(self, name):
+        error = self._errors.get(name)
+        return error is None or time.time() >= error["retry_at"]
+
+    def get(self, name):
+        """Return a loaded model, loading it if needed; None if it failed to load."""
+        model = self._models.get(name)
+        if model is not None or not self._retry_due(name):
+            return model
+        with self._locks[name]:
+            if name not in self._models and self._retry_due(name):
+                try:
+                    self._models[name] = self._loaders[name]()
+                    self._errors.pop(name, None)
+                except Exception as e:
+                    print(f"Error loading {name} model: {e}")
+                    failures = self._errors.get(name, {}).get("failures", 0) + 1
+                    delay = min(self.retry_seconds * 2 ** (failures - 1), self.MAX_RETRY_SECONDS)
+                    self._errors[name] = {"message": str(e), "failures": failures, "retry_at": time.time() + delay}
+        return self._models.get(name)
+
+    def load_all(self, warmup=True):
+        """Load every registered model and optionally run its warmup step."""
+        for name in self._loaders:
+            if name in self._errors:
+                self._errors[name]["retry_at"] = 0
+            model = self.get(name)
+            if model is not None and warmup and self._warmups[name]:
+                try:
+                    self._warmups[name](model)
+                except Exception as e:
+                    print(f"Error warming up {name} model: {e}")
+
+    def status(self):
+        """Return the load state of every registered model."""
+        states = {}
+        for name in self._loaders:
+            if name in self._models:
+                states[name] = "loaded"
+            elif name in self._errors:
+                states[name] = f"failed: {self._errors[name]['message']}"
+            else:
+                states[name] = "not_loaded"
+        return states
+
+    def ready(self):
+        """Whether requests can be served: nothing failed and, when eager, everything is loaded."""
+        if self._errors:
+            return False
+        return app.config['MODEL_LOADING'] != "eager" or len(self._models) == len(self._loaders)
+
+def load_qa_model():
+    from transformers import pipeline
+    if app.config['TORCH_THREADS'] > 0:
+        import torch
+        torch.set_num_threads(app.config['TORCH_THREADS'])
+    return pipeline("question-answering", model=app.config['QA_MODEL_NAME'])
+
+def warmup_qa_model(model):
+    with model_inference():
+        model(question="What is this?", context="This is a warmup request.")
+
+def warmup_summarizer(summarizer):
+    parser = PlaintextParser.from_string("This is a warmup. It has two sentences.", model_registry.get("sentence_tokenizer"))
+    summarizer(parser.document, 1)
+
+model_registry = ModelRegistry(retry_seconds=app.config['MODEL_RETRY_SECONDS'])
+model_registry.register("qa", load_qa_model, warmup_qa_model)
+model_registry.register("sentence_tokenizer", lambda: Tokenizer("english"))
+model_registry.register("summarizer", LsaSummarizer, warmup_summarizer)
+
+def get_qa_model():
+    """Return the shared question-answering pipeline, or None if it failed to load."""
+    return model_registry.get("qa")
+
+def model_inference():
+    """Context for model calls: torch.inference_mode() when enabled."""
+    if not app.config['TORCH_INFERENCE_MODE']:
+        return nullcontext()
+    try:
+        import torch
+    except ImportError:
+        return nullcontext()
+    return torch.inference_mode()
+
+# ===== Utility Functions =====
+
+def allowed_file(filename):
+    """Check if the uploaded file is allowed."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+@contextmanager
+def atomic_write(path, mode="w", **kwargs):
+    """Open a uniquely named temporary file next to path and move it over path on success.
+
+    Readers never see a partly written file, and concurrent writers, in this
+    or another process, never share a temporary file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def get_pdf_pool():
+    """Return the process pool used for parallel PDF extraction, creating it on first use.
+
+    Workers are started with PDF_START_METHOD. "forkserver" avoids forking
+    this threaded process, which may hold torch's locks, but workers then
+    import the main module, so it must be safe to import.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            context = None
+            if app.config['PDF_START_METHOD']:
+                context = multiprocessing.get_context(app.config['PDF_START_METHOD'])
+                if app.config['PDF_START_METHOD'] == "forkserver":
+                    context.set_forkserver_preload(["pdf_worker"])
+            _pdf_pool = ProcessPoolExecutor(max_workers=app.config['PDF_WORKERS'], mp_context=context)
+        return _pdf_pool
+
+def discard_pdf_pool(pool):
+    """Forget a broken PDF pool so the next large PDF starts a new one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def iter_reader_pages(reader, first_page, last_page):
+    """Yield (page_number, text) for pages first_page..last_page of an open PdfReader."""
+    for page_number in range(first_page, last_page + 1):
+        yield page_number, reader.pages[page_number - 1].extract_text() + "\n"
+
+def iter_pdf_pages_parallel(pdf_path, first_page, last_page):
+    """Yield (page_number, text) in order while batches of pages are extracted in parallel.
+
+    Only a bounded number of batches is in flight so memory stays
+    proportional to the number of workers, not to the document. If a worker
+    dies (for example killed for using too much memory), the pool is
+    discarded and the remaining pages are extracted in this process.
+    """
+    batch_pages = app.config['PDF_PARALLEL_BATCH_PAGES']
+    max_in_flight = 2 * app.config['PDF_WORKERS']
+    pool = get_pdf_pool()
+    batches = iter(range(first_page, last_page + 1, batch_pages))
+    in_flight = []
+    next_page = first_page
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                start = next(batches, None)
+                if start is None:
+                    break
+                stop = min(start + batch_pages - 1, last_page)
+                in_flight.append((start, pool.submit(extract_pdf_page_range, pdf_path, start, stop)))
+            if not in_flight:
+                return
+            start, future = in_flight.pop(0)
+            for offset, text in enumerate(future.result()):
+                yield start + offset, text
+                next_page = start + offset + 1
+    except BrokenProcessPool as e:
+        print(f"PDF worker pool failed ({e}); extracting pages {next_page}-{last_page} in-process")
+        discard_pdf_pool(pool)
+        with open(pdf_path, "rb") as file:
+            yield from iter_reader_pages(PyPDF2.PdfReader(file), next_page, last_page)
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+def spool_stream(stream, suffix=""):
+    """Copy a binary stream to a uniquely named file in UPLOAD_FOLDER and return its path."""
+    with tempfile.NamedTemporaryFile(dir=app.config['UPLOAD_FOLDER'], suffix=suffix, delete=False) as file:
+        stream.seek(0)
+        shutil.copyfileobj(stream, file)
+        return file.name
+
+@timed_stage("pdf_extract")
+def iter_pdf_pages(pdf, first_page=1, max_pages=None, details=None):
+    """Yield (page_number, text) for the pages of a PDF one at a time.
+
+    The PDF is a file path or a seekable binary stream such as an upload.
+    If a details dict is given, the number of pages in the whole PDF is
+    stored in it as "pages_total".
+    Large PDFs are fanned out to a process pool since PyPDF2 extraction is
+    CPU-bound; small ones stay in-process to avoid the pool overhead. The
+    pool workers open the file themselves, so only a large streamed PDF is
+    written to disk.
+    """
+    spooled_path = None
+    try:
+        with (open(pdf, "rb") if isinstance(pdf, str) else nullcontext(pdf)) as file:
+            file.seek(0)
+            reader = PyPDF2.PdfReader(file)
+            last_page = len(reader.pages)
+            if details is not None:
+                details["pages_total"] = last_page
+            if max_pages:
+                last_page = min(last_page, first_page - 1 + max_pages)
+            parallel = (
+                app.config['PDF_WORKERS'] > 1
+                and last_page - first_page + 1 >= app.config['PDF_PARALLEL_MIN_PAGES']
+            )
+            if not parallel:
+                yield from iter_reader_pages(reader, first_page, last_page)
+            elif not isinstance(pdf, str):
+                pdf = spooled_path = spool_stream(file, ".pdf")
+        if parallel:
+            yield from iter_pdf_pages_parallel(pdf, first_page, last_page)
+    finally:
+        if spooled_path and os.path.exists(spooled_path):
+            os.remove(spooled_path)
+
+def extract_text_from_pdf(pdf_path):
+    """Extract text from a PDF file."""
+    return "".join(text for _, text in iter_pdf_pages(pdf_path))
+
+SUMMARY_METHODS = ("auto", "lsa", "hierarchical")
+
+@timed_stage("summarize")
+def summarize_text(text, num_sentences=5, method="auto"):
+    """Summarize the given text.
+
+    "lsa" runs the LSA summarizer over the whole text. "hierarchical"
+    summarizes sections in parallel and then summarizes their summaries,
+    which keeps every SVD small on book-length texts. "auto" picks LSA for
+    texts up to SUMMARY_LSA_MAX_CHARS characters.
+    """
+    if method == "auto":
+        method = "lsa" if len(text) <= app.config['SUMMARY_LSA_MAX_CHARS'] else "hierarchical"
+    if method == "hierarchical":
+        return summarize_hierarchical(text, num_sentences)
+    return summarize_lsa(text, num_sentences)
+
+def summarize_lsa(text, num_sentences=5):
+    """Summarize the given text using LSA summarizer."""
+    tokenizer = model_registry.get("sentence_tokenizer")
+    summarizer = model_registry.get("summarizer")
+    if tokenizer is None or summarizer is None:
+        raise RuntimeError("Summarizer failed to initialize!")
+    parser = PlaintextParser.from_string(text, tokenizer)
+    summary = summarizer(parser.document, num_sentences)
+    model_inferences.inc(model="summarizer")
+    return " ".join(str(sentence) for sentence in summary)
+
+WORD_PATTERN = re.compile(r"\S+")
+
+def split_into_windows(text, window_words=None, overlap_words=None):
+    """Split text into overlapping windows of words.
+
+    Returns a list of (start, end) character offsets into the text.
+    """
+    window_words = window_words or app.config['QA_WINDOW_WORDS']
+    overlap_words = app.config['QA_WINDOW_OVERLAP'] if overlap_words is None else overlap_words
+    words = [(match.start(), match.end()) for match in WORD_PATTERN.finditer(text)]
+    step = max(1, window_words - overlap_words)
+    windows = []
+    for first in range(0, len(words), step):
+        last = min(first + window_words, len(words)) - 1
+        windows.append((words[first][0], words[last][1]))
+        if last == len(words) - 1:
+            break
+    return windows
+
+@timed_stage("qa_inference")
+def run_qa_model(questions, contexts):
+    """Run (question, context) pairs through the QA pipeline in padded batches; one prediction per pair."""
+    with model_inference():
+        predictions = get_qa_model()(question=questions, context=contexts, batch_size=app.config['QA_BATCH_SIZE'])
+    model_inferences.inc(len(questions), model="qa")
+    if isinstance(predictions, dict):
+        predictions = [predictions]
+    return predictions
+
+def answer_questions(questions, context, index=None):
+    """Answer several questions about a context in one batched pass.
+
+    The context is split once into overlapping windows and every
+    (question, window) pair goes through the QA pipeline in padded batches.
+    With a passage index only the top-k windows retrieved for each question
+    are read. The best-scoring span per question wins; its offsets are
+    reported relative to the full context along with the window it came from.
+    """
+    windows = index.passages if index is not None else split_into_windows(context)
+
+    pair_questions, pair_contexts, pair_index = [], [], []
+    for question_index, question in enumerate(questions):
+        if index is not None:
+            candidates = index.search(question, app.config['QA_TOP_K'])
+        else:
+            candidates = range(len(windows))
+        for window_index in candidates:
+            start, end = windows[window_index]
+            pair_questions.append(question)
+            pair_contexts.append(context[start:end])
+            pair_index.append((question_index, window_index))
+
+    best = [None] * len(questions)
+    if pair_questions:
+        predictions = run_qa_model(pair_questions, pair_contexts)
+        for (question_index, window_index), prediction in zip(pair_index, predictions):
+            if best[question_index] is None or prediction["score"] > best[question_index][0]["score"]:
+                best[question_index] = (prediction, window_index)
+
+    answers = []
+    for question, match in zip(questions, best):
+        if match is None:
+            answers.append({"question": question, "answer": "", "score": 0.0})
+            continue
+        prediction, window_index = match
+        window_start, window_end = windows[window_index]
+        answers.append({
+            "question": question,
+            "answer": prediction["answer"],
+            "score": float(prediction["score"]),
+            "start": window_start + prediction["start"],
+            "end": window_start + prediction["end"],
+            "chunk": {"index": window_index, "start": window_start, "end": window_end},
+        })
+    return answers
+
+TERM_PATTERN = re.compile(r"\w+")
+
+def tokenize_terms(text):
+    """Lowercase word terms used for retrieval."""
+    return TERM_PATTERN.findall(text.lower())
+
+class PassageIndex:
+    """BM25 index over the QA windows of a single document.
+
+    Postings are stored CSR-style in NumPy arrays: the passages containing
+    term ``t`` are ``passage_ids[term_ptr[t]:term_ptr[t + 1]]`` with matching
+    ``term_freqs``. Scoring a question touches only the postings of its terms.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, passages, terms, term_ptr, passage_ids, term_freqs, passage_lengths):
+        self.passages = [tuple(span) for span in passages]
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        self.terms = terms
+        self.term_ptr = term_ptr
+        self.passage_ids = passage_ids
+        self.term_freqs = term_freqs
+        self.passage_lengths = passage_lengths
+        self.average_length = float(passage_lengths.mean()) if len(passage_lengths) else 0.0
+
+    @classmethod
+    @timed_stage("passage_index_build")
+    def build(cls, text, window_words=None, overlap_words=None):
+        """Split text into QA windows and index their terms."""
+        passages = split_into_windows(text, window_words, overlap_words)
+        postings = {}
+        passage_lengths = np.zeros(len(passages), dtype=np.int32)
+        for passage_id, (start, end) in enumerate(passages):
+            counts = Counter(tokenize_terms(text[start:end]))
+            passage_lengths[passage_id] = sum(counts.values())
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((passage_id, count))
+
+        terms = sorted(postings)
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        passage_ids, term_freqs = [], []
+        for term_id, term in enumerate(terms):
+            for passage_id, count in postings[term]:
+                passage_ids.append(passage_id)
+                term_freqs.append(count)
+            term_ptr[term_id + 1] = len(passage_ids)
+        return cls(
+            passages,
+            terms,
+            term_ptr,
+            np.array(passage_ids, dtype=np.int32),
+            np.array(term_freqs, dtype=np.float32),
+            passage_lengths,
+        )
+
+    def save(self, path):
+        with atomic_write(path, "wb") as file:
+            np.savez(
+                file,
+                passages=np.array(self.passages, dtype=np.int64).reshape(-1, 2),
+                terms=np.array("\n".join(self.terms)),
+                term_ptr=self.term_ptr,
+                passage_ids=self.passage_ids,
+                term_freqs=self.term_freqs,
+                passage_lengths=self.passage_lengths,
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            terms = str(data["terms"])
+            return cls(
+                data["passages"].tolist(),
+                terms.split("\n") if terms else [],
+                data["term_ptr"],
+                data["passage_ids"],
+                data["term_freqs"],
+                data["passage_lengths"],
+            )
+
+    @classmethod
+    def idf(cls, total_passages, document_frequency):
+        return np.log(1.0 + (total_passages - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def document_frequency(self, term):
+        """Number of passages containing a term."""
+        term_id = self.vocabulary.get(term)
+        return 0 if term_id is None else int(self.term_ptr[term_id + 1] - self.term_ptr[term_id])
+
+    def _term_scores(self, term_id, idf, average_length):
+        """Passage ids containing a term and the term's BM25 contribution to each."""
+        lo, hi = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+        ids = self.passage_ids[lo:hi]
+        freqs = self.term_freqs[lo:hi]
+        norm = self.K1 * (1.0 - self.B + self.B * self.passage_lengths[ids] / average_length)
+        return ids, idf * freqs * (self.K1 + 1.0) / (freqs + norm)
+
+    def scores(self, query):
+        """BM25 score of every passage for a query."""
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        if not self.passages:
+            return scores
+        for term in set(tokenize_terms(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            idf = self.idf(len(self.passages), self.term_ptr[term_id + 1] - self.term_ptr[term_id])
+            ids, contributions = self._term_scores(term_id, idf, self.average_length)
+            scores[ids] += contributions
+        return scores
+
+    def top_passages(self, term_idfs, average_length, k):
+        """Return (passage_id, score) of the k best passages containing any of the terms, best first.
+
+        The idf of each term and the average passage length are given, so
+        scores computed against shared statistics compare across indexes.
+        Only the postings of the terms are touched.
+        """
+        id_parts, score_parts = [], []
+        for term, idf in term_idfs.items():
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                ids, contributions = self._term_scores(term_id, idf, average_length)
+                id_parts.append(ids)
+                score_parts.append(contributions)
+        if not id_parts:
+            return []
+        candidates, inverse = np.unique(np.concatenate(id_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return list(zip(candidates[top].tolist(), scores[top].tolist()))
+
+    def search(self, query, k):
+        """Return the ids of the k best passages for a query, best first.
+
+        Passages sharing no term with the query are only returned when
+        nothing matches at all.
+        """
+        scores = self.scores(query)
+        matches = int(np.count_nonzero(scores))
+        if matches:
+            k = min(k, matches)
+        if len(scores) <= k:
+            return np.argsort(-scores, kind="stable").tolist()
+        top = np.argpartition(-scores, k)[:k]
+        return top[np.argsort(-scores[top], kind="stable")].tolist()
+
+class SearchIndex:
+    """Positional inverted index over the words of a single document.
+
+    Every word occurrence is a token numbered by its position in the text,
+    with its character span and page in ``token_starts``, ``token_ends`` and
+    ``token_pages``. The positions of term ``t`` are
+    ``postings[term_ptr[t]:term_ptr[t + 1]]``, in ascending order, so
+    phrases are matched by intersecting shifted position arrays.
+    """
+
+    def __init__(self, terms, term_ptr, postings, token_starts, token_ends, token_pages):
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        self.terms = terms
+        self.term_ptr = term_ptr
+        self.postings = postings
+        self.token_starts = token_starts
+        self.token_ends = token_ends
+        self.token_pages = token_pages
+        self._terms_by_length = None
+
+    @classmethod
+    @timed_stage("search_index_build")
+    def build(cls, pages):
+        """Index the words of (page_number, text) pages."""
+        positions = {}
+        token_starts, token_ends, token_pages = [], [], []
+        offset = 0
+        for page_number, text in pages:
+            for match in TERM_PATTERN.finditer(text):
+                positions.setdefault(match.group().lower(), []).append(len(token_starts))
+                token_starts.append(offset + match.start())
+                token_ends.append(offset + match.end())
+                token_pages.append(page_number)
+            offset += len(text)
+
+        terms = sorted(positions)
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        postings = []
+        for term_id, term in enumerate(terms):
+            postings.extend(positions[term])
+            term_ptr[term_id + 1] = len(postings)
+        return cls(
+            terms,
+            term_ptr,
+            np.array(postings, dtype=np.int32),
+            np.array(token_starts, dtype=np.int64),
+            np.array(token_ends, dtype=np.int64),
+            np.array(token_pages, dtype=np.int32),
+        )
+
+    def save(self, path):
+        with atomic_write(path, "wb") as file:
+            np.savez(
+                file,
+                terms=np.array("\n".join(self.terms)),
+                term_ptr=self.term_ptr,
+                postings=self.postings,
+                token_starts=self.token_starts,
+                token_ends=self.token_ends,
+                token_pages=self.token_pages,
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            terms = str(data["terms"])
+            return cls(
+                terms.split("\n") if terms else [],
+                data["term_ptr"],
+                data["postings"],
+                data["token_starts"],
+                data["token_ends"],
+                data["token_pages"],
+            )
+
+    def expand(self, term, fuzzy=False, cutoff=0.6):
+        """Return the indexed terms a query term matches: itself, or close spellings if fuzzy."""
+        if term in self.vocabulary or not fuzzy:
+            return [term] if term in self.vocabulary else []
+        if self._terms_by_length is None:
+            by_length = {}
+            for candidate in self.terms:
+                by_length.setdefault(len(candidate), []).append(candidate)
+            self._terms_by_length = by_length
+        # A ratio of at least cutoff bounds how much the lengths can differ
+        slack = int(len(term) * (1.0 - cutoff) / cutoff) + 1
+        candidates = [
+            candidate
+            for length in range(max(1, len(term) - slack), len(term) + slack + 1)
+            for candidate in self._terms_by_length.get(length, ())
+        ]
+        return difflib.get_close_matches(term, candidates, n=3, cutoff=cutoff)
+
+    def positions(self, terms):
+        """Sorted token positions of any of the given indexed terms."""
+        arrays = []
+        for term in terms:
+            term_id = self.vocabulary[term]
+            arrays.append(self.postings[self.term_ptr[term_id]:self.term_ptr[term_id + 1]])
+        if not arrays:
+            return np.zeros(0, dtype=np.int32)
+        return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+
+    def match_phrase(self, variants):
+        """Start positions where consecutive tokens match each entry of variants in turn."""
+        matches = self.positions(variants[0])
+        for offset, terms in enumerate(variants[1:], start=1):
+            if not len(matches):
+                break
+            matches = matches[np.isin(matches + offset, self.positions(terms), assume_unique=True)]
+        return matches
+
+_document_indexes = OrderedDict()
+_document_indexes_lock = threading.Lock()
+
+def get_document_index(document, index_class, artifact, build, cache_size):
+    """Return an index of a cached document, building it on first use.
+
+    Indexes are persisted next to the document text in the document store
+    and kept in a small in-memory LRU so repeat queries skip both steps.
+    """
+    key = (artifact, document.document_id)
+    with _document_indexes_lock:
+        index = _document_indexes.get(key)
+        if index is not None:
+            _document_indexes.move_to_end(key)
+            return index
+
+    path = document_store.artifact_path(document.document_id, artifact)
+    try:
+        index = index_class.load(path)
+    except (OSError, ValueError, KeyError):
+        index = build()
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"Error saving {artifact}: {e}")
+
+    with _document_indexes_lock:
+        _document_indexes[key] = index
+        cached = [cached_key for cached_key in _document_indexes if cached_key[0] == artifact]
+        for cached_key in cached[:max(0, len(cached) - cache_size)]:
+            del _document_indexes[cached_key]
+    return index
+
+def get_passage_index(document):
+    """Return the BM25 passage index of a cached document.
+
+    The window size and overlap are part of the artifact name, so changing
+    them builds a new index instead of reusing windows of the old size.
+    """
+    window_words, overlap_words = app.config['QA_WINDOW_WORDS'], app.config['QA_WINDOW_OVERLAP']
+    return get_document_index(
+        document, PassageIndex, f"passages-{window_words}-{overlap_words}.npz",
+        lambda: PassageIndex.build(document.text, window_words, overlap_words),
+        app.config['PASSAGE_INDEX_CACHE_SIZE'],
+    )
+
+def get_search_index(document):
+    """Return the positional search index of a cached document."""
+    return get_document_index(
+        document, SearchIndex, "search.npz",
+        lambda: SearchIndex.build(document.iter_pages()),
+        app.config['SEARCH_INDEX_CACHE_SIZE'],
+    )
+
+def split_into_sections(text, section_chars):
+    """Split text into sections of at most section_chars, cutting at line or sentence ends."""
+    sections = []
+    start = 0
+    while start < len(text):
+        end = min(start + section_chars, len(text))
+        if end < len(text):
+            cut = text.rfind("\n", start, end)
+            if cut <= start:
+                cut = text.rfind(". ", start, end)
+            if cut > start:
+                end = cut + 1
+        sections.append(text[start:end])
+        start = end
+    return sections
+
+_summary_pool = None
+_summary_pool_lock = threading.Lock()
+
+def get_summary_pool():
+    """Return the thread pool used to summarize sections, creating it on first use."""
+    global _summary_pool
+    with _summary_pool_lock:
+        if _summary_pool is None:
+            _summary_pool = ThreadPoolExecutor(max_workers=app.config['SUMMARY_WORKERS'], thread_name_prefix="docgpt-summary")
+        return _summary_pool
+
+def summarize_hierarchical(text, num_sentences=5):
+    """Summarize sections of the text in parallel, then summarize the section summaries."""
+    sections = split_into_sections(text, app.config['SUMMARY_SECTION_CHARS'])
+    summaries = get_summary_pool().map(lambda section: summarize_lsa(section, num_sentences), sections)
+    combined = " ".join(summary for summary in summaries if summary)
+    if len(sections) == 1 or len(combined) >= len(text):
+        return summarize_lsa(combined, num_sentences)
+    return summarize_text(combined, num_sentences)
+
+SPEECH_BACKENDS = {
+    "google": lambda recognizer, audio, language: recognizer.recognize_google(audio, language=language),
+    # Offline engines; they need pocketsphinx or openai-whisper installed
+    "sphinx": lambda recognizer, audio, language: recognizer.recognize_sphinx(audio, language=language),
+    "whisper": lambda recognizer, audio, language: recognizer.recognize_whisper(audio),
+}
+
+def register_speech_backend(name, recognize):
+    """Register a speech backend: recognize(recognizer, audio_data, language) returns the text."""
+    SPEECH_BACKENDS[name] = recognize
+
+# Shared so backends that load a local model only load it once
+_speech_recognizer = sr.Recognizer()
+_speech_pool = None
+_speech_pool_lock = threading.Lock()
+
+def get_speech_pool():
+    """Return the thread pool used to recognize audio segments, creating it on first use."""
+    global _speech_pool
+    with _speech_pool_lock:
+        if _speech_pool is None:
+            _speech_pool = ThreadPoolExecutor(max_workers=app.config['SPEECH_WORKERS'], thread_name_prefix="docgpt-speech")
+        return _speech_pool
+
+SAMPLE_DTYPES = {1: np.uint8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+def quietest_cut(frame_data, sample_rate, sample_width, window_seconds=0.02):
+    """Return the byte offset of the quietest moment in the last fifth of some audio.
+
+    Falls back to the end of the audio for sample widths NumPy cannot read directly.
+    """
+    if sample_width not in SAMPLE_DTYPES:
+        return len(frame_data)
+    samples = np.frombuffer(frame_data, dtype=SAMPLE_DTYPES[sample_width]).astype(np.int64)
+    if sample_width == 1:
+        samples -= 128
+    window = max(1, int(sample_rate * window_seconds))
+    region_start = len(samples) * 4 // 5
+    windows = (len(samples) - region_start) // window
+    if windows < 1:
+        return len(frame_data)
+    energy = np.abs(samples[region_start:region_start + windows * window]).reshape(windows, window).sum(axis=1)
+    cut = region_start + int(np.argmin(energy)) * window + window // 2
+    return cut * sample_width
+
+def iter_audio_segments(audio_file, segment_seconds, split_on_silence=True):
+    """Yield (start_seconds, end_seconds, AudioData) segments of an audio file.
+
+    Only one segment is read into memory at a time. With split_on_silence,
+    each segment ends at the quietest moment of its last fifth instead of
+    the exact duration, so words are less likely to be cut in half.
+    """
+    with sr.AudioFile(audio_file) as source:
+        sample_rate, sample_width = source.SAMPLE_RATE, source.SAMPLE_WIDTH
+        segment_frames = max(1, int(segment_seconds * sample_rate))
+        position = 0
+        pending = b""
+        while True:
+            # Reading the stream directly, unlike recognizer.record(duration=...), drops no frames between segments
+            frame_data = pending + source.stream.read(segment_frames - len(pending) // sample_width)
+            if not frame_data:
+                break
+            cut = len(frame_data)
+            if split_on_silence and len(frame_data) == segment_frames * sample_width:
+                cut = quietest_cut(frame_data, sample_rate, sample_width)
+            frames = cut // sample_width
+            yield position / sample_rate, (position + frames) / sample_rate, sr.AudioData(frame_data[:cut], sample_rate, sample_width)
+            position += frames
+            pending = frame_data[cut:]
+
+@timed_stage("transcribe")
+def transcribe_audio_segments(audio_file):
+    """Transcribe an audio file segment by segment with the configured backend.
+
+    Segments are recognized concurrently while later ones are still being
+    read, with a bounded number in flight. Returns a list of segments with
+    their start and end time in seconds and their text, in order.
+    """
+    recognize = SPEECH_BACKENDS[app.config['SPEECH_BACKEND']]
+    language = app.config['SPEECH_LANGUAGE']
+
+    def recognize_segment(audio):
+        try:
+            model_inferences.inc(model="speech")
+            return recognize(_speech_recognizer, audio, language)
+        except sr.UnknownValueError:
+            return ""  # Silence or nothing intelligible
+
+    pool = get_speech_pool()
+    max_in_flight = 2 * app.config['SPEECH_WORKERS']
+    in_flight = []
+    segments = []
+    segment_stream = iter_audio_segments(audio_file, app.config['SPEECH_SEGMENT_SECONDS'], app.config['SPEECH_SILENCE_SPLIT'])
+    try:
+        for start, end, audio in segment_stream:
+            in_flight.append((start, end, pool.submit(recognize_segment, audio)))
+            if len(in_flight) >= max_in_flight:
+                start, end, future = in_flight.pop(0)
+                segments.append({"start": round(start, 3), "end": round(end, 3), "text": future.result()})
+        for start, end, future in in_flight:
+            segments.append({"start": round(start, 3), "end": round(end, 3), "text": future.result()})
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
+    return segments
+
+def transcribe_audio(audio_file):
+    """Transcribe an audio file path or binary stream with the configured speech backend."""
+    try:
+        segments = transcribe_audio_segments(audio_file)
+        return " ".join(segment["text"] for segment in segments if segment["text"]) or None
+    except Exception as e:
+        print(f"Error during transcription: {e}")
+        return None
+
+# ===== Text Extraction =====
+
+# Bytes read from the start of a text file to decide its encoding
+ENCODING_SAMPLE_BYTES = 64 * 1024
+TEXT_READ_CHARS = 1024 * 1024
+
+def detect_encoding(sample, complete=False):
+    """Return the encoding of a text file from its first bytes.
+
+    A byte order mark wins; otherwise UTF-8 if the sample decodes, latin-1
+    if not. complete says the sample is the whole file, so a multi-byte
+    character cut off at its end is an error rather than the sample limit.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if complete or e.reason != "unexpected end of data":
+            return "latin-1"
+    return "utf-8"
+
+@contextmanager
+def open_text_stream(stream, newline=None):
+    """Wrap a seekable binary stream as text in the encoding detected from a sample.
+
+    The underlying stream is left open.
+    """
+    stream.seek(0)
+    sample = stream.read(ENCODING_SAMPLE_BYTES)
+    stream.seek(0)
+    encoding = detect_encoding(sample, complete=len(sample) < ENCODING_SAMPLE_BYTES)
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline=newline)
+    try:
+        yield text
+    finally:
+        text.detach()
+
+def iter_clean_lines(chunks):
+    """Yield the non-blank lines of text chunks with runs of whitespace collapsed."""
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line = " ".join(line.split())
+            if line:
+                yield line + "\n"
+    line = " ".join(pending.split())
+    if line:
+        yield line + "\n"
+
+def extract_plain_text(stream):
+    with open_text_stream(stream) as text:
+        yield from iter(lambda: text.read(TEXT_READ_CHARS), "")
+
+MARKDOWN_PATTERNS = [
+    (re.compile(r"^\s*(?:```|~~~).*$"), ""),
+    (re.compile(r"^\s{0,3}(?:#{1,6}\s+|>\s?|[-*+]\s+|\d+[.)]\s+)"), ""),
+    (re.compile(r"!?\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"\*\*|__|`"), ""),
+]
+
+def extract_markdown_text(stream):
+    """Markdown without headings, quote and list markers, link targets, emphasis or code fences."""
+    with open_text_stream(stream) as text:
+        for line in text:
+            for pattern, replacement in MARKDOWN_PATTERNS:
+                line = pattern.sub(replacement, line)
+            yield line
+
+def extract_csv_text(stream):
+    """One line per row with the non-empty cells separated by commas.
+
+    The delimiter is sniffed from the start of the file.
+    """
+    with open_text_stream(stream, newline="") as text:
+        sample = text.read(ENCODING_SAMPLE_BYTES)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(text, dialect):
+            cells = [cell.strip() for cell in row if cell.strip()]
+            if cells:
+                yield ", ".join(cells) + "\n"
+
+def _json_line(prefix, value):
+    # The nearest object key labels a value; "item" is how ijson names array elements
+    key = next((part for part in reversed(prefix.split(".")) if part and part != "item"), None)
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    return f"{key}: {value}\n" if key else f"{value}\n"
+
+class UTF8Reader:
+    """Binary reader re-encoding a text stream as UTF-8, for parsers that only read bytes."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def read(self, size=-1):
+        return self.text.read(size).encode("utf-8")
+
+def extract_json_text(stream):
+    """One "key: value" line per string, number or boolean, parsed incrementally with ijson."""
+    with open_text_stream(stream) as text:
+        # UTF-8 bytes go to the parser as they are; other encodings are converted
+        source = stream if text.encoding == "utf-8" else UTF8Reader(text)
+        for prefix, event, value in ijson.parse(source):
+            if event in ("string", "number", "boolean"):
+                yield _json_line(prefix, value)
+
+class XMLTextTarget:
+    """ElementTree parser target keeping only character data, with line breaks around elements."""
+
+    def __init__(self):
+        self.pieces = []
+
+    def start(self, tag, attrib):
+        self.pieces.append("\n")
+
+    def end(self, tag):
+        self.pieces.append("\n")
+
+    def data(self, data):
+        self.pieces.append(data)
+
+    def close(self):
+        pass
+
+    def drain(self):
+        text = "".join(self.pieces)
+        self.pieces.clear()
+        return text
+
+def _iter_xml_chunks(stream):
+    target = XMLTextTarget()
+    parser = ElementTree.XMLParser(target=target)
+    stream.seek(0)
+    # Bytes are fed as they are so the parser honours the encoding declaration
+    for chunk in iter(lambda: stream.read(TEXT_READ_CHARS), b""):
+        parser.feed(chunk)
+        yield target.drain()
+    parser.close()
+    yield target.drain()
+
+def extract_xml_text(stream):
+    """The character data of an XML document, one line per element, without tags or attributes."""
+    return iter_clean_lines(_iter_xml_chunks(stream))
+
+class HTMLTextParser(HTMLParser):
+    """Collects the visible text of an HTML document, breaking lines at block elements."""
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg"}
+    BLOCK_TAGS = {
+        "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+        "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol",
+        "p", "pre", "section", "table", "td", "th", "title", "tr", "ul",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.pieces.append(data)
+
+    def drain(self):
+        text = "".join(self.pieces)
+        self.pieces.clear()
+        return text
+
+def _iter_html_chunks(stream):
+    parser = HTMLTextParser()
+    with open_text_stream(stream) as text:
+        for chunk in iter(lambda: text.read(TEXT_READ_CHARS), ""):
+            parser.feed(chunk)
+            yield parser.drain()
+    parser.close()
+    yield parser.drain()
+
+def extract_html_text(stream):
+    """The visible text of an HTML document, without markup, scripts or styles."""
+    return iter_clean_lines(_iter_html_chunks(stream))
+
+# Extractors by file extension; each takes a seekable binary stream and yields text pieces
+TEXT_EXTRACTORS = {
+    "txt": extract_plain_text,
+    "md": extract_markdown_text,
+    "csv": extract_csv_text,
+    "json": extract_json_text,
+    "xml": extract_xml_text,
+    "html": extract_html_text,
+}
+
+# Bumped when an extractor's output changes, so documents cached with the old text are extracted again
+TEXT_EXTRACTOR_VERSIONS = {"md": 1, "csv": 1, "json": 1, "xml": 1, "html": 1}
+
+def paginate_text(pieces, page_chars):
+    """Pack text pieces into (page_number, text) pages of about page_chars characters.
+
+    Pages are cut at the last line break before the limit when there is one.
+    """
+    page = 1
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size < page_chars:
+            continue
+        text = "".join(buffer)
+        while len(text) >= page_chars:
+            cut = text.rfind("\n", 0, page_chars) + 1 or page_chars
+            yield page, text[:cut]
+            page += 1
+            text = text[cut:]
+        buffer = [text]
+        size = len(text)
+    text = "".join(buffer)
+    if text or page == 1:
+        yield page, text
+
+@timed_stage("extract_text")
+def iter_document_pages(source, filename=None, raw=False, details=None):
+    """Yield (page_number, text) for a document.
+
+    The source is a file path or a seekable binary stream; a stream needs
+    the filename to tell its format. Text formats are paged every
+    TEXT_PAGE_CHARS characters. With raw, or if its format's extractor
+    cannot parse it, a non-PDF file is read as plain text. PDFs are cut to
+    PDF_MAX_PAGES pages; their page count is stored in details, if given.
+    """
+    name = filename or source
+    if name.endswith(".pdf"):
+        yield from iter_pdf_pages(source, max_pages=app.config['PDF_MAX_PAGES'], details=details)
+        return
+    extension = name.rsplit('.', 1)[-1].lower()
+    extractor = extract_plain_text if raw else TEXT_EXTRACTORS.get(extension, extract_plain_text)
+    with (open(source, "rb") if isinstance(source, str) else nullcontext(source)) as stream:
+        pages = paginate_text(extractor(stream), app.config['TEXT_PAGE_CHARS'])
+        yielded = False
+        try:
+            for page in pages:
+                yielded = True
+                yield page
+        except Exception as e:
+            # Pages already handed out cannot be taken back, so only a file that
+            # fails from the start is read again as plain text
+            if yielded or extractor is extract_plain_text:
+                raise
+            print(f"Error extracting {extension} text: {e}")
+            yield from paginate_text(extract_plain_text(stream), app.config['TEXT_PAGE_CHARS'])
+
+# ===== Document Store =====
+
+DOCUMENT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class RequestError(Exception):
+    """Base class for errors reported to the client with an HTTP status code."""
+    status_code = 400
+
+class DocumentNotFoundError(RequestError):
+    """Raised when a request references a document id that is not cached."""
+    status_code = 404
+
+    def __str__(self):
+        return f"Unknown document id: {self.args[0]}"
+
+class DocumentReadError(RequestError):
+    """Raised when the text of an uploaded document cannot be extracted."""
+    status_code = 422
+
+    def __str__(self):
+        return f"Could not read the document: {self.args[0]}"
+
+class RawTextUnavailableError(RequestError):
+    """Raised when an operation needs a file's own text but the document id holds text extracted from it."""
+
+    def __str__(self):
+        return f"Document {self.args[0]} holds the text extracted from a structured file; upload the file itself instead"
+
+class InvalidPageRangeError(RequestError):
+    """Raised when the requested page range is malformed."""
+
+    def __str__(self):
+        return "first_page and max_pages must be positive integers!"
+
+class PageOutOfRangeError(RequestError):
+    """Raised when the requested first page is past the end of the document."""
+
+    def __str__(self):
+        return f"first_page {self.args[0]} is past the last page of the document ({self.args[1]} pages)!"
+
+@timed_stage("upload_hash")
+def hash_stream(stream, filename, chunk_size=1024 * 1024, raw=False):
+    """Return the document id of a binary stream: the SHA-256 of its extension and content.
+
+    With raw the id is that of the file's plain decoded text rather than
+    of the text extracted from its format.
+    """
+    digest = hashlib.sha256()
+    # The extension decides how the bytes are extracted, so it is part of the key,
+    # together with the extractor version once its output has changed
+    extension = filename.rsplit('.', 1)[-1].lower()
+    version = None if raw else TEXT_EXTRACTOR_VERSIONS.get(extension)
+    if version:
+        extension += f"@{version}"
+    # A PDF cut to a different page limit is a different document
+    if extension == "pdf" and app.config['PDF_MAX_PAGES']:
+        extension += f":{app.config['PDF_MAX_PAGES']}"
+    digest.update(extension.encode('utf-8') + b"\0")
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Return the document id of a file."""
+    with open(file_path, "rb") as file:
+        return hash_stream(file, file_path, chunk_size)
+
+class Document:
+    """A cached document whose text is read from the store on demand."""
+
+    def __init__(self, text_path, document_id, filename, page_offsets, length, extracted=False, pages_total=None, page_byte_offsets=None):
+        self.text_path = text_path
+        self.document_id = document_id
+        self.filename = filename
+        self.page_offsets = page_offsets
+        self.length = length
+        # Whether the text was extracted from a structured format rather than decoded as is
+        self.extracted = extracted
+        # Pages in the source file, if known; more than are stored when it was cut to PDF_MAX_PAGES
+        self.pages_total = pages_total
+        # Byte offset at which every page starts in the UTF-8 text file, so a page can be read without the ones before it
+        self.page_byte_offsets = page_byte_offsets
+        self._text = None
+
+    @property
+    def truncated(self):
+        return self.pages_total is not None and self.pages_total > len(self.page_offsets)
+
+    def response_fields(self, suffix=""):
+        """The document id for a response, and the page count if only part of the file was extracted."""
+        fields = {f"document_id{suffix}": self.document_id}
+        if self.truncated:
+            fields[f"truncated{suffix}"] = True
+            fields[f"pages_total{suffix}"] = self.pages_total
+        return fields
+
+    @property
+    def text(self):
+        """The full text of the document."""
+        if self._text is None:
+            with open(self.text_path, "r", encoding="utf-8", newline="") as file:
+                self._text = file.read()
+        return self._text
+
+    def _open_at_page(self, file, page_number):
+        """Return a reader of the text file at the start of a page and the character offset it is at.
+
+        Documents cached without byte offsets are read from the start.
+        """
+        reader = codecs.getreader("utf-8")(file)
+        if self.page_byte_offsets and page_number > 1:
+            reader.seek(self.page_byte_offsets[page_number - 1])
+            return reader, self.page_offsets[page_number - 1]
+        return reader, 0
+
+    def iter_pages(self, first_page=1, max_pages=None):
+        """Yield (page_number, text) for a page range without loading the whole text."""
+        bounds = self.page_offsets + [self.length]
+        last_page = len(self.page_offsets)
+        if max_pages:
+            last_page = min(last_page, first_page - 1 + max_pages)
+        if first_page > last_page:
+            return
+        with open(self.text_path, "rb") as file:
+            reader, position = self._open_at_page(file, first_page)
+            # Reads count characters, matching the stored offsets
+            _read_chars(reader, bounds[first_page - 1] - position)
+            for page_number in range(first_page, last_page + 1):
+                yield page_number, _read_chars(reader, bounds[page_number] - bounds[page_number - 1])
+
+    def page_text(self, first_page=1, max_pages=None):
+        """Return the text of a page range."""
+        if first_page == 1 and not max_pages:
+            return self.text
+        return "".join(text for _, text in self.iter_pages(first_page, max_pages))
+
+    def page_at(self, offset):
+        """Return the page number containing a character offset."""
+        return max(1, bisect_right(self.page_offsets, offset))
+
+    def read_spans(self, spans, skip_chars=1024 * 1024):
+        """Return the text of (start, end) character spans without keeping the whole text.
+
+        The file is read once, in order of the spans, which may overlap. A
+        span on a later page is reached by seeking to the start of its page
+        rather than reading the pages in between.
+        """
+        if self._text is not None:
+            return [self._text[start:end] for start, end in spans]
+        texts = [None] * len(spans)
+        buffer, buffer_start = "", 0
+        with open(self.text_path, "rb") as file:
+            reader, _ = self._open_at_page(file, 1)
+            for i in sorted(range(len(spans)), key=lambda i: spans[i]):
+                start, end = spans[i]
+                position = buffer_start + len(buffer)
+                if start >= position:
+                    page_number = self.page_at(start)
+                    if self.page_byte_offsets and self.page_offsets[page_number - 1] > position:
+                        reader, position = self._open_at_page(file, page_number)
+                    while position < start:
+                        skipped = len(_read_chars(reader, min(skip_chars, start - position)))
+                        if not skipped:
+                            break
+                        position += skipped
+                    buffer, buffer_start = "", start
+                else:
+                    buffer, buffer_start = buffer[start - buffer_start:], start
+                if end > buffer_start + len(buffer):
+                    buffer += _read_chars(reader, end - buffer_start - len(buffer))
+                texts[i] = buffer[:end - start]
+        return texts
+
+def _read_chars(reader, count, chunk_bytes=64 * 1024):
+    """Read count characters from a codecs stream reader, fewer only at the end of the file."""
+    return reader.read(chunk_bytes, count) if count > 0 else ""
+
+class DocumentStore:
+    """Disk-backed LRU cache of extracted document text keyed by content hash.
+
+    Each document gets its own directory holding ``text.txt``, ``meta.json``
+    (filename and the character offset at which every page starts) and any
+    artifacts built from it. Directory mtimes track recency; the least
+    recently used documents are evicted once the store exceeds its size or
+    count bounds.
+    """
+
+    def __init__(self, root, max_bytes, max_documents):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_dir(self, document_id):
+        return os.path.join(self.root, document_id)
+
+    def artifact_path(self, document_id, name):
+        """Return the path of a file stored alongside a cached document."""
+        return os.path.join(self._entry_dir(document_id), name)
+
+    def touch(self, document_id):
+        """Mark a cached document as recently used; returns False if it is no longer cached."""
+        try:
+            os.utime(self._entry_dir(document_id))
+            return True
+        except OSError:
+            return False
+
+    def get(self, document_id):
+        """Return the cached document for an id, or None on a miss."""
+        if not document_id or not DOCUMENT_ID_PATTERN.match(document_id):
+            return None
+        try:
+            with open(self.artifact_path(document_id, "meta.json"), "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            os.utime(self._entry_dir(document_id))  # Mark as recently used
+        except (OSError, ValueError):
+            return None
+        return Document(
+            self.artifact_path(document_id, "text.txt"), document_id, meta["filename"], meta["page_offsets"], meta["length"],
+            meta.get("extracted", False), meta.get("pages_total"), meta.get("page_byte_offsets"),
+        )
+
+    def put(self, document_id, pages, filename=None, extracted=False, details=None):
+        """Stream (page_number, text) pages into the store and return the document.
+
+        Pages are written to disk as they arrive, so only one page is held in
+        memory at a time. Returns None if the document has no text. If the
+        pages raise, nothing is stored and the error is passed on. The
+        details the extraction filled in, such as "pages_total", are read
+        once the pages are exhausted and stored with the document.
+        """
+        os.makedirs(self._entry_dir(document_id), exist_ok=True)
+        text_path = self.artifact_path(document_id, "text.txt")
+        fd, tmp_path = tempfile.mkstemp(dir=self._entry_dir(document_id), suffix=".tmp")
+        page_offsets, page_byte_offsets = [], []
+        length = byte_length = 0
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for _, text in pages:
+                    data = text.encode("utf-8")
+                    page_offsets.append(length)
+                    page_byte_offsets.append(byte_length)
+                    file.write(data)
+                    length += len(text)
+                    byte_length += len(data)
+        except BaseException:
+            # A failed extraction must not leave a truncated document behind
+            self._discard(document_id, tmp_path)
+            raise
+        if length == 0:
+            self._discard(document_id, tmp_path)
+            return None
+        os.replace(tmp_path, text_path)
+
+        pages_total = (details or {}).get("pages_total")
+        meta = {
+            "filename": filename, "page_offsets": page_offsets, "page_byte_offsets": page_byte_offsets, "length": length,
+            "extracted": extracted, "pages_total": pages_total,
+        }
+        meta_path = self.artifact_path(document_id, "meta.json")
+        with atomic_write(meta_path, encoding="utf-8") as file:
+            json.dump(meta, file)
+        self._evict(keep=document_id)
+        return Document(text_path, document_id, filename, page_offsets, length, extracted, pages_total, page_byte_offsets)
+
+    def _discard(self, document_id, tmp_path):
+        """Remove an unfinished text file, and the document's directory if nothing else is in it."""
+        os.remove(tmp_path)
+        if not os.listdir(self._entry_dir(document_id)):
+            os.rmdir(self._entry_dir(document_id))
+
+    def _evict(self, keep=None):
+        """Remove least recently used documents until the store fits its bounds."""
+        with self._lock:
+            entries = []
+            total_bytes = 0
+            for name in os.listdir(self.root):
+                entry_dir = os.path.join(self.root, name)
+                if not os.path.isdir(entry_dir):
+                    continue
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+                    entries.append((os.path.getmtime(entry_dir), name, size))
+                except OSError:
+                    continue
+                total_bytes += size
+            entries.sort()
+            while entries and (total_bytes > self.max_bytes or len(entries) > self.max_documents):
+                _, name, size = entries.pop(0)
+                if name == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                total_bytes -= size
+
+document_store = DocumentStore(
+    app.config['DOCUMENT_CACHE_FOLDER'],
+    max_bytes=app.config['DOCUMENT_CACHE_MAX_BYTES'],
+    max_documents=app.config['DOCUMENT_CACHE_MAX_DOCUMENTS'],
+)
+
+def check_page_range(first_page, *documents):
+    """Raise PageOutOfRangeError if first_page is past the last page of every document."""
+    page_count = max(len(document.page_offsets) for document in documents)
+    if first_page > page_count:
+        raise PageOutOfRangeError(first_page, page_count)
+
+def requested_page_range(*documents):
+    """Return the (first_page, max_pages) requested in the form, if any.
+
+    Given documents, the first page must exist in at least one of them.
+    """
+    try:
+        first_page = int(request.form.get("first_page") or 1)
+        max_pages = int(request.form.get("max_pages") or 0) or None
+    except ValueError:
+        raise InvalidPageRangeError()
+    if first_page < 1 or (max_pages is not None and max_pages < 1):
+        raise InvalidPageRangeError()
+    if documents:
+        check_page_range(first_page, *documents)
+    return first_page, max_pages
+
+def store_document(document_id, pages, filename, extracted=False, details=None):
+    """Extract a document into the store, reporting extraction errors as DocumentReadError."""
+    try:
+        return document_store.put(document_id, pages, filename=filename, extracted=extracted, details=details)
+    except Exception as e:
+        print(f"Error extracting text from {filename}: {e}")
+        raise DocumentReadError(e) from e
+
+def load_document(document_file=None, document_id=None, raw=False):
+    """Return the cached document for an upload or a previously returned document id.
+
+    Uploads are read straight from the request stream. They are hashed first
+    so a repeat upload of the same content is served from the document store
+    without extracting its text again. With raw, CSV, JSON, XML, HTML and
+    Markdown files are decoded as they are instead of having their text
+    extracted, for operations that work on the file itself such as
+    comparing and encoding. Returns None if the upload cannot be read;
+    raises DocumentNotFoundError for unknown ids and DocumentReadError if
+    extraction fails, in which case nothing is cached.
+    """
+    if document_id:
+        document = document_store.get(document_id)
+        if document is None:
+            raise DocumentNotFoundError(document_id)
+        if raw and document.extracted:
+            raise RawTextUnavailableError(document_id)
+        return document
+
+    filename = secure_filename(document_file.filename)
+    document_id = hash_stream(document_file.stream, filename, raw=raw)
+    document = document_store.get(document_id)
+    if document is None:
+        extracted = not raw and filename.rsplit('.', 1)[-1].lower() in TEXT_EXTRACTOR_VERSIONS
+        details = {}
+        pages = iter_document_pages(document_file.stream, filename, raw=raw, details=details)
+        document = store_document(document_id, pages, filename, extracted, details)
+    return document
+
+def load_document_file(document_path, filename):
+    """Return the cached document for a file on disk, extracting its text on a miss."""
+    document_id = hash_file(document_path)
+    document = document_store.get(document_id)
+    if document is None:
+        extracted = document_path.rsplit('.', 1)[-1].lower() in TEXT_EXTRACTOR_VERSIONS
+        details = {}
+        document = store_document(document_id, iter_document_pages(document_path, details=details), filename, extracted, details)
+    return document
+
+def encode_base64(text):
+    """Encode text to Base64."""
+    try:
+        encoded_bytes = base64.b64encode(text.encode('utf-8'))
+        return encoded_bytes.decode('utf-8')
+    except Exception as e:
+        print(f"Error encoding to Base64: {e}")
+        return None
+
+def decode_base64(text):
+    """Decode Base64 text."""
+    try:
+        decoded_bytes = base64.b64decode(text)
+        return decoded_bytes.decode('utf-8')
+    except Exception as e:
+        print(f"Error decoding from Base64: {e}")
+        return None
+
+def encode_url(text):
+    """Encode text for URL."""
+    try:
+        return urllib.parse.quote(text)
+    except Exception as e:
+        print(f"Error encoding URL: {e}")
+        return None
+
+def decode_url(text):
+    """Decode URL encoded text."""
+    try:
+        return urllib.parse.unquote(text)
+    except Exception as e:
+        print(f"Error decoding URL: {e}")
+        return None
+
+def encode_html(text):
+    """Encode text to HTML entities."""
+    try:
+        return html.escape(text)
+    except Exception as e:
+        print(f"Error encoding HTML: {e}")
+        return None
+
+def decode_html(text):
+    """Decode HTML entities to text."""
+    try:
+        return html.unescape(text)
+    except Exception as e:
+        print(f"Error decoding HTML: {e}")
+        return None
+
+# Morse code dictionaries
+MORSE_CODE_DICT = {
+    'A': '.-', 'B': '-...', 'C': '-.-.', 'D': '-..', 'E': '.', 'F': '..-.', 
+    'G': '--.', 'H': '....', 'I': '..', 'J': '.---', 'K': '-.-', 'L': '.-..', 
+    'M': '--', 'N': '-.', 'O': '---', 'P': '.--.', 'Q': '--.-', 'R': '.-.', 
+    'S': '...', 'T': '-', 'U': '..-', 'V': '...-', 'W': '.--', 'X': '-..-', 
+    'Y': '-.--', 'Z': '--..', '1': '.----', '2': '..---', '3': '...--', 
+    '4': '....-', '5': '.....', '6': '-....', '7': '--...', '8': '---..',
+    '9': '----.', '0': '-----', ' ': '/', '.': '.-.-.-', ',': '--..--', 
+    '?': '..--..', "'": '.----.', '!': '-.-.--', '/': '-..-.', '(': '-.--.', 
+    ')': '-.--.-', '&': '.-...', ':': '---...', ';': '-.-.-.', '=': '-...-', 
+    '+': '.-.-.', '-': '-....-', '_': '..--.-', '"': '.-..-.', '$': '...-..-',
+    '@': '.--.-.'
+}
+
+MORSE_CODE_REVERSE = {value: key for key, value in MORSE_CODE_DICT.items()}
+
+def encode_morse(text):
+    """Convert text to Morse code."""
+    try:
+        text = text.upper()
+        # dict.get(char, char) keeps characters that aren't in the dictionary
+        return ' '.join(map(MORSE_CODE_DICT.get, text, text))
+    except Exception as e:
+        print(f"Error encoding to Morse: {e}")
+        return None
+
+def _decode_morse_tokens(morse_code):
+    """Decode space-separated Morse codes; "/" decodes to the space between words."""
+    tokens = morse_code.split(' ')
+    # Unknown codes are kept and empty tokens decode to nothing
+    return ''.join(map(MORSE_CODE_REVERSE.get, tokens, tokens))
+
+def decode_morse(morse_code):
+    """Convert Morse code to text."""
+    try:
+        return _decode_morse_tokens(morse_code.strip()).strip()
+    except Exception as e:
+        print(f"Error decoding from Morse: {e}")
+        return None
+
+ENCODERS = {
+    'base64': encode_base64,
+    'url': encode_url,
+    'html': encode_html,
+    'morse': encode_morse,
+}
+
+DECODERS = {
+    'base64': decode_base64,
+    'url': decode_url,
+    'html': decode_html,
+    'morse': decode_morse,
+}
+
+# Joins batch items; it is not in either Morse dictionary, so it encodes and decodes to itself
+MORSE_BATCH_SEPARATOR = "\x00"
+
+def _run_morse_batch(items, convert, convert_joined):
+    """Convert the items that can be joined with MORSE_BATCH_SEPARATOR in one call, the rest one by one.
+
+    Empty items, items that are not text and items containing the separator
+    go through convert; convert_joined takes the list of the other items and
+    returns their results in order.
+    """
+    joined = [index for index, item in enumerate(items) if item and isinstance(item, str) and MORSE_BATCH_SEPARATOR not in item]
+    if len(joined) == len(items):
+        return convert_joined(items) if items else []
+    results = [None] * len(items)
+    for index, result in zip(joined, convert_joined([items[index] for index in joined]) if joined else ()):
+        results[index] = result
+    joined = set(joined)
+    for index, item in enumerate(items):
+        if index not in joined:
+            results[index] = convert(item)
+    return results
+
+def encode_morse_batch(texts):
+    """Convert many texts to Morse code in one pass; failed items are None.
+
+    The texts are joined with MORSE_BATCH_SEPARATOR, encoded together and
+    split again where the separator's code, spaced like any other, is.
+    """
+    def encode_joined(items):
+        return encode_morse(MORSE_BATCH_SEPARATOR.join(items)).split(f" {MORSE_BATCH_SEPARATOR} ")
+    return _run_morse_batch(texts, encode_morse, encode_joined)
+
+def decode_morse_batch(morse_codes):
+    """Convert many Morse code strings to text in one pass; failed items are None.
+
+    The codes are joined with MORSE_BATCH_SEPARATOR as a token of its own,
+    decoded together and split again.
+    """
+    def decode_joined(items):
+        decoded = _decode_morse_tokens(f" {MORSE_BATCH_SEPARATOR} ".join(item.strip() for item in items))
+        return [piece.strip() for piece in decoded.split(MORSE_BATCH_SEPARATOR)]
+    return _run_morse_batch(morse_codes, decode_morse, decode_joined)
+
+# ===== Diff Engine =====
+
+def _unique_common_subsequence(a, b, alo, ahi, blo, bhi):
+    """Longest increasing run of lines that occur exactly once in both regions."""
+    counts_a = Counter(a[alo:ahi])
+    counts_b = Counter(b[blo:bhi])
+    unique_b = {b[j]: j for j in range(blo, bhi) if counts_b[b[j]] == 1}
+    pairs = [(i, unique_b[a[i]]) for i in range(alo, ahi) if counts_a[a[i]] == 1 and a[i] in unique_b]
+    if not pairs:
+        return []
+    # Patience sorting: longest increasing subsequence of the b positions
+    tails, tail_indexes, previous = [], [], [None] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        pile = bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_indexes.append(index)
+        else:
+            tails[pile] = j
+            tail_indexes[pile] = index
+        previous[index] = tail_indexes[pile - 1] if pile else None
+    result = []
+    index = tail_indexes[-1]
+    while index is not None:
+        result.append(pairs[index])
+        index = previous[index]
+    result.reverse()
+    return result
+
+def _myers_common_lines(a, b, alo, ahi, blo, bhi, max_edits):
+    """Matched line pairs of a shortest edit script (Myers' O(ND) algorithm).
+
+    Returns None if the regions differ by more than max_edits lines.
+    """
+    n, m = ahi - alo, bhi - blo
+    v = {1: 0}
+    trace = []
+    for d in range(min(max_edits, n + m) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, n, m, alo, blo)
+    return None
+
+def _myers_backtrack(trace, x, y, alo, blo):
+    matches = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        prev_k = k + 1 if k == -d or (k != d and v[k - 1] < v[k + 1]) else k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((alo + x, blo + y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        matches.append((alo + x, blo + y))
+    return matches
+
+@timed_stage("diff")
+def diff_opcodes(a, b, details=None):
+    """Return difflib-style opcodes that turn the lines of a into the lines of b.
+
+    Lines are hashed to integers once, then matched with patience diff:
+    common prefixes and suffixes are trimmed, lines unique to both sides
+    anchor the match, and the gaps between anchors are diffed recursively.
+    Gaps without unique lines are diffed with Myers' algorithm, or reported
+    as replaced if they differ by more than DIFF_MAX_EDITS lines. In that
+    case the diff is not minimal and, if a details dict is given,
+    details["approximate"] is set to True.
+    """
+    line_ids = {}
+    a = [line_ids.setdefault(line, len(line_ids)) for line in a]
+    b = [line_ids.setdefault(line, len(line_ids)) for line in b]
+
+    matches = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        alo, ahi, blo, bhi = regions.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_common_subsequence(a, b, alo, ahi, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                regions.append((alo, i, blo, j))
+                matches.append((i, j))
+                alo, blo = i + 1, j + 1
+            regions.append((alo, ahi, blo, bhi))
+        elif not set(a[alo:ahi]).isdisjoint(b[blo:bhi]):
+            common = _myers_common_lines(a, b, alo, ahi, blo, bhi, app.config['DIFF_MAX_EDITS'])
+            if common is None and details is not None:
+                details["approximate"] = True
+            matches.extend(common or [])
+    matches.sort()
+
+    opcodes = []
+    i = j = 0
+    for mi, mj in matches + [(len(a), len(b))]:
+        if mi > i or mj > j:
+            tag = "replace" if mi > i and mj > j else ("delete" if mi > i else "insert")
+            opcodes.append([tag, i, mi, j, mj])
+        if mi == len(a) and mj == len(b):
+            break
+        if opcodes and opcodes[-1][0] == "equal" and opcodes[-1][2] == mi and opcodes[-1][4] == mj:
+            opcodes[-1][2] += 1
+            opcodes[-1][4] += 1
+        else:
+            opcodes.append(["equal", mi, mi + 1, mj, mj + 1])
+        i, j = mi + 1, mj + 1
+    return [tuple(opcode) for opcode in opcodes]
+
+def group_opcodes(opcodes, n=3):
+    """Group opcodes into hunks with n lines of context, like SequenceMatcher.get_grouped_opcodes."""
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > n + n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+def _format_range_unified(start, stop):
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+def unified_diff(a, b, fromfile="", tofile="", n=3, details=None):
+    """Yield the lines of a unified diff of two line lists, in difflib's format."""
+    started = False
+    for group in group_opcodes(diff_opcodes(a, b, details), n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}"
+            yield f"+++ {tofile}"
+        first, last = group[0], group[-1]
+        yield f"@@ -{_format_range_unified(first[1], last[2])} +{_format_range_unified(first[3], last[4])} @@"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in ("replace", "delete"):
+                for line in a[i1:i2]:
+                    yield "-" + line
+            if tag in ("replace", "insert"):
+                for line in b[j1:j2]:
+                    yield "+" + line
+
+def diff_summary(a, b):
+    """Changed-line counts and similarity ratio of two line lists, without rendering a diff.
+
+    "approximate" is true when part of the files was too different to diff
+    exactly, so the counts overstate the changes.
+    """
+    details = {"approximate": False}
+    unchanged = added = removed = 0
+    for tag, i1, i2, j1, j2 in diff_opcodes(a, b, details):
+        if tag == "equal":
+            unchanged += i2 - i1
+        else:
+            removed += i2 - i1
+            added += j2 - j1
+    total = len(a) + len(b)
+    return {
+        "lines1": len(a),
+        "lines2": len(b),
+        "unchanged": unchanged,
+        "added": added,
+        "removed": removed,
+        "similarity": 2.0 * unchanged / total if total else 1.0,
+        "approximate": details["approximate"],
+    }
+
+# ===== Translation =====
+
+class EchoTranslator:
+    """Local stand-in backend that returns text unchanged, for tests and benchmarks."""
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        return text
+
+TRANSLATION_BACKENDS = {
+    "google": lambda source, target: GoogleTranslator(source=source, target=target),
+    "echo": EchoTranslator,
+}
+
+def register_translation_backend(name, factory):
+    """Register a translation backend: factory(source, target) returns an object with translate(text)."""
+    TRANSLATION_BACKENDS[name] = factory
+
+# Clients are not thread-safe (GoogleTranslator keeps the text being translated
+# on the instance), so every thread gets its own
+_translators = threading.local()
+_translation_memory = OrderedDict()
+_translation_lock = threading.Lock()
+_translation_pool = None
+
+def get_translator(target_lang, source_lang="auto"):
+    """Return this thread's translator client for a language pair of the configured backend."""
+    key = (app.config['TRANSLATION_BACKEND'], source_lang, target_lang)
+    translators = getattr(_translators, "clients", None)
+    if translators is None:
+        translators = _translators.clients = {}
+    translator = translators.get(key)
+    if translator is None:
+        translator = translators[key] = TRANSLATION_BACKENDS[key[0]](source_lang, target_lang)
+    return translator
+
+def get_translation_pool():
+    """Return the thread pool used to translate chunks, creating it on first use."""
+    global _translation_pool
+    with _translation_lock:
+        if _translation_pool is None:
+            _translation_pool = ThreadPoolExecutor(max_workers=app.config['TRANSLATION_WORKERS'], thread_name_prefix="docgpt-translate")
+        return _translation_pool
+
+PARAGRAPH_BREAK_PATTERN = re.compile(r"(\n[ \t]*\n\s*)")
+SENTENCE_BREAK_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+def _iter_translation_pieces(text, max_chars):
+    """Paragraphs and paragraph breaks of text, with paragraphs longer than max_chars cut.
+
+    Long paragraphs are cut at sentence boundaries, and sentences longer
+    than max_chars at whitespace.
+    """
+    for part in PARAGRAPH_BREAK_PATTERN.split(text):
+        while len(part) > max_chars:
+            cut = 0
+            for match in SENTENCE_BREAK_PATTERN.finditer(part, 0, max_chars):
+                cut = match.end()
+            if not cut:
+                cut = part.rfind(" ", 0, max_chars) + 1 or max_chars
+            yield part[:cut]
+            part = part[cut:]
+        if part:
+            yield part
+
+def split_for_translation(text, max_chars):
+    """Split text into chunks no longer than max_chars; joining the chunks gives back the text.
+
+    Consecutive paragraphs are packed into one chunk while they fit, so a
+    text within the provider's limit is a single request. Chunks are cut
+    between paragraphs where possible, otherwise between sentences.
+    """
+    chunks = []
+    current = ""
+    for piece in _iter_translation_pieces(text, max_chars):
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _translate_chunk(chunk, target_lang, source_lang):
+    translated = get_translator(target_lang, source_lang).translate(chunk)
+    if translated is None:
+        raise RuntimeError("Translation failed!")
+    return translated
+
+@timed_stage("translate")
+def translate_text(text, target_lang, source_lang="auto"):
+    """Translate text to the target language.
+
+    The text is cut into provider-sized chunks at paragraph and sentence
+    boundaries. Repeated chunks are translated once, chunks seen before come
+    from the translation memory, and the rest are translated concurrently,
+    one client per pool thread, before being put back in order.
+    """
+    backend = app.config['TRANSLATION_BACKEND']
+    pieces = split_for_translation(text, app.config['TRANSLATION_CHUNK_CHARS'])
+
+    translations = {}
+    pending = []
+    with _translation_lock:
+        for piece in dict.fromkeys(piece.strip() for piece in pieces):
+            if not piece:
+                continue
+            key = (backend, source_lang, target_lang, piece)
+            if key in _translation_memory:
+                _translation_memory.move_to_end(key)
+                translations[piece] = _translation_memory[key]
+            else:
+                pending.append(piece)
+
+    if pending:
+        results = get_translation_pool().map(lambda chunk: _translate_chunk(chunk, target_lang, source_lang), pending)
+        for chunk, translated in zip(pending, results):
+            translations[chunk] = translated
+        with _translation_lock:
+            for chunk in pending:
+                _translation_memory[(backend, source_lang, target_lang, chunk)] = translations[chunk]
+            while len(_translation_memory) > app.config['TRANSLATION_MEMORY_SIZE']:
+                _translation_memory.popitem(last=False)
+
+    # Whitespace around each piece is kept as-is rather than sent to the provider
+    output = []
+    for piece in pieces:
+        stripped = piece.strip()
+        if not stripped:
+            output.append(piece)
+            continue
+        start = piece.index(stripped)
+        output.append(piece[:start] + translations[stripped] + piece[start + len(stripped):])
+    return "".join(output)
+
+# ===== Result Cache =====
+
+class ResultCache:
+    """Two-tier cache of operation results keyed by document, operation and parameters.
+
+    The first tier is an in-memory LRU. When ``persist`` is set, results are
+    also written as JSON next to the document in the document store, so they
+    survive restarts and are evicted together with the document.
+    """
+
+    def __init__(self, max_entries, persist=True):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(operation, params):
+        return hashlib.sha256(json.dumps([operation, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, document_id, key):
+        return document_store.artifact_path(document_id, f"result-{key}.json")
+
+    def get(self, document_id, operation, params):
+        """Return (True, result) on a hit and (False, None) on a miss."""
+        key = self.key(operation, params)
+        with self._lock:
+            if (document_id, key) in self._entries:
+                self._entries.move_to_end((document_id, key))
+                self.memory_hits += 1
+                return True, self._entries[(document_id, key)]
+        if self.persist:
+            try:
+                with open(self._path(document_id, key), "r", encoding="utf-8") as file:
+                    result = json.load(file)
+            except (OSError, ValueError):
+                pass
+            else:
+                self._remember(document_id, key, result)
+                with self._lock:
+                    self.disk_hits += 1
+                return True, result
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, document_id, operation, params, result):
+        key = self.key(operation, params)
+        self._remember(document_id, key, result)
+        if self.persist:
+            path = self._path(document_id, key)
+            try:
+                with atomic_write(path, encoding="utf-8") as file:
+                    json.dump(result, file)
+            except OSError as e:
+                print(f"Error persisting cached result: {e}")
+
+    def _remember(self, document_id, key, result):
+        with self._lock:
+            self._entries[(document_id, key)] = result
+            self._entries.move_to_end((document_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+result_cache = ResultCache(app.config['RESULT_CACHE_SIZE'], persist=app.config['RESULT_CACHE_PERSIST'])
+
+# ===== Document Operations =====
+
+def summarize_document(document, num_sentences=5, first_page=1, max_pages=None, method="auto"):
+    """Summarize a page range of a cached document."""
+    params = {"num_sentences": num_sentences, "first_page": first_page, "max_pages": max_pages, "method": method}
+    hit, summary = result_cache.get(document.document_id, "summarize", params)
+    if not hit:
+        summary = summarize_text(document.page_text(first_page, max_pages), num_sentences, method)
+        result_cache.put(document.document_id, "summarize", params, summary)
+    return dict(document.response_fields(), summary=summary)
+
+def qa_cache_params(question, first_page, max_pages):
+    """Everything besides the document that decides the answer to a question."""
+    return {
+        "question": question,
+        "first_page": first_page,
+        "max_pages": max_pages,
+        "model": app.config['QA_MODEL_NAME'],
+        "window_words": app.config['QA_WINDOW_WORDS'],
+        "window_overlap": app.config['QA_WINDOW_OVERLAP'],
+        "top_k": app.config['QA_TOP_K'],
+    }
+
+def answer_document_questions(document, questions, first_page=1, max_pages=None):
+    """Answer questions about a page range of a cached document.
+
+    Previously answered questions come from the result cache; the rest are
+    answered together in one batched pass.
+    """
+    answers = {}
+    for question in dict.fromkeys(questions):
+        hit, answer = result_cache.get(document.document_id, "qamodel", qa_cache_params(question, first_page, max_pages))
+        if hit:
+            answers[question] = answer
+
+    pending = [question for question in dict.fromkeys(questions) if question not in answers]
+    if pending:
+        if get_qa_model() is None:
+            raise RuntimeError("QA model failed to initialize!")
+        context = document.page_text(first_page, max_pages)
+        try:
+            # The cached passage index covers the whole document
+            index = get_passage_index(document) if first_page == 1 and not max_pages else None
+            for answer in answer_questions(pending, context, index=index):
+                answers[answer["question"]] = answer
+                result_cache.put(document.document_id, "qamodel", qa_cache_params(answer["question"], first_page, max_pages), answer)
+        except Exception as e:
+            for question in pending:
+                answers[question] = {"question": question, "answer": f"Error processing this question: {str(e)}"}
+    return dict(document.response_fields(), answers=[answers[question] for question in questions])
+
+def translate_document(document, target_lang, first_page=1, max_pages=None):
+    """Translate a page range of a cached document."""
+    translated_text = translate_text(document.page_text(first_page, max_pages), target_lang)
+    if not translated_text:
+        raise RuntimeError("Translation failed!")
+    return dict(document.response_fields(), translated_text=translated_text)
+
+SEARCH_MODES = ("phrase", "keywords")
+
+class InvalidSearchError(RequestError):
+    """Raised when a search query or its options are malformed."""
+
+@timed_stage("search")
+def search_document(document, query, mode="phrase", fuzzy=False, limit=20, first_page=1, max_pages=None):
+    """Search a cached document through its positional index.
+
+    In phrase mode the words of the query must appear consecutively; in
+    keywords mode every occurrence of any query word is a hit. With fuzzy
+    matching, words missing from the document also match close spellings,
+    which tolerates transcription errors. Returns the pages with a hit and
+    the first limit hits with their offsets and a snippet.
+    """
+    if mode not in SEARCH_MODES:
+        raise InvalidSearchError(f"Unsupported search mode: {mode}")
+    query_terms = [match.group().lower() for match in TERM_PATTERN.finditer(query)]
+    if not query_terms:
+        raise InvalidSearchError("Query must contain at least one word!")
+
+    index = get_search_index(document)
+    cutoff = app.config['SEARCH_FUZZY_CUTOFF']
+    variants = [index.expand(term, fuzzy, cutoff) for term in query_terms]
+    if mode == "phrase":
+        starts = index.match_phrase(variants)
+        last_tokens = starts + len(variants) - 1
+    else:
+        starts = index.positions({term for terms in variants for term in terms})
+        last_tokens = starts
+
+    pages = index.token_pages[starts]
+    in_range = pages >= first_page
+    if max_pages:
+        in_range &= pages < first_page + max_pages
+    starts, last_tokens, pages = starts[in_range], last_tokens[in_range], pages[in_range]
+
+    hits = []
+    if len(starts):
+        bounds = document.page_offsets + [document.length]
+        context = app.config['SEARCH_SNIPPET_CHARS']
+        found = []
+        for token, last_token, page in zip(starts[:limit].tolist(), last_tokens[:limit].tolist(), pages[:limit].tolist()):
+            start, end = int(index.token_starts[token]), int(index.token_ends[last_token])
+            # Snippets stay within the page; one more character on each side shows whether a word is cut off there
+            window = (max(bounds[page - 1], start - context - 1), min(bounds[page], end + context + 1))
+            found.append((page, start, end, window))
+        # Only the text around the hits is read, not the whole document
+        window_texts = document.read_spans([window for *_, window in found])
+        for (page, start, end, (window_start, window_end)), text in zip(found, window_texts):
+            # Offsets relative to the window text
+            start, end = start - window_start, end - window_start
+            snippet_start = max(0, start - context)
+            snippet_end = min(window_end - window_start, end + context)
+            if snippet_start > 0 and not text[snippet_start - 1].isspace():
+                space = re.search(r"\s", text[snippet_start:start])
+                snippet_start = snippet_start + space.start() if space else start
+            if snippet_end < len(text) and not text[snippet_end].isspace():
+                space = re.search(r"\s\S*$", text[end:snippet_end])
+                snippet_end = end + space.start() if space else end
+            hits.append({
+                "page": page,
+                "start": window_start + start,
+                "end": window_start + end,
+                "text": text[start:end],
+                "snippet": " ".join(text[snippet_start:snippet_end].split()),
+            })
+    return {
+        "query": query,
+        "mode": mode,
+        "matched_terms": dict(zip(query_terms, variants)) if fuzzy else None,
+        "total_hits": len(starts),
+        "pages": np.unique(pages).tolist(),
+        "hits": hits,
+        **document.response_fields(),
+    }
+
+def search_params():
+    """Validate the search fields of a form and return the search parameters."""
+    query = request.form.get("query", "")
+    if not query.strip():
+        raise InvalidSearchError("Query is required!")
+    try:
+        limit = int(request.form.get("limit") or 20)
+    except ValueError:
+        raise InvalidSearchError("limit must be a positive integer!")
+    if limit < 1:
+        raise InvalidSearchError("limit must be a positive integer!")
+    return {
+        "query": query,
+        "mode": request.form.get("mode", "phrase"),
+        "fuzzy": request.form.get("fuzzy") == "true",
+        "limit": min(limit, app.config['SEARCH_MAX_HITS']),
+    }
+
+def search_document_with_voice(document, audio_path, first_page=1, max_pages=None, fuzzy=True):
+    """Transcribe a spoken keyword and search a cached document for it."""
+    transcribed_keyword = transcribe_audio(audio_path)
+    if not transcribed_keyword:
+        raise RuntimeError("Failed to transcribe audio!")
+    return voice_search_result(document, transcribed_keyword, first_page, max_pages, fuzzy)
+
+def voice_search_result(document, transcribed_keyword, first_page=1, max_pages=None, fuzzy=True):
+    """Search a cached document for a transcribed keyword."""
+    result = search_document(
+        document, transcribed_keyword, fuzzy=fuzzy, limit=app.config['SEARCH_MAX_HITS'],
+        first_page=first_page, max_pages=max_pages,
+    )
+    return {
+        "transcribed_keyword": transcribed_keyword,
+        "search_result": "Keyword found in document." if result["pages"] else "Keyword not found in document.",
+        "pages": result["pages"],
+        "hits": result["hits"],
+        "matched_terms": result["matched_terms"],
+        **document.response_fields(),
+    }
+
+# ===== Corpora =====
+
+class CorpusNotFoundError(RequestError):
+    """Raised when a request references an unknown corpus id."""
+    status_code = 404
+
+    def __str__(self):
+        return f"Unknown corpus id: {self.args[0]}"
+
+class InvalidCorpusError(RequestError):
+    """Raised when a corpus would have no documents or too many."""
+
+    def __str__(self):
+        return self.args[0]
+
+class Corpus:
+    """A fixed list of cached documents that questions and summaries run across."""
+
+    def __init__(self, corpus_id, members):
+        self.corpus_id = corpus_id
+        self.members = members
+
+    @property
+    def document_ids(self):
+        return [member["document_id"] for member in self.members]
+
+    def documents(self):
+        """Return the cached documents of the corpus; raises DocumentNotFoundError if one was evicted."""
+        documents = []
+        for document_id in self.document_ids:
+            document = document_store.get(document_id)
+            if document is None:
+                raise DocumentNotFoundError(document_id)
+            documents.append(document)
+        return documents
+
+    def to_dict(self):
+        return {"corpus_id": self.corpus_id, "documents": self.members}
+
+class CorpusStore:
+    """Corpus manifests saved as one JSON file per corpus.
+
+    A manifest only lists document ids; the text and indexes stay in the
+    document store. The corpus id is the SHA-256 of the document ids, so
+    grouping the same documents again returns the same corpus.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, corpus_id):
+        return os.path.join(self.root, f"{corpus_id}.json")
+
+    def get(self, corpus_id):
+        """Return the corpus for an id, or None if there is none."""
+        if not corpus_id or not DOCUMENT_ID_PATTERN.match(corpus_id):
+            return None
+        try:
+            with open(self._path(corpus_id), "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return Corpus(corpus_id, manifest["documents"])
+
+    def put(self, documents):
+        """Save the manifest of a corpus of documents, in order and without repeats, and return it."""
+        documents = list({document.document_id: document for document in documents}.values())
+        corpus_id = hashlib.sha256("\n".join(["corpus"] + [document.document_id for document in documents]).encode("utf-8")).hexdigest()
+        members = [
+            {"document_id": document.document_id, "filename": document.filename, "pages": len(document.page_offsets), "characters": document.length}
+            for document in documents
+        ]
+        path = self._path(corpus_id)
+        with atomic_write(path, encoding="utf-8") as file:
+            json.dump({"documents": members, "created_at": time.time()}, file)
+        return Corpus(corpus_id, members)
+
+corpus_store = CorpusStore(app.config['CORPUS_FOLDER'])
+# Corpus results are kept in memory only: they have no directory in the document store
+corpus_result_cache = ResultCache(app.config['RESULT_CACHE_SIZE'], persist=False)
+
+_corpus_pool = None
+_corpus_pool_lock = threading.Lock()
+
+def get_corpus_pool():
+    """Return the thread pool that works on the documents of a corpus in parallel."""
+    global _corpus_pool
+    with _corpus_pool_lock:
+        if _corpus_pool is None:
+            _corpus_pool = ThreadPoolExecutor(max_workers=app.config['CORPUS_WORKERS'], thread_name_prefix="docgpt-corpus")
+        return _corpus_pool
+
+class CorpusIndex:
+    """BM25 retrieval across the passage indexes of a corpus's documents.
+
+    Each document keeps its own cached PassageIndex. Passage counts, lengths
+    and term frequencies are summed over them so that scores from different
+    documents compare. A query scores only the documents containing one of
+    its terms, in parallel, and reads only the postings of those terms.
+    """
+
+    def __init__(self, documents, indexes):
+        self.documents = documents
+        self.indexes = indexes
+        self.total_passages = sum(len(index.passages) for index in indexes)
+        total_length = sum(float(index.passage_lengths.sum()) for index in indexes)
+        self.average_length = total_length / self.total_passages if self.total_passages else 0.0
+
+    def term_idfs(self, query):
+        """The corpus-wide idf of every query term that occurs in the corpus."""
+        idfs = {}
+        for term in set(tokenize_terms(query)):
+            frequency = sum(index.document_frequency(term) for index in self.indexes)
+            if frequency:
+                idfs[term] = float(PassageIndex.idf(self.total_passages, frequency))
+        return idfs
+
+    def search(self, query, k):
+        """Return (score, member, passage_id) of the k best passages in the corpus, best first."""
+        idfs = self.term_idfs(query)
+        members = [member for member, index in enumerate(self.indexes) if any(term in index.vocabulary for term in idfs)]
+
+        def score_member(member):
+            passages = self.indexes[member].top_passages(idfs, self.average_length, k)
+            return [(score, member, passage_id) for passage_id, score in passages]
+
+        return heapq.nlargest(k, itertools.chain.from_iterable(get_corpus_pool().map(score_member, members)))
+
+    def read_spans(self, member, spans):
+        """Return the text of character spans of one member document, marking it as recently used."""
+        document = self.documents[member]
+        if not document_store.touch(document.document_id):
+            raise DocumentNotFoundError(document.document_id)
+        return document.read_spans(spans)
+
+    def read_passages(self, passages):
+        """Return the text of (member, passage_id) passages, reading each document once."""
+        by_member = {}
+        for position, (member, passage_id) in enumerate(passages):
+            by_member.setdefault(member, []).append((position, self.indexes[member].passages[passage_id]))
+
+        def read_member(member):
+            items = by_member[member]
+            return items, self.read_spans(member, [span for _, span in items])
+
+        texts = [None] * len(passages)
+        for items, member_texts in get_corpus_pool().map(read_member, by_member):
+            for (position, _), text in zip(items, member_texts):
+                texts[position] = text
+        return texts
+
+    def cite(self, member, start, end):
+        """Where a span of a member document is: its document, filename, page and offsets."""
+        document = self.documents[member]
+        return {"document_id": document.document_id, "filename": document.filename, "page": document.page_at(start), "start": start, "end": end}
+
+_corpus_indexes = OrderedDict()
+_corpus_indexes_lock = threading.Lock()
+
+def get_corpus_index(corpus):
+    """Return the retrieval index of a corpus, loading its documents' passage indexes on first use."""
+    with _corpus_indexes_lock:
+        corpus_index = _corpus_indexes.get(corpus.corpus_id)
+        if corpus_index is not None:
+            _corpus_indexes.move_to_end(corpus.corpus_id)
+            return corpus_index
+
+    documents = corpus.documents()
+    # Indexes are built from copies so the full texts are not kept in memory with the corpus
+    indexes = list(get_corpus_pool().map(lambda document: get_passage_index(copy.copy(document)), documents))
+    corpus_index = CorpusIndex(documents, indexes)
+
+    with _corpus_indexes_lock:
+        _corpus_indexes[corpus.corpus_id] = corpus_index
+        while len(_corpus_indexes) > app.config['CORPUS_INDEX_CACHE_SIZE']:
+            _corpus_indexes.popitem(last=False)
+    return corpus_index
+
+def load_corpus(corpus_id):
+    corpus = corpus_store.get(corpus_id)
+    if corpus is None:
+        raise CorpusNotFoundError(corpus_id)
+    return corpus
+
+def create_corpus(document_files=(), document_ids=(), corpus_id=None):
+    """Cache uploaded documents and group them, with cached ones, into a corpus.
+
+    With a corpus_id the new documents are added to the documents of that
+    corpus, which gives a new corpus. Returns the corpus and the filenames
+    of uploads that could not be read.
+    """
+    base = load_corpus(corpus_id) if corpus_id else None
+    count = len(document_files) + len(document_ids) + (len(base.members) if base else 0)
+    if count > app.config['CORPUS_MAX_DOCUMENTS']:
+        raise InvalidCorpusError(f"A corpus can hold at most {app.config['CORPUS_MAX_DOCUMENTS']} documents!")
+
+    documents = base.documents() if base else []
+    documents += [load_document(document_id=document_id) for document_id in document_ids]
+    unreadable = []
+    for document_file in document_files:
+        try:
+            document = load_document(document_file)
+        except DocumentReadError:
+            document = None
+        if document is None:
+            unreadable.append(document_file.filename)
+        else:
+            documents.append(document)
+    if not documents:
+        raise InvalidCorpusError("None of the documents could be read!")
+    return corpus_store.put(documents), unreadable
+
+def answer_corpus_questions(corpus, questions):
+    """Answer questions across every document of a corpus.
+
+    For each question the CORPUS_TOP_K best passages of the whole corpus are
+    retrieved and read by the QA model in one batch, so the cost follows the
+    number of questions rather than the size of the corpus. Each answer
+    cites its document and page, and lists the CORPUS_ANSWERS best spans
+    found in different passages under "matches".
+    """
+    top_k = app.config['CORPUS_TOP_K']
+
+    def cache_params(question):
+        return dict(qa_cache_params(question, 1, None), top_k=top_k, answers=app.config['CORPUS_ANSWERS'])
+
+    answers = {}
+    for question in dict.fromkeys(questions):
+        hit, answer = corpus_result_cache.get(corpus.corpus_id, "qamodel", cache_params(question))
+        if hit:
+            answers[question] = answer
+
+    pending = [question for question in dict.fromkeys(questions) if question not in answers]
+    if pending:
+        if get_qa_model() is None:
+            raise RuntimeError("QA model failed to initialize!")
+        try:
+            corpus_index = get_corpus_index(corpus)
+            hits = {question: [(member, passage_id) for _, member, passage_id in corpus_index.search(question, top_k)] for question in pending}
+            # Questions retrieving the same passage share one read of it
+            passages = list(dict.fromkeys(itertools.chain.from_iterable(hits.values())))
+            passage_texts = dict(zip(passages, corpus_index.read_passages(passages)))
+
+            pairs = [(question, passage) for question in pending for passage in hits[question]]
+            predictions = run_qa_model([question for question, _ in pairs], [passage_texts[passage] for _, passage in pairs]) if pairs else []
+            ranked = {question: [] for question in pending}
+            for (question, passage), prediction in zip(pairs, predictions):
+                ranked[question].append((prediction, passage))
+
+            for question in pending:
+                matches, seen = [], set()
+                for prediction, (member, passage_id) in sorted(ranked[question], key=lambda match: -match[0]["score"]):
+                    passage_start = corpus_index.indexes[member].passages[passage_id][0]
+                    start, end = passage_start + prediction["start"], passage_start + prediction["end"]
+                    # Overlapping windows often find the same span
+                    if (member, start, end) in seen:
+                        continue
+                    seen.add((member, start, end))
+                    matches.append(dict(corpus_index.cite(member, start, end), answer=prediction["answer"], score=float(prediction["score"])))
+                    if len(matches) == app.config['CORPUS_ANSWERS']:
+                        break
+                if matches:
+                    answer = dict(matches[0], question=question, matches=matches)
+                else:
+                    answer = {"question": question, "answer": "", "score": 0.0, "matches": []}
+                answers[question] = answer
+                corpus_result_cache.put(corpus.corpus_id, "qamodel", cache_params(question), answer)
+        except RequestError:
+            raise
+        except Exception as e:
+            for question in pending:
+                answers[question] = {"question": question, "answer": f"Error processing this question: {str(e)}"}
+    return {"answers": [answers[question] for question in questions], "corpus_id": corpus.corpus_id}
+
+def merge_spans(spans):
+    """Merge overlapping (start, end) spans into sorted, disjoint ones."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def summarize_corpus(corpus, num_sentences=5, query=None, method="auto"):
+    """Summarize a corpus, or only the passages most relevant to a query.
+
+    Without a query every document is summarized in parallel (each summary
+    is cached with the document) and the summaries are summarized together.
+    With a query the CORPUS_SUMMARY_PASSAGES best passages of the corpus are
+    summarized instead, and the pages they came from are listed as sources.
+    """
+    params = {"num_sentences": num_sentences, "query": query, "method": method,
+              "passages": app.config['CORPUS_SUMMARY_PASSAGES'] if query else None}
+    hit, result = corpus_result_cache.get(corpus.corpus_id, "summarize", params)
+    if hit:
+        return result
+
+    if query:
+        corpus_index = get_corpus_index(corpus)
+        spans_by_member = {}
+        for _, member, passage_id in corpus_index.search(query, app.config['CORPUS_SUMMARY_PASSAGES']):
+            spans_by_member.setdefault(member, []).append(corpus_index.indexes[member].passages[passage_id])
+        texts, sources = [], []
+        # Passages are read in document order, with overlapping windows merged so no text repeats
+        for member in sorted(spans_by_member):
+            spans = merge_spans(spans_by_member[member])
+            texts.extend(corpus_index.read_spans(member, spans))
+            document = corpus_index.documents[member]
+            pages = sorted({page for start, end in spans for page in range(document.page_at(start), document.page_at(end - 1) + 1)})
+            sources.append({"document_id": document.document_id, "filename": document.filename, "pages": pages})
+        summary = summarize_text("\n\n".join(texts), num_sentences, method) if texts else ""
+        result = {"summary": summary, "query": query, "sources": sources, "corpus_id": corpus.corpus_id}
+    else:
+        documents = corpus.documents()
+        summaries = list(get_corpus_pool().map(lambda document: summarize_document(document, num_sentences, method=method)["summary"], documents))
+        combined = "\n\n".join(summary for summary in summaries if summary)
+        if len(documents) == 1:
+            summary = summaries[0]
+        else:
+            summary = summarize_text(combined, num_sentences, method) if combined else ""
+        result = {
+            "summary": summary,
+            "documents": [
+                {"document_id": document.document_id, "filename": document.filename, "summary": document_summary}
+                for document, document_summary in zip(documents, summaries)
+            ],
+            "corpus_id": corpus.corpus_id,
+        }
+    corpus_result_cache.put(corpus.corpus_id, "summarize", params, result)
+    return result
+
+# ===== Background Jobs =====
+
+class JobNotFoundError(RequestError):
+    """Raised when a request references an unknown or expired job id."""
+    status_code = 404
+
+    def __str__(self):
+        return f"Unknown job id: {self.args[0]}"
+
+class JobQueueFullError(RequestError):
+    """Raised when the job queue has no room for another job."""
+    status_code = 503
+
+    def __str__(self):
+        return "Job queue is full, try again later!"
+
+class InvalidJobError(RequestError):
+    """Raised when a job submission is missing required fields."""
+
+    def __str__(self):
+        return self.args[0]
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class Job:
+    """A background operation and its outcome."""
+
+    def __init__(self, operation, timeout, cleanup_paths=()):
+        self.job_id = uuid.uuid4().hex
+        self.operation = operation
+        self.timeout = timeout
+        self.cleanup_paths = list(cleanup_paths)
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    def cleanup(self):
+        for path in self.cleanup_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def to_dict(self):
+        job = {
+            "job_id": self.job_id,
+            "operation": self.operation,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "succeeded":
+            job["result"] = self.result
+        if self.error:
+            job["error"] = self.error
+        return job
+
+    def to_record(self):
+        """Return the state of the job as it is stored on disk."""
+        return dict(self.to_dict(), timeout=self.timeout, result=self.result, error=self.error)
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(record["operation"], record["timeout"])
+        for field in ("job_id", "status", "created_at", "started_at", "finished_at", "result", "error"):
+            setattr(job, field, record[field])
+        return job
+
+class JobQueue:
+    """Bounded pool of worker threads running long document operations.
+
+    At most ``max_pending`` jobs may be queued or running at once. A job that
+    runs past its timeout is reported as timed out and its result discarded;
+    Python threads cannot be interrupted, so the work itself still finishes
+    in the background. Finished jobs are kept for ``retention`` seconds.
+
+    Jobs run in the process that accepted them, but their state is written
+    to ``folder`` on every change. Other processes sharing the folder can
+    therefore report on a job and cancel it; the owning process picks up
+    the cancellation before it starts the job and before it stores a result.
+    """
+
+    def __init__(self, max_workers, max_pending, timeout, retention, folder):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retention = retention
+        self.folder = folder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docgpt-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.folder, f"{job_id}.json")
+
+    def _save(self, job):
+        with atomic_write(self._path(job.job_id), encoding="utf-8") as file:
+            json.dump(job.to_record(), file)
+
+    def _load(self, job_id):
+        if not job_id or not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as file:
+                return Job.from_record(json.load(file))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _sync(self, job):
+        """Adopt an outcome another process stored for a job this process is running."""
+        stored = self._load(job.job_id)
+        if stored is not None and stored.status not in ("queued", "running") and job.status in ("queued", "running"):
+            job.status, job.error, job.finished_at = stored.status, stored.error, stored.finished_at
+
+    def _find(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            self._sync(job)
+        else:
+            job = self._load(job_id)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        self._expire(job)
+        return job
+
+    def submit(self, operation, func, kwargs, timeout=None, cleanup_paths=()):
+        """Queue func(**kwargs) and return the new job."""
+        job = Job(operation, timeout or self.timeout, cleanup_paths)
+        with self._lock:
+            self._purge()
+            if sum(1 for other in self._jobs.values() if not other.future.done()) >= self.max_pending:
+                job.cleanup()
+                raise JobQueueFullError()
+            self._save(job)
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(self._run, job, func, kwargs)
+        return job
+
+    def _run(self, job, func, kwargs):
+        with self._lock:
+            self._sync(job)
+            if job.status != "queued":
+                job.cleanup()
+                return
+            job.status = "running"
+            job.started_at = time.time()
+            self._save(job)
+        result, error = None, None
+        try:
+            result = func(**kwargs)
+        except Exception as e:
+            error = str(e)
+        finally:
+            job.cleanup()
+        with self._lock:
+            self._sync(job)
+            if job.status != "running":
+                return  # Cancelled or timed out while running
+            job.finished_at = time.time()
+            if job.finished_at - job.started_at > job.timeout:
+                job.status, job.error = "timed_out", "Job timed out!"
+            elif error is not None:
+                job.status, job.error = "failed", error
+            else:
+                job.status, job.result = "succeeded", result
+            self._save(job)
+
+    def _expire(self, job):
+        if job.status == "running" and time.time() - job.started_at > job.timeout:
+            job.status, job.error = "timed_out", "Job timed out!"
+            job.finished_at = time.time()
+            self._save(job)
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+        # Also removes the state of jobs whose process exited before they finished
+        for entry in os.scandir(self.folder):
+            job_id = entry.name.split(".")[0]
+            if job_id in self._jobs:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+    def get(self, job_id):
+        """Return a job by id, raising JobNotFoundError if it is unknown."""
+        with self._lock:
+            return self._find(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; finished jobs are left untouched."""
+        with self._lock:
+            job = self._find(job_id)
+            if job.status in ("queued", "running"):
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                self._save(job)
+                if job.future is not None and job.future.cancel():
+                    job.cleanup()
+            return job
+
+    def counts(self):
+        """Return the number of known jobs in each status."""
+        with self._lock:
+            for job in self._jobs.values():
+                self._expire(job)
+            return Counter(job.status for job in self._jobs.values())
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        # Jobs that never started would otherwise be reported as queued until they expire
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == "queued":
+                    job.status, job.error = "failed", "Server shut down before the job started!"
+                    job.finished_at = time.time()
+                    self._save(job)
+                    job.cleanup()
+
+job_queue = JobQueue(
+    max_workers=app.config['JOB_WORKERS'],
+    max_pending=app.config['JOB_QUEUE_SIZE'],
+    timeout=app.config['JOB_TIMEOUT'],
+    retention=app.config['JOB_RETENTION'],
+    folder=app.config['JOB_FOLDER'],
+)
+
+JOB_OPERATIONS = {
+    "summarize": summarize_document,
+    "qamodel": answer_document_questions,
+    "translate": translate_document,
+    "search": search_document,
+    "search_in_document_with_voice": search_document_with_voice,
+}
+
+def spool_upload(upload):
+    """Save an upload under a unique name for a background job and return its path."""
+    path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}-{secure_filename(upload.filename)}")
+    upload.stream.seek(0)
+    upload.save(path)
+    return path
+
+def run_document_job(operation, document_path=None, filename=None, document_id=None, **params):
+    """Load a job's document inside the worker, then run its operation."""
+    if document_path:
+        document = load_document_file(document_path, filename)
+    else:
+        document = document_store.get(document_id)
+    if document is None:
+        raise RuntimeError("Could not read the document!")
+    check_page_range(params["first_page"], document)
+    return JOB_OPERATIONS[operation](document, **params)
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+def job_params(operation):
+    """Validate the form fields of a job submission and return the operation parameters."""
+    first_page, max_pages = requested_page_range()
+    params = {"first_page": first_page, "max_pages": max_pages}
+    if operation == "summarize":
+        try:
+            params["num_sentences"] = int(request.form.get("num_sentences", "5"))
+        except ValueError:
+            raise InvalidJobError("Number of sentences must be an integer!")
+        params["method"] = request.form.get("method", "auto")
+        if params["method"] not in SUMMARY_METHODS:
+            raise InvalidJobError(f"Unsupported summarization method: {params['method']}")
+    elif operation == "qamodel":
+        params["questions"] = request.form.getlist("questions[]")
+        if not params["questions"]:
+            raise InvalidJobError("Questions are required!")
+    elif operation == "translate":
+        params["target_lang"] = request.form.get("target_lang")
+        if not params["target_lang"]:
+            raise InvalidJobError("Target language is required!")
+    elif operation == "search":
+        params.update(search_params())
+    elif operation == "search_in_document_with_voice":
+        if not request.files.get("audio_file"):
+            raise InvalidJobError("Audio file is required!")
+        params["fuzzy"] = request.form.get("fuzzy", "true") == "true"
+    else:
+        raise InvalidJobError(f"Unsupported job operation: {operation}")
+    return params
 
-UPLOAD_FOLDER = "./uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-ALLOWED_EXTENSIONS = {'pdf', 'txt', 'json', 'xml', 'html', 'csv', 'md'}
+def submit_document_job(operation, params, document_file=None, document_id=None):
+    """Spool the uploads of one job and queue it.
 
-# Pre-load the QA model with error handling
-try:
-    qa_model = pipeline("question-answering", model="distilbert-base-uncased-distilled-squad")
-except Exception as e:
-    print(f"Error loading QA model: {e}")
-    qa_model = None
+    An uploaded document that is already cached is passed by id instead of
+    being written to disk again.
+    """
+    cleanup_paths = []
+    kwargs = dict(params, operation=operation)
+    if document_file:
+        filename = secure_filename(document_file.filename)
+        cached_id = hash_stream(document_file.stream, filename)
+        if document_store.get(cached_id) is not None:
+            kwargs["document_id"] = cached_id
+        else:
+            kwargs["document_path"] = spool_upload(document_file)
+            kwargs["filename"] = filename
+            cleanup_paths.append(kwargs["document_path"])
+    else:
+        if document_store.get(document_id) is None:
+            raise DocumentNotFoundError(document_id)
+        kwargs["document_id"] = document_id
+    if operation == "search_in_document_with_voice":
+        kwargs["audio_path"] = spool_upload(request.files["audio_file"])
+        cleanup_paths.append(kwargs["audio_path"])
+    return job_queue.submit(operation, run_document_job, kwargs, cleanup_paths=cleanup_paths)
 
-# ===== Utility Functions =====
+# ===== Streaming Codecs =====
 
-def allowed_file(filename):
-    """Check if the uploaded file is allowed."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def iter_upload_text(upload, chunk_size=None):
+    """Yield the text of an uploaded file in chunks, decoding it incrementally.
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file."""
-    text = ""
+    The encoding is decided from the first chunk: UTF-8 if it decodes,
+    latin-1 otherwise.
+    """
+    chunk_size = chunk_size or app.config['CODEC_CHUNK_SIZE']
+    stream = upload.stream
+    chunk = stream.read(chunk_size)
+    encoding = "utf-8"
     try:
-        with open(pdf_path, "rb") as file:
-            reader = PyPDF2.PdfReader(file)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-    except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
-    return text
+        chunk.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of a full chunk is not an error
+        if len(chunk) < chunk_size or e.reason != "unexpected end of data":
+            encoding = "latin-1"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while chunk:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+        chunk = stream.read(chunk_size)
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
 
-def summarize_text(text, num_sentences=5):
-    """Summarize the given text using LSA summarizer."""
-    parser = PlaintextParser.from_string(text, Tokenizer("english"))
-    summarizer = LsaSummarizer()
-    summary = summarizer(parser.document, num_sentences)
-    return " ".join(str(sentence) for sentence in summary)
+BASE64_IGNORED_PATTERN = re.compile(r"[^A-Za-z0-9+/=]")
+
+def iter_encode_base64(text_chunks):
+    """Base64-encode UTF-8 text chunk by chunk, carrying bytes over to keep 3-byte groups."""
+    carry = b""
+    for text in text_chunks:
+        data = carry + text.encode("utf-8")
+        cut = len(data) - len(data) % 3
+        carry = data[cut:]
+        if cut:
+            yield base64.b64encode(data[:cut]).decode("ascii")
+    if carry:
+        yield base64.b64encode(carry).decode("ascii")
+
+def iter_decode_base64(text_chunks):
+    """Decode Base64 chunk by chunk, carrying characters over to keep 4-character groups."""
+    carry = ""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for text in text_chunks:
+        # Like b64decode, ignore characters outside the Base64 alphabet
+        data = carry + BASE64_IGNORED_PATTERN.sub("", text)
+        cut = len(data) - len(data) % 4
+        carry = data[cut:]
+        if cut:
+            yield decoder.decode(base64.b64decode(data[:cut]))
+    yield decoder.decode(base64.b64decode(carry) if carry else b"", final=True)
+
+def iter_encode_url(text_chunks):
+    """URL-encode text chunk by chunk."""
+    for text in text_chunks:
+        yield urllib.parse.quote(text)
+
+def iter_decode_url(text_chunks):
+    """URL-decode text chunk by chunk, holding back escapes split across chunks."""
+    carry = ""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for text in text_chunks:
+        data = carry + text
+        cut = data.find("%", max(0, len(data) - 2))
+        if cut == -1:
+            cut = len(data)
+        data, carry = data[:cut], data[cut:]
+        yield decoder.decode(urllib.parse.unquote_to_bytes(data))
+    yield decoder.decode(urllib.parse.unquote_to_bytes(carry), final=True)
+
+def iter_encode_html(text_chunks):
+    """Escape HTML entities chunk by chunk."""
+    for text in text_chunks:
+        yield html.escape(text)
+
+def iter_decode_html(text_chunks):
+    """Unescape HTML entities chunk by chunk, holding back entities split across chunks."""
+    carry = ""
+    for text in text_chunks:
+        data = carry + text
+        cut = data.rfind("&")
+        if cut == -1 or ";" in data[cut:] or len(data) - cut > 64:
+            cut = len(data)
+        data, carry = data[:cut], data[cut:]
+        yield html.unescape(data)
+    yield html.unescape(carry)
+
+def iter_encode_morse(text_chunks):
+    """Encode text to Morse code chunk by chunk."""
+    first = True
+    for text in text_chunks:
+        if text:
+            yield encode_morse(text) if first else " " + encode_morse(text)
+            first = False
+
+def iter_decode_morse(text_chunks):
+    """Decode Morse code chunk by chunk, holding back the last (possibly partial) code.
+
+    Decoding token by token matches decode_morse: a "/" token decodes to the
+    space that separates words.
+    """
+    def decode_chunks():
+        buffer = ""
+        for text in text_chunks:
+            buffer = (buffer + text) if buffer else text.lstrip()
+            # Hold back trailing whitespace and the code before it
+            cut = buffer.rfind(" ", 0, len(buffer.rstrip()))
+            if cut >= 0:
+                yield _decode_morse_tokens(buffer[:cut])
+                buffer = buffer[cut + 1:]
+        yield _decode_morse_tokens(buffer.rstrip())
+    return _strip_stream(decode_chunks())
+
+def _strip_stream(chunks):
+    """Yield text chunks with leading and trailing whitespace of the whole stream removed."""
+    pending = ""
+    started = False
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            started = bool(chunk)
+        stripped = chunk.rstrip()
+        if stripped:
+            yield pending + stripped
+            pending = chunk[len(stripped):]
+        else:
+            pending += chunk
+
+STREAM_ENCODERS = {
+    'base64': iter_encode_base64,
+    'url': iter_encode_url,
+    'html': iter_encode_html,
+    'morse': iter_encode_morse,
+}
+
+STREAM_DECODERS = {
+    'base64': iter_decode_base64,
+    'url': iter_decode_url,
+    'html': iter_decode_html,
+    'morse': iter_decode_morse,
+}
+
+CODEC_STREAM_ERROR_PREFIX = "\nERROR: "
 
-def transcribe_audio(audio_file_path):
-    """Transcribe audio using Google Speech Recognition."""
-    recognizer = sr.Recognizer()
+def guard_codec_stream(first_result, result_chunks, error_message):
+    """Yield a streamed codec result; an error after the response has started ends it with an error line.
+
+    The status code has already been sent by then, so the body ends with
+    CODEC_STREAM_ERROR_PREFIX and the error instead of just being cut off.
+    """
+    yield first_result
     try:
-        with sr.AudioFile(audio_file_path) as source:
-            print("Extracting audio data...")
-            audio_data = recognizer.record(source)
-            return recognizer.recognize_google(audio_data)
+        yield from result_chunks
     except Exception as e:
-        print(f"Error during transcription: {e}")
-        return None
+        print(f"Error running streaming codec: {e}")
+        yield f"{CODEC_STREAM_ERROR_PREFIX}{error_message} {e}\n"
+
+def codec_file_response(codec, error_message):
+    """Run a streaming codec over an uploaded file or cached document.
 
-def read_file(file_path):
-    """Read text from various file formats."""
-    if file_path.endswith(".pdf"):
-        return extract_text_from_pdf(file_path)
+    Text uploads are read straight from the request in chunks instead of
+    being saved and re-read; PDFs and document ids go through the document
+    store. With stream=true the result is streamed back as text/plain,
+    otherwise it is returned as JSON.
+    """
+    document_file = request.files.get('document_file')
+    document_id = request.form.get('document_id')
+    document = None
+    if document_id or document_file.filename.lower().endswith(".pdf"):
+        document = load_document(document_file, document_id, raw=True)
+        if not document:
+            return jsonify({"error": "Could not read the document!"}), 500
+        document_id = document.document_id
+        text_chunks = (text for _, text in document.iter_pages(*requested_page_range(document)))
     else:
+        text_chunks = iter_upload_text(document_file)
+
+    first = next(text_chunks, None)
+    if not first:
+        return jsonify({"error": "Could not read the document!"}), 500
+    result_chunks = codec(itertools.chain([first], text_chunks))
+
+    if request.form.get("stream") == "true":
+        # Input that fails from the start still gets an error status
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                return file.read()
-        except UnicodeDecodeError:
-            # Try another encoding if utf-8 fails
-            with open(file_path, "r", encoding="latin-1") as file:
-                return file.read()
+            first_result = next(result_chunks, "")
         except Exception as e:
-            print(f"Error reading file: {e}")
-            return None
+            print(f"Error running streaming codec: {e}")
+            return jsonify({"error": error_message}), 500
+        headers = {"X-Document-Id": document_id} if document_id else {}
+        return Response(
+            stream_with_context(guard_codec_stream(first_result, result_chunks, error_message)),
+            mimetype="text/plain", headers=headers,
+        )
 
-def encode_base64(text):
-    """Encode text to Base64."""
     try:
-        encoded_bytes = base64.b64encode(text.encode('utf-8'))
-        return encoded_bytes.decode('utf-8')
+        result = "".join(result_chunks)
     except Exception as e:
-        print(f"Error encoding to Base64: {e}")
-        return None
+        print(f"Error running streaming codec: {e}")
+        return jsonify({"error": error_message}), 500
+    body = {"result": result}
+    if document:
+        body.update(document.response_fields())
+    return jsonify(body)
 
-def decode_base64(text):
-    """Decode Base64 text."""
-    try:
-        decoded_bytes = base64.b64decode(text)
-        return decoded_bytes.decode('utf-8')
-    except Exception as e:
-        print(f"Error decoding from Base64: {e}")
-        return None
+# ===== Batch Processing =====
 
-def encode_url(text):
-    """Encode text for URL."""
-    try:
-        return urllib.parse.quote(text)
-    except Exception as e:
-        print(f"Error encoding URL: {e}")
-        return None
+class InvalidBatchError(RequestError):
+    """Raised when a batch request body cannot be parsed."""
 
-def decode_url(text):
-    """Decode URL encoded text."""
-    try:
-        return urllib.parse.unquote(text)
-    except Exception as e:
-        print(f"Error decoding URL: {e}")
-        return None
+    def __str__(self):
+        return self.args[0]
 
-def encode_html(text):
-    """Encode text to HTML entities."""
-    try:
-        return html.escape(text)
-    except Exception as e:
-        print(f"Error encoding HTML: {e}")
-        return None
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
 
-def decode_html(text):
-    """Decode HTML entities to text."""
-    try:
-        return html.unescape(text)
-    except Exception as e:
-        print(f"Error decoding HTML: {e}")
-        return None
+def get_batch_pool():
+    """Return the thread pool shared by the batch endpoints, creating it on first use."""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(max_workers=app.config['BATCH_WORKERS'], thread_name_prefix="docgpt-batch")
+        return _batch_pool
 
-# Morse code dictionaries
-MORSE_CODE_DICT = {
-    'A': '.-', 'B': '-...', 'C': '-.-.', 'D': '-..', 'E': '.', 'F': '..-.', 
-    'G': '--.', 'H': '....', 'I': '..', 'J': '.---', 'K': '-.-', 'L': '.-..', 
-    'M': '--', 'N': '-.', 'O': '---', 'P': '.--.', 'Q': '--.-', 'R': '.-.', 
-    'S': '...', 'T': '-', 'U': '..-', 'V': '...-', 'W': '.--', 'X': '-..-', 
-    'Y': '-.--', 'Z': '--..', '1': '.----', '2': '..---', '3': '...--', 
-    '4': '....-', '5': '.....', '6': '-....', '7': '--...', '8': '---..',
-    '9': '----.', '0': '-----', ' ': '/', '.': '.-.-.-', ',': '--..--', 
-    '?': '..--..', "'": '.----.', '!': '-.-.--', '/': '-..-.', '(': '-.--.', 
-    ')': '-.--.-', '&': '.-...', ':': '---...', ';': '-.-.-.', '=': '-...-', 
-    '+': '.-.-.', '-': '-....-', '_': '..--.-', '"': '.-..-.', '$': '...-..-',
-    '@': '.--.-.'
-}
+class MalformedBatchItem:
+    """Stands in for an NDJSON line that is not valid JSON, so only that item fails."""
 
-MORSE_CODE_REVERSE = {value: key for key, value in MORSE_CODE_DICT.items()}
+    def __init__(self, error):
+        self.error = error
 
-def encode_morse(text):
-    """Convert text to Morse code."""
+def _parse_batch_line(line):
     try:
-        text = text.upper()
-        morse = []
-        for char in text:
-            if char in MORSE_CODE_DICT:
-                morse.append(MORSE_CODE_DICT[char])
-            else:
-                morse.append(char)  # Keep characters that aren't in the dictionary
-        return ' '.join(morse)
-    except Exception as e:
-        print(f"Error encoding to Morse: {e}")
-        return None
+        return json.loads(line)
+    except ValueError as e:
+        return MalformedBatchItem(f"Invalid JSON: {e}")
 
-def decode_morse(morse_code):
-    """Convert Morse code to text."""
-    try:
-        morse_code = morse_code.strip()
-        words = morse_code.split(' / ')
-        decoded_text = ''
-        
-        for word in words:
-            chars = word.split(' ')
-            for char in chars:
-                if char in MORSE_CODE_REVERSE:
-                    decoded_text += MORSE_CODE_REVERSE[char]
-                elif char == '':
-                    pass  # Skip empty strings
-                else:
-                    decoded_text += char  # Keep characters that aren't in the dictionary
-            decoded_text += ' '
-            
-        return decoded_text.strip()
-    except Exception as e:
-        print(f"Error decoding from Morse: {e}")
-        return None
+def batch_items():
+    """Return the items of a batch request and the request-level defaults.
+
+    The body is either JSON ({"items": [...], ...defaults}) or NDJSON with
+    one item per line. Items are strings or objects with a "text" field and
+    optional per-item overrides such as "method" or "target_lang". An NDJSON
+    line that is not valid JSON becomes a MalformedBatchItem and is reported
+    as an error for its index.
+    """
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        defaults = dict(request.args)
+        items = [_parse_batch_line(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get("items"), list):
+            raise InvalidBatchError("A JSON body with an items array is required!")
+        items = data.pop("items")
+        defaults = data
+    if len(items) > app.config['BATCH_MAX_ITEMS']:
+        raise InvalidBatchError(f"Batches are limited to {app.config['BATCH_MAX_ITEMS']} items!")
+    return items, defaults
+
+def _item_field(item, defaults, field):
+    value = item.get(field) if isinstance(item, dict) else None
+    return value if value is not None else defaults.get(field)
+
+def run_codec_item(codecs_by_method, item, defaults):
+    """Encode or decode one batch item, raising ValueError on failure."""
+    text = item.get("text") if isinstance(item, dict) else item
+    method = _item_field(item, defaults, "method")
+    if not isinstance(text, str) or not text:
+        raise ValueError("Text must be a non-empty string!")
+    if method not in codecs_by_method:
+        raise ValueError(f"Unsupported method: {method}")
+    result = codecs_by_method[method](text)
+    if result is None:
+        raise ValueError("Conversion failed!")
+    return result
+
+def run_translate_item(item, defaults):
+    """Translate one batch item, raising ValueError on failure."""
+    text = item.get("text") if isinstance(item, dict) else item
+    target_lang = _item_field(item, defaults, "target_lang")
+    if not isinstance(text, str) or not text:
+        raise ValueError("Text must be a non-empty string!")
+    if not target_lang:
+        raise ValueError("Target language is required!")
+    translated_text = translate_text(text, target_lang)
+    if not translated_text:
+        raise ValueError("Translation failed!")
+    return translated_text
+
+def _run_batch_chunk(func, chunk, defaults):
+    results = []
+    for index, item in chunk:
+        if isinstance(item, MalformedBatchItem):
+            results.append({"index": index, "error": item.error})
+            continue
+        try:
+            results.append({"index": index, "result": func(item, defaults)})
+        except Exception as e:
+            results.append({"index": index, "error": str(e)})
+    return results
+
+def stream_batch(func, items, defaults, chunk_size):
+    """Run func over the items on the batch pool and yield NDJSON lines as chunks finish.
+
+    Every line carries the index of its item and either a result or an
+    error, so one bad item never fails the whole batch. The number of
+    chunks in flight is bounded so a large batch cannot monopolize the pool.
+    """
+    pool = get_batch_pool()
+    indexed = list(enumerate(items))
+    in_flight = set()
+    max_in_flight = 2 * app.config['BATCH_WORKERS']
+    for start in range(0, len(indexed), chunk_size):
+        in_flight.add(pool.submit(_run_batch_chunk, func, indexed[start:start + chunk_size], defaults))
+        if len(in_flight) >= max_in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield "".join(json.dumps(result) + "\n" for result in future.result())
+    for future in as_completed(in_flight):
+        yield "".join(json.dumps(result) + "\n" for result in future.result())
+
+def batch_response(func, chunk_size):
+    items, defaults = batch_items()
+    return Response(stream_batch(func, items, defaults, chunk_size), mimetype="application/x-ndjson")
+
+# ===== Serving =====
+
+def shutdown_executors(wait=True):
+    """Stop the job queue and every worker pool; called when a serving process exits.
+
+    Queued work is cancelled. With wait, work that is already running is
+    allowed to finish first.
+    """
+    job_queue.shutdown(wait=wait)
+    for pool in (_batch_pool, _translation_pool, _speech_pool, _summary_pool, _corpus_pool, _pdf_pool):
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+def _result_cache_lookups():
+    stats = result_cache.stats()
+    return {("memory_hit",): stats["memory_hits"], ("disk_hit",): stats["disk_hits"], ("miss",): stats["misses"]}
+
+def _cached_indexes():
+    with _document_indexes_lock:
+        return dict(Counter((artifact,) for artifact, _ in _document_indexes))
+
+metrics.gauge("docgpt_result_cache_entries", "Results held in the in-memory result cache.", lambda: result_cache.stats()["entries"])
+metrics.gauge("docgpt_result_cache_lookups_total", "Result cache lookups by outcome.", _result_cache_lookups, ("result",), kind="counter")
+metrics.gauge("docgpt_jobs", "Background jobs by status.", lambda: {(status,): count for status, count in job_queue.counts().items()}, ("status",))
+metrics.gauge("docgpt_job_queue_capacity", "Jobs that may be queued or running at once.", lambda: job_queue.max_pending)
+metrics.gauge("docgpt_document_indexes_cached", "Document indexes held in memory, by kind.", _cached_indexes, ("index",))
+metrics.gauge("docgpt_corpus_indexes_cached", "Corpus indexes held in memory.", lambda: len(_corpus_indexes))
+metrics.gauge("docgpt_translation_memory_entries", "Translated chunks held in the translation memory.", lambda: len(_translation_memory))
+metrics.gauge("docgpt_model_loaded", "Whether each model is loaded (1) or not (0).", lambda: {(name,): state == "loaded" for name, state in model_registry.status().items()}, ("model",))
+metrics.gauge("docgpt_profiling_sample_rate", "Fraction of requests run under cProfile.", lambda: request_profiler.sample_rate)
 
 # ===== Flask API Routes =====
 
@@ -201,208 +3634,332 @@ def home():
             "/summarize - Summarize a document",
             "/encode - Encode text using various methods",
             "/decode - Decode text using various methods",
-            "/translate - Translate text to different languages"
+            "/translate - Translate text to different languages",
+            "/search - Search a document for a keyword or phrase",
+            "/corpus - Group documents into a corpus for questions and summaries across all of them",
+            "/metrics - Prometheus metrics",
+            "/transcribe - Transcribe an audio file with timestamps",
+            "/jobs - Run summarize, qamodel, translate or search in the background"
         ]
     })
 
+@app.errorhandler(RequestError)
+def request_error(error):
+    return jsonify({"error": str(error)}), error.status_code
+
+def request_endpoint():
+    """The route pattern of the current request, so ids in URLs do not become separate series."""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiler = request_profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    if not app.config['METRICS_ENABLED']:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request_endpoint()
+    request_count.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    request_duration.observe(elapsed, endpoint=endpoint)
+    # Lets a client see where the time of a slow request went
+    timings = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in g.get("stage_timings", {}).items()]
+    response.headers["Server-Timing"] = ", ".join(timings + [f"total;dur={elapsed * 1000:.1f}"])
+    return response
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    # Runs even when the view raised, and after a streamed response is fully sent
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        request_profiler.finish(profiler, request_endpoint(), time.perf_counter() - g.request_started)
+
 @app.route("/upload", methods=["POST"])
 def upload_file():
     """Handle file uploads for summarization."""
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part!"}), 400
-
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No file selected!"}), 400
+    document_id = request.form.get("document_id")
+    if not document_id:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file part!"}), 400
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "No file selected!"}), 400
 
-        text = read_file(file_path)
-        summary_length = int(request.form.get("summary_length", 5))
-        summary = summarize_text(text, summary_length)
+        if not allowed_file(file.filename):
+            return jsonify({"error": "Invalid file type!"}), 400
+    else:
+        file = None
 
-        os.remove(file_path)
-        return jsonify({"summary": summary})
+    document = load_document(file, document_id)
+    if document is None:
+        return jsonify({"error": "Could not read the document!"}), 500
 
-    return jsonify({"error": "Invalid file type!"}), 400
+    summary_length = int(request.form.get("summary_length", 5))
+    method = request.form.get("method", "auto")
+    if method not in SUMMARY_METHODS:
+        return jsonify({"error": f"Unsupported summarization method: {method}"}), 400
+    return jsonify(summarize_document(document, summary_length, *requested_page_range(document), method=method))
 
 @app.route("/comparefile", methods=["POST"])
 def compare_files():
     """Compare two uploaded files and return the differences."""
     file1 = request.files.get("file1")
     file2 = request.files.get("file2")
+    document_id1 = request.form.get("document_id1")
+    document_id2 = request.form.get("document_id2")
 
-    if not file1 or not file2:
+    if not (file1 or document_id1) or not (file2 or document_id2):
         return jsonify({"error": "Both files are required!"}), 400
 
-    file1_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file1.filename))
-    file2_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file2.filename))
-    file1.save(file1_path)
-    file2.save(file2_path)
+    mode = request.form.get("mode", "diff")
+    if mode not in ("diff", "summary"):
+        return jsonify({"error": f"Unsupported comparison mode: {mode}"}), 400
+    try:
+        context_lines = int(request.form.get("context_lines", 3))
+    except ValueError:
+        return jsonify({"error": "Number of context lines must be an integer!"}), 400
+    if context_lines < 0:
+        return jsonify({"error": "Number of context lines must not be negative!"}), 400
 
-    text1 = read_file(file1_path)
-    text2 = read_file(file2_path)
+    requested_page_range()
+    # Files are compared as they are, not as the text extracted from their format
+    document1 = load_document(file1, document_id1, raw=True)
+    document2 = load_document(file2, document_id2, raw=True)
 
-    if text1 is None or text2 is None:
+    if document1 is None or document2 is None:
         return jsonify({"error": "Error reading one or both files!"}), 500
+    page_range = requested_page_range(document1, document2)
 
     # Find line-by-line differences
-    diff = difflib.unified_diff(text1.splitlines(), text2.splitlines(), fromfile="File 1", tofile="File 2", lineterm="")
-    comparison_result = "\n".join(diff)
+    lines1 = [line for _, text in document1.iter_pages(*page_range) for line in text.splitlines()]
+    lines2 = [line for _, text in document2.iter_pages(*page_range) for line in text.splitlines()]
+    if mode == "summary":
+        return jsonify(dict(diff_summary(lines1, lines2), **document1.response_fields("1"), **document2.response_fields("2")))
 
-    os.remove(file1_path)
-    os.remove(file2_path)
+    details = {"approximate": False}
+    diff = unified_diff(lines1, lines2, fromfile="File 1", tofile="File 2", n=context_lines, details=details)
+    if request.form.get("stream") == "true":
+        return Response((line + "\n" for line in diff), mimetype="text/plain", headers={
+            "X-Document-Id1": document1.document_id,
+            "X-Document-Id2": document2.document_id,
+        })
+    comparison_result = "\n".join(diff)
 
-    return jsonify({"comparison_result": comparison_result})
+    return jsonify({
+        "comparison_result": comparison_result,
+        "approximate": details["approximate"],
+        **document1.response_fields("1"),
+        **document2.response_fields("2"),
+    })
 
 @app.route("/search_in_document_with_voice", methods=["POST"])
 def search_in_document_with_voice():
     """Search for a keyword in the document based on audio transcription."""
     audio_file = request.files.get("audio_file")
     document_file = request.files.get("document_file")
+    document_id = request.form.get("document_id")
 
-    if not audio_file or not document_file:
+    if not audio_file or not (document_file or document_id):
         return jsonify({"error": "Both audio file and document file are required!"}), 400
 
-    audio_file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(audio_file.filename))
-    document_file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(document_file.filename))
-    audio_file.save(audio_file_path)
-    document_file.save(document_file_path)
-
     try:
-        transcribed_keyword = transcribe_audio(audio_file_path)
+        transcribed_keyword = transcribe_audio(audio_file.stream)
         if not transcribed_keyword:
             return jsonify({"error": "Failed to transcribe audio!"}), 400
 
-        document_text = read_file(document_file_path)
-        if not document_text:
+        document = load_document(document_file, document_id)
+        if not document:
             return jsonify({"error": "Failed to read document!"}), 400
 
-        # Check if the keyword is in the document
-        search_result = "Keyword found in document." if transcribed_keyword.lower() in document_text.lower() else "Keyword not found in document."
-        
+        return jsonify(voice_search_result(document, transcribed_keyword, *requested_page_range(document), fuzzy=request.form.get("fuzzy", "true") == "true"))
+    except RequestError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@app.route("/transcribe", methods=["POST"])
+def transcribe_endpoint():
+    """Transcribe an audio file into timestamped segments."""
+    audio_file = request.files.get("audio_file")
+    if not audio_file:
+        return jsonify({"error": "Audio file is required!"}), 400
+
+    try:
+        segments = transcribe_audio_segments(audio_file.stream)
         return jsonify({
-            "transcribed_keyword": transcribed_keyword,
-            "search_result": search_result
+            "text": " ".join(segment["text"] for segment in segments if segment["text"]),
+            "segments": segments,
+            "backend": app.config['SPEECH_BACKEND']
         })
+    except Exception as e:
+        return jsonify({"error": f"Transcription error: {str(e)}"}), 500
+
+@app.route("/search", methods=["POST"])
+def search_endpoint():
+    """Search a document for a keyword or phrase."""
+    document_file = request.files.get("document_file")
+    document_id = request.form.get("document_id")
+    if not (document_file or document_id):
+        return jsonify({"error": "Document file is required!"}), 400
+
+    params = search_params()
+    requested_page_range()
+    try:
+        document = load_document(document_file, document_id)
+        if not document:
+            return jsonify({"error": "Failed to read document!"}), 400
+        first_page, max_pages = requested_page_range(document)
+        return jsonify(search_document(document, first_page=first_page, max_pages=max_pages, **params))
+    except RequestError:
+        raise
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
-    finally:
-        # Clean up temporary files
-        if os.path.exists(audio_file_path):
-            os.remove(audio_file_path)
-        if os.path.exists(document_file_path):
-            os.remove(document_file_path)
 
 @app.route("/qamodel", methods=["POST"])
 def qa_model_endpoint():
     """Answer questions based on the provided context."""
     document_file = request.files.get("document_file")
+    document_id = request.form.get("document_id")
     questions = request.form.getlist("questions[]")
 
-    if not document_file or not questions:
+    if not (document_file or document_id) or not questions:
         return jsonify({"error": "Document file and questions are required!"}), 400
 
-    document_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(document_file.filename))
-    document_file.save(document_path)
-
     try:
-        context = read_file(document_path)
-        if not context:
+        document = load_document(document_file, document_id)
+        if not document:
             return jsonify({"error": "Could not read the document!"}), 500
 
-        if qa_model is None:
+        if get_qa_model() is None:
             return jsonify({"error": "QA model failed to initialize!"}), 500
 
-        answers = []
-        for q in questions:
-            try:
-                answer = qa_model(question=q, context=context)["answer"]
-                answers.append({"question": q, "answer": answer})
-            except Exception as e:
-                answers.append({"question": q, "answer": f"Error processing this question: {str(e)}"})
-
-        return jsonify({"answers": answers})
+        return jsonify(answer_document_questions(document, questions, *requested_page_range(document)))
 
+    except RequestError:
+        raise
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
-    finally:
-        if os.path.exists(document_path):
-            os.remove(document_path)
 
 @app.route("/summarize", methods=["POST"])
 def summarize():
     """Summarize the text content of an uploaded document."""
     document_file = request.files.get("document_file")
+    document_id = request.form.get("document_id")
     num_sentences = request.form.get("num_sentences", "5")
+    method = request.form.get("method", "auto")
     
-    if not document_file:
+    if not document_file and not document_id:
         return jsonify({"error": "Document file is required!"}), 400
     
+    if method not in SUMMARY_METHODS:
+        return jsonify({"error": f"Unsupported summarization method: {method}"}), 400
+    
     try:
         num_sentences = int(num_sentences)
     except ValueError:
         return jsonify({"error": "Number of sentences must be an integer!"}), 400
     
-    document_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(document_file.filename))
-    document_file.save(document_path)
-    
     try:
-        text = read_file(document_path)
-        if not text:
+        document = load_document(document_file, document_id)
+        if not document:
             return jsonify({"error": "Could not read the document!"}), 500
         
-        summary = summarize_text(text, num_sentences)
-        return jsonify({"summary": summary})
+        return jsonify(summarize_document(document, num_sentences, *requested_page_range(document), method=method))
     
+    except RequestError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@app.route("/corpus", methods=["POST"])
+def create_corpus_endpoint():
+    """Cache several documents at once and return the id of a corpus grouping them."""
+    document_files = request.files.getlist("document_files[]")
+    document_ids = request.form.getlist("document_ids[]")
+    corpus_id = request.form.get("corpus_id")
+
+    if not (document_files or document_ids or corpus_id):
+        return jsonify({"error": "Document files or document ids are required!"}), 400
+
+    invalid = [document_file.filename for document_file in document_files if not allowed_file(document_file.filename)]
+    if invalid:
+        return jsonify({"error": f"Invalid file type: {', '.join(invalid)}"}), 400
+
+    try:
+        corpus, unreadable = create_corpus(document_files, document_ids, corpus_id)
+        return jsonify(dict(corpus.to_dict(), unreadable=unreadable))
+
+    except RequestError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@app.route("/corpus/<corpus_id>", methods=["GET"])
+def corpus_manifest(corpus_id):
+    return jsonify(load_corpus(corpus_id).to_dict())
+
+@app.route("/corpus/<corpus_id>/qamodel", methods=["POST"])
+def corpus_qa_endpoint(corpus_id):
+    """Answer questions across every document of a corpus."""
+    questions = request.form.getlist("questions[]")
+    if not questions:
+        return jsonify({"error": "Questions are required!"}), 400
+
+    corpus = load_corpus(corpus_id)
+    try:
+        if get_qa_model() is None:
+            return jsonify({"error": "QA model failed to initialize!"}), 500
+
+        return jsonify(answer_corpus_questions(corpus, questions))
+
+    except RequestError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@app.route("/corpus/<corpus_id>/summarize", methods=["POST"])
+def corpus_summarize_endpoint(corpus_id):
+    """Summarize a corpus, or the passages of it most relevant to a query."""
+    num_sentences = request.form.get("num_sentences", "5")
+    method = request.form.get("method", "auto")
+    query = request.form.get("query") or None
+
+    if method not in SUMMARY_METHODS:
+        return jsonify({"error": f"Unsupported summarization method: {method}"}), 400
+
+    try:
+        num_sentences = int(num_sentences)
+    except ValueError:
+        return jsonify({"error": "Number of sentences must be an integer!"}), 400
+
+    corpus = load_corpus(corpus_id)
+    try:
+        return jsonify(summarize_corpus(corpus, num_sentences, query, method))
+
+    except RequestError:
+        raise
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
-    finally:
-        if os.path.exists(document_path):
-            os.remove(document_path)
 
 @app.route("/encode", methods=["POST"])
 def encode():
     """Encode text using the specified method."""
-    # Check if file upload is provided
-    if 'document_file' in request.files:
-        document_file = request.files['document_file']
+    # Check if file upload or a cached document is provided
+    if 'document_file' in request.files or request.form.get('document_id'):
+        document_file = request.files.get('document_file')
+        document_id = request.form.get('document_id')
         method = request.form.get('method')
         
-        if not document_file or not method:
+        if not (document_file or document_id) or not method:
             return jsonify({"error": "Document file and method are required!"}), 400
-            
-        document_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(document_file.filename))
-        document_file.save(document_path)
-        
-        try:
-            text = read_file(document_path)
-            if not text:
-                return jsonify({"error": "Could not read the document!"}), 500
-            
-            # Now encode the text from the file
-            result = None
-            if method == 'base64':
-                result = encode_base64(text)
-            elif method == 'url':
-                result = encode_url(text)
-            elif method == 'html':
-                result = encode_html(text)
-            elif method == 'morse':
-                result = encode_morse(text)
-            else:
-                return jsonify({"error": f"Unsupported encoding method: {method}"}), 400
-                
-            if result is None:
-                return jsonify({"error": "Encoding failed!"}), 500
-                
-            return jsonify({"result": result})
-        finally:
-            if os.path.exists(document_path):
-                os.remove(document_path)
+
+        if method not in STREAM_ENCODERS:
+            return jsonify({"error": f"Unsupported encoding method: {method}"}), 400
+
+        return codec_file_response(STREAM_ENCODERS[method], "Encoding failed!")
     
     # If no file, check for direct text input in JSON
     else:
@@ -416,17 +3973,10 @@ def encode():
         if not text:
             return jsonify({"error": "Text cannot be empty!"}), 400
         
-        result = None
-        if method == 'base64':
-            result = encode_base64(text)
-        elif method == 'url':
-            result = encode_url(text)
-        elif method == 'html':
-            result = encode_html(text)
-        elif method == 'morse':
-            result = encode_morse(text)
-        else:
+        if method not in ENCODERS:
             return jsonify({"error": f"Unsupported encoding method: {method}"}), 400
+
+        result = ENCODERS[method](text)
         
         if result is None:
             return jsonify({"error": "Encoding failed!"}), 500
@@ -436,42 +3986,19 @@ def encode():
 @app.route("/decode", methods=["POST"])
 def decode():
     """Decode text using the specified method."""
-    # Check if file upload is provided
-    if 'document_file' in request.files:
-        document_file = request.files['document_file']
+    # Check if file upload or a cached document is provided
+    if 'document_file' in request.files or request.form.get('document_id'):
+        document_file = request.files.get('document_file')
+        document_id = request.form.get('document_id')
         method = request.form.get('method')
         
-        if not document_file or not method:
+        if not (document_file or document_id) or not method:
             return jsonify({"error": "Document file and method are required!"}), 400
-            
-        document_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(document_file.filename))
-        document_file.save(document_path)
-        
-        try:
-            text = read_file(document_path)
-            if not text:
-                return jsonify({"error": "Could not read the document!"}), 500
-            
-            # Now decode the text from the file
-            result = None
-            if method == 'base64':
-                result = decode_base64(text)
-            elif method == 'url':
-                result = decode_url(text)
-            elif method == 'html':
-                result = decode_html(text)
-            elif method == 'morse':
-                result = decode_morse(text)
-            else:
-                return jsonify({"error": f"Unsupported decoding method: {method}"}), 400
-                
-            if result is None:
-                return jsonify({"error": "Decoding failed!"}), 500
-                
-            return jsonify({"result": result})
-        finally:
-            if os.path.exists(document_path):
-                os.remove(document_path)
+
+        if method not in STREAM_DECODERS:
+            return jsonify({"error": f"Unsupported decoding method: {method}"}), 400
+
+        return codec_file_response(STREAM_DECODERS[method], "Decoding failed!")
     
     # If no file, check for direct text input in JSON
     else:
@@ -485,17 +4012,10 @@ def decode():
         if not text:
             return jsonify({"error": "Text cannot be empty!"}), 400
         
-        result = None
-        if method == 'base64':
-            result = decode_base64(text)
-        elif method == 'url':
-            result = decode_url(text)
-        elif method == 'html':
-            result = decode_html(text)
-        elif method == 'morse':
-            result = decode_morse(text)
-        else:
+        if method not in DECODERS:
             return jsonify({"error": f"Unsupported decoding method: {method}"}), 400
+
+        result = DECODERS[method](text)
         
         if result is None:
             return jsonify({"error": "Decoding failed!"}), 500
@@ -505,37 +4025,30 @@ def decode():
 @app.route("/translate", methods=["POST"])
 def translate():
     """Translate text to the specified language."""
-    # Check if file upload is provided
-    if 'document_file' in request.files:
-        document_file = request.files['document_file']
+    # Check if file upload or a cached document is provided
+    if 'document_file' in request.files or request.form.get('document_id'):
+        document_file = request.files.get('document_file')
+        document_id = request.form.get('document_id')
         target_lang = request.form.get('target_lang')
         
-        if not document_file or not target_lang:
+        if not (document_file or document_id) or not target_lang:
             return jsonify({"error": "Document file and target language are required!"}), 400
             
-        document_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(document_file.filename))
-        document_file.save(document_path)
+        document = load_document(document_file, document_id)
+        if not document:
+            return jsonify({"error": "Could not read the document!"}), 500
+        text = document.page_text(*requested_page_range(document))
         
+        # Now translate the text from the file
         try:
-            text = read_file(document_path)
-            if not text:
-                return jsonify({"error": "Could not read the document!"}), 500
+            translated_text = translate_text(text, target_lang)
             
-            # Now translate the text from the file
-            try:
-                translator = GoogleTranslator(source='auto', target=target_lang)
-                translated_text = translator.translate(text)
-                
-                if not translated_text:
-                    return jsonify({"error": "Translation failed!"}), 500
-                
-                return jsonify({"translated_text": translated_text})
-            except Exception as e:
-                return jsonify({"error": f"Translation error: {str(e)}"}), 500
-                
-        finally:
-            if os.path.exists(document_path):
-                os.remove(document_path)
+            if not translated_text:
+                return jsonify({"error": "Translation failed!"}), 500
+            
+            return jsonify(dict(document.response_fields(), translated_text=translated_text))
+        except Exception as e:
+            return jsonify({"error": f"Translation error: {str(e)}"}), 500
     
     # If no file, check for direct text input in JSON
     else:
@@ -550,8 +4063,7 @@ def translate():
             return jsonify({"error": "Text cannot be empty!"}), 400
         
         try:
-            translator = GoogleTranslator(source='auto', target=target_lang)
-            translated_text = translator.translate(text)
+            translated_text = translate_text(text, target_lang)
             
             if not translated_text:
                 return jsonify({"error": "Translation failed!"}), 500
@@ -561,5 +4073,114 @@ def translate():
         except Exception as e:
             return jsonify({"error": f"Translation error: {str(e)}"}), 500
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe reporting the load state of every model."""
+    return jsonify({"ready": model_registry.ready(), "models": model_registry.status()}), 200 if model_registry.ready() else 503
+
+@app.route("/models/warmup", methods=["POST"])
+def warmup_models():
+    """Load every model and run its warmup step."""
+    model_registry.load_all(warmup=True)
+    return ready()
+
+@app.route("/encode/batch", methods=["POST"])
+def encode_batch():
+    """Encode many texts, streaming one NDJSON result line per item as they finish."""
+    return batch_response(lambda item, defaults: run_codec_item(ENCODERS, item, defaults), app.config['BATCH_CHUNK_SIZE'])
+
+@app.route("/decode/batch", methods=["POST"])
+def decode_batch():
+    """Decode many texts, streaming one NDJSON result line per item as they finish."""
+    return batch_response(lambda item, defaults: run_codec_item(DECODERS, item, defaults), app.config['BATCH_CHUNK_SIZE'])
+
+@app.route("/translate/batch", methods=["POST"])
+def translate_batch():
+    """Translate many texts, streaming one NDJSON result line per item as they finish."""
+    # Translations are network-bound, so every item is its own task
+    return batch_response(run_translate_item, 1)
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    """Hit and miss counters of the result cache."""
+    return jsonify(result_cache.stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Request, stage, cache, queue and model metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/debug/profiling", methods=["GET", "POST"])
+def profiling_control():
+    """Show recent request profiles, or set the fraction of requests that are profiled."""
+    if not app.config['PROFILING_CONTROL']:
+        return jsonify({"error": "Profiling control is disabled!"}), 403
+    if request.method == "POST":
+        data = request.get_json(silent=True) or request.form
+        try:
+            sample_rate = float(data.get("sample_rate", ""))
+        except (TypeError, ValueError):
+            return jsonify({"error": "sample_rate must be a number between 0 and 1!"}), 400
+        if not 0 <= sample_rate <= 1:
+            return jsonify({"error": "sample_rate must be a number between 0 and 1!"}), 400
+        request_profiler.sample_rate = sample_rate
+    return jsonify({"sample_rate": request_profiler.sample_rate, "profiles": list(request_profiler.profiles)})
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a long-running document operation and return its job id."""
+    operation = request.form.get("operation")
+    document_file = request.files.get("document_file")
+    document_id = request.form.get("document_id")
+
+    if not operation or not (document_file or document_id):
+        return jsonify({"error": "Operation and document file are required!"}), 400
+
+    job = submit_document_job(operation, job_params(operation), document_file, document_id)
+    return jsonify(job.to_dict()), 202
+
+@app.route("/jobs/batch", methods=["POST"])
+def submit_job_batch():
+    """Queue the same operation for every uploaded document or document id."""
+    operation = request.form.get("operation")
+    document_files = [file for file in request.files.getlist("document_file") if file.filename]
+    document_ids = request.form.getlist("document_id")
+
+    if not operation or not (document_files or document_ids):
+        return jsonify({"error": "Operation and document files are required!"}), 400
+
+    params = job_params(operation)
+    jobs = []
+    for document_file, document_id in [(file, None) for file in document_files] + [(None, id_) for id_ in document_ids]:
+        try:
+            jobs.append(submit_document_job(operation, params, document_file, document_id).to_dict())
+        except RequestError as e:
+            jobs.append({"error": str(e), "document_id": document_id, "filename": document_file and document_file.filename})
+    return jsonify({"jobs": jobs}), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Return the status of a job, including its result once it has succeeded."""
+    return jsonify(job_queue.get(job_id).to_dict())
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    """Return the result of a job, or its status while it is still pending."""
+    job = job_queue.get(job_id)
+    if job.status == "succeeded":
+        return jsonify(job.result)
+    if job.status in ("queued", "running"):
+        return jsonify(job.to_dict()), 202
+    status_codes = {"failed": 500, "cancelled": 409, "timed_out": 504}
+    return jsonify(job.to_dict()), status_codes[job.status]
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    return jsonify(job_queue.cancel(job_id).to_dict())
+
+if app.config['MODEL_LOADING'] == "eager":
+    model_registry.load_all(warmup=app.config['MODEL_WARMUP'])
+
 if __name__ == "__main__":
     app.run(debug=True)
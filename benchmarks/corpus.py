@@ -0,0 +1,150 @@
+"""Synthetic benchmark inputs, generated locally and deterministically.
+
+Every generator takes a seed, so two runs of the suite measure the same
+bytes and their results can be compared.
+"""
+import io
+import json
+import random
+import wave
+
+import numpy as np
+
+WORDS = (
+    "document", "model", "server", "request", "summary", "answer", "page", "index",
+    "language", "worker", "memory", "latency", "search", "token", "cache", "thread",
+    "analysis", "contract", "section", "revenue", "policy", "report", "quarter", "customer",
+)
+
+
+def sentences(count, seed=0):
+    """Return count sentences of 8 to 20 words drawn from a fixed vocabulary."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        result.append(" ".join(words).capitalize() + ".")
+    return result
+
+
+def text_document(sentence_count, seed=0):
+    """Plain text with a paragraph break every eight sentences."""
+    parts = sentences(sentence_count, seed)
+    return "\n\n".join(" ".join(parts[i:i + 8]) for i in range(0, len(parts), 8))
+
+
+def csv_document(rows, seed=0):
+    rng = random.Random(seed)
+    lines = ["id,name,region,amount,notes"]
+    for row in range(rows):
+        lines.append(f"{row},{rng.choice(WORDS)},{rng.choice(WORDS)},{rng.randint(1, 100000) / 100},{' '.join(rng.sample(WORDS, 4))}")
+    return "\n".join(lines) + "\n"
+
+
+def json_document(records, seed=0):
+    rng = random.Random(seed)
+    return json.dumps([
+        {"id": record, "title": " ".join(rng.sample(WORDS, 3)), "body": " ".join(sentences(2, seed + record))}
+        for record in range(records)
+    ], indent=1)
+
+
+def xml_document(records, seed=0):
+    rng = random.Random(seed)
+    items = "".join(
+        f'<record id="{record}"><title>{" ".join(rng.sample(WORDS, 3))}</title><body>{" ".join(sentences(2, seed + record))}</body></record>\n'
+        for record in range(records)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<records>\n{items}</records>\n'
+
+
+def html_document(sections, seed=0):
+    rng = random.Random(seed)
+    body = "".join(
+        f"<section><h2>{' '.join(rng.sample(WORDS, 3))}</h2><p>{' '.join(sentences(4, seed + section))}</p>"
+        f"<script>track({section});</script></section>\n"
+        for section in range(sections)
+    )
+    return f"<!DOCTYPE html><html><head><title>Report</title><style>p {{ margin: 0; }}</style></head><body>\n{body}</body></html>\n"
+
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_document(pages, lines_per_page=40, seed=0):
+    """Return the bytes of a PDF with one Helvetica text stream per page."""
+    rng = random.Random(seed)
+    page_count = max(1, pages)
+    font_id = 3 + 2 * page_count
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(page_count))}] /Count {page_count} >>".encode(),
+    ]
+    for page in range(page_count):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(10)) for _ in range(lines_per_page)]
+        content = "BT /F1 10 Tf 50 750 Td 14 TL " + " ".join(f"({_pdf_string(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * page} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def edited_copy(text, edit_ratio=0.05, seed=0):
+    """Return text with about edit_ratio of its lines inserted, deleted or replaced."""
+    rng = random.Random(seed)
+    lines = text.split("\n")
+    edited = []
+    for line in lines:
+        roll = rng.random()
+        if roll < edit_ratio / 3:
+            continue
+        if roll < 2 * edit_ratio / 3:
+            edited.append(" ".join(rng.sample(WORDS, 6)))
+        elif roll < edit_ratio:
+            edited.append(line)
+            edited.append(" ".join(rng.sample(WORDS, 6)))
+        else:
+            edited.append(line)
+    return "\n".join(edited)
+
+
+def diff_pair(lines, edit_ratio=0.05, seed=0):
+    """Two versions of a document of the given line count."""
+    original = "\n".join(sentences(lines, seed))
+    return original, edited_copy(original, edit_ratio, seed + 1)
+
+
+def wav_audio(seconds, sample_rate=16000, seed=0):
+    """Mono 16-bit WAV bytes: tone bursts of random length separated by silence."""
+    rng = random.Random(seed)
+    chunks = []
+    total = int(seconds * sample_rate)
+    length = 0
+    while length < total:
+        burst = np.arange(int(rng.uniform(0.3, 1.5) * sample_rate))
+        chunks.append(8000 * np.sin(2 * np.pi * rng.uniform(150, 400) * burst / sample_rate))
+        chunks.append(np.zeros(int(rng.uniform(0.1, 0.6) * sample_rate)))
+        length += len(chunks[-2]) + len(chunks[-1])
+    samples = np.concatenate(chunks)[:total].astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(samples.tobytes())
+    return buffer.getvalue()
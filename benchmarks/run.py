@@ -0,0 +1,569 @@
+"""DocGPT benchmark suite.
+
+Generates synthetic corpora locally, then times the document helpers and the
+API routes (through Flask's test client). Each benchmark reports latency
+percentiles, throughput and the peak Python memory of one run, measured
+with tracemalloc. Results can be written as JSON and compared against an
+earlier run to catch regressions:
+
+    python benchmarks/run.py --output baseline.json
+    python benchmarks/run.py --baseline baseline.json --threshold 0.2
+
+Benchmarks whose dependencies are unavailable, such as a model that cannot
+be downloaded, are reported as skipped instead of failing the run.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+import corpus
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = []
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark factory when the benchmark cannot run here."""
+
+
+def benchmark(group, name, size=None):
+    """Register a benchmark factory.
+
+    The factory receives the Context and returns run(i), or a (run,
+    before_each) pair when state must be reset, untimed, before every
+    iteration. size(ctx) optionally gives the bytes processed per run, for
+    a MB/s figure.
+    """
+    def register(factory):
+        CASES.append({"group": group, "name": name, "factory": factory, "size": size})
+        return factory
+    return register
+
+
+class Context:
+    """Shared state of a run: the imported app, a test client and the generated inputs."""
+
+    def __init__(self, docgpt, workdir, scale):
+        self.app = docgpt
+        self.client = docgpt.app.test_client()
+        self.workdir = workdir
+        self.scale = scale
+        self._files = {}
+
+    def scaled(self, value):
+        return max(1, int(value * self.scale))
+
+    def file(self, name, make):
+        """Write generated content to the work directory once and return (path, bytes)."""
+        if name not in self._files:
+            content = make()
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            path = os.path.join(self.workdir, name)
+            with open(path, "wb") as file:
+                file.write(content)
+            self._files[name] = (path, content)
+        return self._files[name]
+
+    def text(self):
+        return self.file("document.txt", lambda: corpus.text_document(self.scaled(2000)))
+
+    def pdf(self, pages):
+        return self.file(f"document-{pages}.pdf", lambda: corpus.pdf_document(pages))
+
+    def audio(self):
+        return self.file("audio.wav", lambda: corpus.wav_audio(self.scaled(60)))
+
+    def reset_caches(self):
+        """Forget every cached document, index, result and translation."""
+        docgpt = self.app
+        shutil.rmtree(docgpt.document_store.root, ignore_errors=True)
+        os.makedirs(docgpt.document_store.root, exist_ok=True)
+        docgpt.result_cache._entries.clear()
+        docgpt._document_indexes.clear()
+        docgpt._translation_memory.clear()
+
+    def post(self, path, **kwargs):
+        response = self.client.post(path, **kwargs)
+        response.get_data()
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    def upload(self, path, field, filename, content, **form):
+        data = dict(form)
+        data[field] = (BytesIO(content), filename)
+        return self.post(path, data=data, content_type="multipart/form-data")
+
+    def document_id(self, filename, content):
+        """Upload a document once and return its id."""
+        return self.upload("/search", "document_file", filename, content, query="document").get_json()["document_id"]
+
+    def require_model(self, name):
+        if self.app.model_registry.get(name) is None:
+            raise SkipBenchmark(f"{name} model is unavailable")
+
+
+# ===== Helpers =====
+
+@benchmark("helper", "extract_text_from_pdf[10 pages]", size=lambda ctx: len(ctx.pdf(10)[1]))
+def bench_extract_pdf_small(ctx):
+    path, _ = ctx.pdf(10)
+    return lambda i: ctx.app.extract_text_from_pdf(path)
+
+
+@benchmark("helper", "extract_text_from_pdf[200 pages]", size=lambda ctx: len(ctx.pdf(ctx.scaled(200))[1]))
+def bench_extract_pdf_large(ctx):
+    path, _ = ctx.pdf(ctx.scaled(200))
+    return lambda i: ctx.app.extract_text_from_pdf(path)
+
+
+@benchmark("helper", "iter_document_pages[txt]", size=lambda ctx: len(ctx.text()[1]))
+def bench_read_text(ctx):
+    path, _ = ctx.text()
+    return lambda i: list(ctx.app.iter_document_pages(path))
+
+
+@benchmark("helper", "iter_document_pages[csv]", size=lambda ctx: len(ctx.file("table.csv", lambda: corpus.csv_document(ctx.scaled(50000)))[1]))
+def bench_read_csv(ctx):
+    path, _ = ctx.file("table.csv", lambda: corpus.csv_document(ctx.scaled(50000)))
+    return lambda i: list(ctx.app.iter_document_pages(path))
+
+
+@benchmark("helper", "iter_document_pages[json]", size=lambda ctx: len(ctx.file("records.json", lambda: corpus.json_document(ctx.scaled(10000)))[1]))
+def bench_read_json(ctx):
+    path, _ = ctx.file("records.json", lambda: corpus.json_document(ctx.scaled(10000)))
+    return lambda i: list(ctx.app.iter_document_pages(path))
+
+
+@benchmark("helper", "iter_document_pages[xml]", size=lambda ctx: len(ctx.file("records.xml", lambda: corpus.xml_document(ctx.scaled(10000)))[1]))
+def bench_read_xml(ctx):
+    path, _ = ctx.file("records.xml", lambda: corpus.xml_document(ctx.scaled(10000)))
+    return lambda i: list(ctx.app.iter_document_pages(path))
+
+
+@benchmark("helper", "iter_document_pages[html]", size=lambda ctx: len(ctx.file("report.html", lambda: corpus.html_document(ctx.scaled(5000)))[1]))
+def bench_read_html(ctx):
+    path, _ = ctx.file("report.html", lambda: corpus.html_document(ctx.scaled(5000)))
+    return lambda i: list(ctx.app.iter_document_pages(path))
+
+
+@benchmark("helper", "summarize_text[lsa]")
+def bench_summarize_lsa(ctx):
+    ctx.require_model("sentence_tokenizer")
+    text = corpus.text_document(ctx.scaled(300))
+    return lambda i: ctx.app.summarize_text(text, 5, "lsa")
+
+
+@benchmark("helper", "summarize_text[hierarchical]")
+def bench_summarize_hierarchical(ctx):
+    ctx.require_model("sentence_tokenizer")
+    text = ctx.text()[1].decode("utf-8")
+    return lambda i: ctx.app.summarize_text(text, 5, "hierarchical")
+
+
+@benchmark("helper", "answer_questions")
+def bench_answer_questions(ctx):
+    ctx.require_model("qa")
+    text = corpus.text_document(ctx.scaled(200))
+    index = ctx.app.PassageIndex.build(text)
+    return lambda i: ctx.app.answer_questions([f"Which report covers quarter {i}?"], text, index)
+
+
+@benchmark("helper", "unified_diff[2k lines]")
+def bench_unified_diff_small(ctx):
+    a, b = corpus.diff_pair(2000)
+    a, b = a.splitlines(), b.splitlines()
+    return lambda i: list(ctx.app.unified_diff(a, b))
+
+
+@benchmark("helper", "unified_diff[50k lines]")
+def bench_unified_diff_large(ctx):
+    a, b = corpus.diff_pair(ctx.scaled(50000))
+    a, b = a.splitlines(), b.splitlines()
+    return lambda i: list(ctx.app.unified_diff(a, b))
+
+
+@benchmark("helper", "diff_summary[50k lines]")
+def bench_diff_summary(ctx):
+    a, b = corpus.diff_pair(ctx.scaled(50000))
+    a, b = a.splitlines(), b.splitlines()
+    return lambda i: ctx.app.diff_summary(a, b)
+
+
+CODEC_TEXT_CHARS = 200000
+
+
+def codec_text(ctx):
+    return ctx.text()[1].decode("utf-8")[:CODEC_TEXT_CHARS]
+
+
+def register_codec(method):
+    @benchmark("helper", f"encode_{method}", size=lambda ctx: len(codec_text(ctx)))
+    def bench_encode(ctx):
+        text = codec_text(ctx)
+        return lambda i: ctx.app.ENCODERS[method](text)
+
+    @benchmark("helper", f"decode_{method}", size=lambda ctx: len(codec_text(ctx)))
+    def bench_decode(ctx):
+        encoded = ctx.app.ENCODERS[method](codec_text(ctx))
+        return lambda i: ctx.app.DECODERS[method](encoded)
+
+
+for codec_method in ("base64", "url", "html", "morse"):
+    register_codec(codec_method)
+
+
+@benchmark("helper", "encode_morse_batch[1000 items]")
+def bench_morse_batch(ctx):
+    texts = corpus.sentences(1000)
+    return lambda i: ctx.app.encode_morse_batch(texts)
+
+
+@benchmark("helper", "PassageIndex.build", size=lambda ctx: len(ctx.text()[1]))
+def bench_passage_index_build(ctx):
+    text = ctx.text()[1].decode("utf-8")
+    return lambda i: ctx.app.PassageIndex.build(text)
+
+
+@benchmark("helper", "PassageIndex.search")
+def bench_passage_index_search(ctx):
+    index = ctx.app.PassageIndex.build(ctx.text()[1].decode("utf-8"))
+    return lambda i: index.search("quarterly revenue report for the customer", 4)
+
+
+@benchmark("helper", "SearchIndex.build", size=lambda ctx: len(ctx.text()[1]))
+def bench_search_index_build(ctx):
+    text = ctx.text()[1].decode("utf-8")
+    return lambda i: ctx.app.SearchIndex.build([(1, text)])
+
+
+@benchmark("helper", "search_document[phrase]")
+def bench_search_phrase(ctx):
+    document = ctx.app.document_store.get(ctx.document_id("document.txt", ctx.text()[1]))
+    return lambda i: ctx.app.search_document(document, "revenue report")
+
+
+@benchmark("helper", "search_document[fuzzy]")
+def bench_search_fuzzy(ctx):
+    document = ctx.app.document_store.get(ctx.document_id("document.txt", ctx.text()[1]))
+    return lambda i: ctx.app.search_document(document, "revenu reprot", fuzzy=True)
+
+
+@benchmark("helper", "translate_text", size=lambda ctx: len(ctx.text()[1]))
+def bench_translate_text(ctx):
+    text = ctx.text()[1].decode("utf-8")
+    return (lambda i: ctx.app.translate_text(text, "fr")), ctx.app._translation_memory.clear
+
+
+@benchmark("helper", "transcribe_audio_segments", size=lambda ctx: len(ctx.audio()[1]))
+def bench_transcribe(ctx):
+    path, _ = ctx.audio()
+    return lambda i: ctx.app.transcribe_audio_segments(path)
+
+
+# ===== Routes =====
+
+@benchmark("route", "POST /summarize (upload)")
+def bench_route_summarize_upload(ctx):
+    ctx.require_model("sentence_tokenizer")
+    content = corpus.text_document(ctx.scaled(300)).encode("utf-8")
+    run = lambda i: ctx.upload("/summarize", "document_file", "document.txt", content, num_sentences="5")
+    return run, ctx.reset_caches
+
+
+@benchmark("route", "POST /summarize (cached)")
+def bench_route_summarize_cached(ctx):
+    ctx.require_model("sentence_tokenizer")
+    document_id = ctx.document_id("summary.txt", corpus.text_document(ctx.scaled(300)).encode("utf-8"))
+    return lambda i: ctx.post("/summarize", data={"document_id": document_id, "num_sentences": "5"})
+
+
+@benchmark("route", "POST /qamodel")
+def bench_route_qamodel(ctx):
+    ctx.require_model("qa")
+    document_id = ctx.document_id("document.txt", ctx.text()[1])
+    return lambda i: ctx.post("/qamodel", data={"document_id": document_id, "questions[]": f"Which report covers quarter {i}?"})
+
+
+@benchmark("route", "POST /comparefile (diff)")
+def bench_route_compare(ctx):
+    a, b = corpus.diff_pair(ctx.scaled(5000))
+    a, b = a.encode("utf-8"), b.encode("utf-8")
+    return lambda i: ctx.post("/comparefile", data={"file1": (BytesIO(a), "a.txt"), "file2": (BytesIO(b), "b.txt")}, content_type="multipart/form-data")
+
+
+@benchmark("route", "POST /comparefile (summary)")
+def bench_route_compare_summary(ctx):
+    a, b = corpus.diff_pair(ctx.scaled(5000))
+    a, b = a.encode("utf-8"), b.encode("utf-8")
+    return lambda i: ctx.post("/comparefile", data={"file1": (BytesIO(a), "a.txt"), "file2": (BytesIO(b), "b.txt"), "mode": "summary"}, content_type="multipart/form-data")
+
+
+@benchmark("route", "POST /encode (json)")
+def bench_route_encode_json(ctx):
+    text = codec_text(ctx)[:5000]
+    return lambda i: ctx.post("/encode", json={"text": text, "method": "base64"})
+
+
+@benchmark("route", "POST /decode (json)")
+def bench_route_decode_json(ctx):
+    encoded = ctx.app.encode_morse(codec_text(ctx)[:5000])
+    return lambda i: ctx.post("/decode", json={"text": encoded, "method": "morse"})
+
+
+@benchmark("route", "POST /encode (file, stream)", size=lambda ctx: len(ctx.text()[1]))
+def bench_route_encode_file(ctx):
+    _, content = ctx.text()
+    return lambda i: ctx.upload("/encode", "document_file", "document.txt", content, method="morse", stream="true")
+
+
+@benchmark("route", "POST /encode/batch")
+def bench_route_encode_batch(ctx):
+    items = corpus.sentences(500)
+    return lambda i: ctx.post("/encode/batch", json={"method": "base64", "items": items})
+
+
+@benchmark("route", "POST /translate (json)")
+def bench_route_translate(ctx):
+    text = codec_text(ctx)[:20000]
+    return (lambda i: ctx.post("/translate", json={"text": text, "target_lang": "fr"})), ctx.app._translation_memory.clear
+
+
+@benchmark("route", "POST /search (upload)", size=lambda ctx: len(ctx.text()[1]))
+def bench_route_search_upload(ctx):
+    _, content = ctx.text()
+    run = lambda i: ctx.upload("/search", "document_file", "document.txt", content, query="revenue report")
+    return run, ctx.reset_caches
+
+
+@benchmark("route", "POST /search (cached)")
+def bench_route_search_cached(ctx):
+    document_id = ctx.document_id("document.txt", ctx.text()[1])
+    return lambda i: ctx.post("/search", data={"document_id": document_id, "query": "revenue report", "fuzzy": "true"})
+
+
+@benchmark("route", "POST /upload (pdf)", size=lambda ctx: len(ctx.pdf(ctx.scaled(200))[1]))
+def bench_route_upload_pdf(ctx):
+    ctx.require_model("sentence_tokenizer")
+    _, content = ctx.pdf(ctx.scaled(200))
+    run = lambda i: ctx.upload("/upload", "file", "document.pdf", content)
+    return run, ctx.reset_caches
+
+
+@benchmark("route", "POST /transcribe", size=lambda ctx: len(ctx.audio()[1]))
+def bench_route_transcribe(ctx):
+    _, content = ctx.audio()
+    return lambda i: ctx.upload("/transcribe", "audio_file", "audio.wav", content)
+
+
+@benchmark("route", "POST /search_in_document_with_voice")
+def bench_route_voice_search(ctx):
+    _, audio = ctx.file("short.wav", lambda: corpus.wav_audio(3))
+    document_id = ctx.document_id("document.txt", ctx.text()[1])
+    return lambda i: ctx.upload("/search_in_document_with_voice", "audio_file", "short.wav", audio, document_id=document_id)
+
+
+# ===== Runner =====
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(ctx, case, iterations):
+    """Run one benchmark and return its result record."""
+    result = {"group": case["group"], "name": case["name"]}
+    try:
+        prepared = case["factory"](ctx)
+        size = case["size"](ctx) if case["size"] else None
+    except SkipBenchmark as e:
+        return dict(result, status="skipped", reason=str(e))
+    except Exception as e:
+        return dict(result, status="error", reason=f"{type(e).__name__}: {e}")
+    run, before_each = prepared if isinstance(prepared, tuple) else (prepared, None)
+
+    try:
+        # One untimed run warms up lazy state such as pools and imports
+        if before_each:
+            before_each()
+        run(0)
+
+        timings = []
+        for i in range(1, iterations + 1):
+            if before_each:
+                before_each()
+            gc.collect()
+            start = time.perf_counter()
+            run(i)
+            timings.append(time.perf_counter() - start)
+
+        # Peak memory comes from a separate run since tracing slows everything down
+        if before_each:
+            before_each()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(iterations + 1)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except SkipBenchmark as e:
+        return dict(result, status="skipped", reason=str(e))
+    except Exception as e:
+        return dict(result, status="error", reason=f"{type(e).__name__}: {e}")
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    result.update({
+        "status": "ok",
+        "iterations": iterations,
+        "latency_ms": {
+            "min": timings[0] * 1000,
+            "p50": percentile(timings, 0.50) * 1000,
+            "p90": percentile(timings, 0.90) * 1000,
+            "p99": percentile(timings, 0.99) * 1000,
+            "max": timings[-1] * 1000,
+            "mean": mean * 1000,
+        },
+        "throughput_ops": 1.0 / mean if mean else None,
+        "throughput_mb_s": size / mean / 1e6 if size and mean else None,
+        "peak_memory_mb": peak / 1e6,
+    })
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Print how each benchmark moved against a baseline and return the regressions.
+
+    A benchmark regresses when its median latency or its peak memory grew
+    by more than threshold (a fraction) over the baseline.
+    """
+    previous = {record["name"]: record for record in baseline["results"] if record.get("status") == "ok"}
+    regressions = []
+    print(f"\n{'benchmark':<44} {'p50 change':>12} {'memory change':>14}")
+    for record in results:
+        old = previous.get(record["name"])
+        if record["status"] != "ok" or old is None:
+            continue
+        latency_ratio = record["latency_ms"]["p50"] / old["latency_ms"]["p50"] if old["latency_ms"]["p50"] else 1.0
+        memory_ratio = record["peak_memory_mb"] / old["peak_memory_mb"] if old["peak_memory_mb"] else 1.0
+        regressed = latency_ratio > 1 + threshold or memory_ratio > 1 + threshold
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{record['name']:<44} {latency_ratio - 1:>+11.1%} {memory_ratio - 1:>+13.1%}{marker}")
+        if regressed:
+            regressions.append(record["name"])
+    return regressions
+
+
+def print_table(results):
+    print(f"{'benchmark':<44} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'ops/s':>9} {'MB/s':>8} {'peak MB':>8}")
+    for record in results:
+        if record["status"] != "ok":
+            print(f"{record['name']:<44} {record['status']}: {record['reason']}")
+            continue
+        latency = record["latency_ms"]
+        mb_s = f"{record['throughput_mb_s']:.1f}" if record["throughput_mb_s"] else "-"
+        print(f"{record['name']:<44} {latency['p50']:>10.2f} {latency['p90']:>10.2f} {latency['p99']:>10.2f} "
+              f"{record['throughput_ops']:>9.1f} {mb_s:>8} {record['peak_memory_mb']:>8.2f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def import_app(workdir, speech_backend):
+    """Import the app with its caches and uploads inside workdir."""
+    os.environ.setdefault("DOCGPT_DOCUMENT_CACHE", os.path.join(workdir, "document_cache"))
+    os.environ.setdefault("DOCGPT_RESULT_CACHE_PERSIST", "0")
+    os.environ.setdefault("DOCGPT_TRANSLATION_BACKEND", "echo")
+    os.environ.setdefault("DOCGPT_MODEL_LOADING", "lazy")
+    os.chdir(workdir)  # The upload folder is relative to the working directory
+    sys.path.insert(0, REPO_ROOT)
+    import app as docgpt
+
+    if speech_backend == "local":
+        # Stand-in recognizer so the segmenting pipeline can be timed offline
+        docgpt.register_speech_backend("local", lambda recognizer, audio, language: "document")
+    docgpt.app.config['SPEECH_BACKEND'] = speech_backend
+    return docgpt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", action="append", default=[], help="only run benchmarks whose name contains this text (repeatable)")
+    parser.add_argument("--group", choices=("helper", "route"), help="only run helper or route benchmarks")
+    parser.add_argument("--iterations", type=int, default=10, help="timed runs per benchmark")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the size of the generated inputs")
+    parser.add_argument("--speech-backend", default="local", help="speech backend for audio benchmarks; 'local' is an offline stand-in")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against the JSON output of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown or memory growth against the baseline")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    cases = [
+        case for case in CASES
+        if (not args.group or case["group"] == args.group)
+        and (not args.filter or any(text in case["name"] for text in args.filter))
+    ]
+    if args.list:
+        for case in cases:
+            print(f"{case['group']:<8} {case['name']}")
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    output = os.path.abspath(args.output) if args.output else None
+
+    workdir = tempfile.mkdtemp(prefix="docgpt-bench-")
+    try:
+        ctx = Context(import_app(workdir, args.speech_backend), workdir, args.scale)
+        results = []
+        for case in cases:
+            print(f"running {case['name']}...", file=sys.stderr)
+            results.append(measure(ctx, case, args.iterations))
+        ctx.app.shutdown_executors(wait=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": args.iterations,
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    print_table(results)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Gunicorn settings for serving DocGPT in production.
+
+Run with ``gunicorn app:app`` from the repository root. The app is imported
+once in the master (``preload_app``), so models are loaded before the
+workers are forked and their weights are shared copy-on-write.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("DOCGPT_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("DOCGPT_WORKERS", multiprocessing.cpu_count()))
+# Requests are mostly I/O or release the GIL in torch and NumPy, so each worker serves several at once
+worker_class = "gthread"
+threads = int(os.environ.get("DOCGPT_THREADS", 4))
+timeout = int(os.environ.get("DOCGPT_WORKER_TIMEOUT", 120))
+# Seconds a stopping worker gets to finish in-flight requests and running jobs
+graceful_timeout = int(os.environ.get("DOCGPT_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+preload_app = True
+
+# Models are loaded in the master. Warmup inference runs in each worker
+# instead: torch and tokenizer thread pools started before a fork are not
+# usable in the child.
+os.environ.setdefault("DOCGPT_MODEL_LOADING", "eager")
+# PDF extraction workers are started from a forkserver instead of being forked
+# from a worker that has torch loaded and threads running
+os.environ.setdefault("DOCGPT_PDF_START_METHOD", "forkserver")
+warmup_workers = os.environ.get("DOCGPT_MODEL_WARMUP", "1") == "1"
+os.environ["DOCGPT_MODEL_WARMUP"] = "0"
+
+
+def when_ready(server):
+    # Objects that survive to this point are shared with every worker; keep
+    # the garbage collector from touching (and so copying) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import app, model_registry
+
+    # Split the cores between workers unless a thread count is configured
+    torch_threads = app.config['TORCH_THREADS'] or max(1, multiprocessing.cpu_count() // server.cfg.workers)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    if warmup_workers:
+        model_registry.load_all(warmup=True)
+
+
+def worker_exit(server, worker):
+    from app import shutdown_executors
+
+    shutdown_executors(wait=True)
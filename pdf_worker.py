@@ -0,0 +1,16 @@
+"""PDF page extraction run in DocGPT's PDF worker processes.
+
+Kept apart from app.py so that worker processes started by the forkserver
+import only PyPDF2, not Flask, torch and the models.
+"""
+import PyPDF2
+
+
+def extract_pdf_page_range(pdf_path, first_page, last_page):
+    """Extract the text of pages first_page..last_page (inclusive) of a PDF file.
+
+    Runs in pool worker processes, so it opens the file itself.
+    """
+    with open(pdf_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        return [reader.pages[page_number - 1].extract_text() + "\n" for page_number in range(first_page, last_page + 1)]
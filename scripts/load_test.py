@@ -0,0 +1,164 @@
+"""Closed-loop load test for a running DocGPT API.
+
+Keeps --concurrency requests in flight against one scenario for --duration
+seconds, then prints throughput, throughput per server core and latency
+percentiles. Only the standard library is used, so it runs from any machine
+that can reach the server.
+
+    python scripts/load_test.py --url http://localhost:5000 --scenario search --concurrency 16 --cores 4
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+WORDS = ("document", "model", "server", "request", "summary", "answer", "page", "index",
+         "language", "worker", "memory", "latency", "search", "token", "cache", "thread")
+
+
+def synthetic_text(words, seed=0):
+    """Deterministic sentence-shaped text of the given word count."""
+    rng = random.Random(seed)
+    sentences = []
+    for start in range(0, words, 12):
+        sentence = [rng.choice(WORDS) for _ in range(min(12, words - start))]
+        sentences.append(" ".join(sentence).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def multipart(fields, files=()):
+    """Encode form fields and (name, filename, bytes) files as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields:
+        body += f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    for name, filename, content in files:
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode()
+        body += content + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
+
+
+def post(url, body, content_type, timeout=300):
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def upload_document(base_url, words):
+    """Upload a synthetic document once and return its document id."""
+    body, content_type = multipart([("query", "document")], [("document_file", "loadtest.txt", synthetic_text(words).encode())])
+    _, payload = post(f"{base_url}/search", body, content_type)
+    return json.loads(payload)["document_id"]
+
+
+def build_scenario(name, base_url, words):
+    """Return a function that builds the (url, body, content_type) of the i-th request."""
+    if name == "encode":
+        text = synthetic_text(200)
+
+        def make(i):
+            body = json.dumps({"text": f"{i} {text}", "method": "base64"}).encode()
+            return f"{base_url}/encode", body, "application/json"
+        return make
+
+    document_id = upload_document(base_url, words)
+    if name == "search":
+        def make(i):
+            query = " ".join(random.Random(i).sample(WORDS, 2))
+            return (f"{base_url}/search",) + multipart([("document_id", document_id), ("query", query), ("mode", "keywords")])
+        return make
+    if name == "qamodel":
+        # Every question is distinct so answers are not served from the result cache
+        def make(i):
+            question = f"Which {WORDS[i % len(WORDS)]} handles request {i}?"
+            return (f"{base_url}/qamodel",) + multipart([("document_id", document_id), ("questions[]", question)])
+        return make
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run(make_request, concurrency, duration):
+    """Send requests from concurrency threads for duration seconds; return latencies and errors."""
+    counter = itertools.count()
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            url, body, content_type = make_request(next(counter))
+            start = time.perf_counter()
+            try:
+                post(url, body, content_type)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except (urllib.error.URLError, OSError) as e:
+                with lock:
+                    errors.append(str(e))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--scenario", choices=("encode", "search", "qamodel"), default="search")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of unmeasured load first")
+    parser.add_argument("--words", type=int, default=20000, help="size of the uploaded document")
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="CPU cores available to the server")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    make_request = build_scenario(args.scenario, args.url.rstrip("/"), args.words)
+    if args.warmup > 0:
+        run(make_request, args.concurrency, args.warmup)
+    latencies, errors, elapsed = run(make_request, args.concurrency, args.duration)
+
+    latencies.sort()
+    throughput = len(latencies) / elapsed
+    report = {
+        "scenario": args.scenario,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(throughput, 2),
+        "throughput_rps_per_core": round(throughput / args.cores, 2),
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 2) if latencies else None
+            for name, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))
+        },
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['scenario']}: {report['requests']} requests, {report['errors']} errors in {report['duration_s']}s")
+    print(f"throughput: {report['throughput_rps']} req/s ({report['throughput_rps_per_core']} req/s per core)")
+    print("latency: " + ", ".join(f"{name} {value} ms" for name, value in report["latency_ms"].items()))
+    if errors:
+        print(f"first error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
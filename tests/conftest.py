@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Caches, uploads and corpora go to a scratch directory, and nothing is
+# downloaded: tests never load the models
+_workdir = tempfile.mkdtemp(prefix="docgpt-tests-")
+os.environ.setdefault("DOCGPT_DOCUMENT_CACHE", os.path.join(_workdir, "document_cache"))
+os.environ.setdefault("DOCGPT_CORPUS_FOLDER", os.path.join(_workdir, "corpora"))
+os.environ.setdefault("DOCGPT_JOB_FOLDER", os.path.join(_workdir, "jobs"))
+os.environ.setdefault("DOCGPT_MODEL_LOADING", "lazy")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as docgpt  # noqa: E402
+
+
+@pytest.fixture
+def app_module():
+    return docgpt
+
+
+@pytest.fixture
+def client():
+    docgpt.app.config["TESTING"] = True
+    return docgpt.app.test_client()
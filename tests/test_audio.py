@@ -0,0 +1,51 @@
+import io
+import wave
+
+import numpy as np
+
+
+SAMPLE_RATE = 1000
+
+
+def wav_file(samples):
+    """A mono 16-bit WAV file of the given samples."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(SAMPLE_RATE)
+        file.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+def tone_with_silences(seconds, silences):
+    """A loud square wave with (start, end) sample ranges of silence."""
+    samples = np.where(np.arange(int(seconds * SAMPLE_RATE)) % 2, 8000, -8000)
+    for start, end in silences:
+        samples[start:end] = 0
+    return samples
+
+
+def test_segments_end_at_the_quietest_moment_of_their_last_fifth(app_module):
+    # Silences in the last fifth of the first segment and of the one that follows it
+    samples = tone_with_silences(2.5, [(900, 920), (1500, 1520), (1790, 1810)])
+
+    segments = list(app_module.iter_audio_segments(wav_file(samples), 1, split_on_silence=True))
+
+    assert [(start, end) for start, end, _ in segments] == [(0, 0.91), (0.91, 1.8), (1.8, 2.5)]
+    assert b"".join(audio.frame_data for _, _, audio in segments) == samples.astype("<i2").tobytes()
+
+
+def test_without_silence_splitting_segments_have_the_exact_duration(app_module):
+    samples = tone_with_silences(2.5, [(900, 920)])
+
+    segments = list(app_module.iter_audio_segments(wav_file(samples), 1, split_on_silence=False))
+
+    assert [(start, end) for start, end, _ in segments] == [(0, 1), (1, 2), (2, 2.5)]
+    assert b"".join(audio.frame_data for _, _, audio in segments) == samples.astype("<i2").tobytes()
+
+
+def test_quietest_cut_falls_back_to_the_end_for_unreadable_sample_widths(app_module):
+    assert app_module.quietest_cut(b"\x00" * 30, SAMPLE_RATE, 3) == 30
+    assert app_module.quietest_cut(b"\x00\x00" * 3, SAMPLE_RATE, 2) == 6
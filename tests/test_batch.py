@@ -0,0 +1,12 @@
+import json
+
+
+def test_malformed_ndjson_line_fails_only_its_item(client):
+    body = '{"text": "YWJj", "method": "base64"}\nnot json\n"ZGVm"\n'
+    response = client.post("/decode/batch?method=base64", data=body, content_type="application/x-ndjson")
+
+    assert response.status_code == 200
+    results = sorted((json.loads(line) for line in response.get_data(as_text=True).splitlines()), key=lambda r: r["index"])
+    assert results[0] == {"index": 0, "result": "abc"}
+    assert results[1]["index"] == 1 and results[1]["error"].startswith("Invalid JSON:")
+    assert results[2] == {"index": 2, "result": "def"}
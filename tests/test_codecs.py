@@ -0,0 +1,64 @@
+import io
+import random
+
+import pytest
+
+TEXT_ALPHABET = "abcXYZ019 .,?!/&;:#%=+-_\"'@()\n\téß€😀"
+MORSE_ALPHABET = ".-/ x\n"
+# Escapes, including broken and unterminated ones, that chunks may split
+DECODER_TOKENS = {
+    "url": ["%41", "%e2%82%ac", "%e2%82", "%", "%4", "%zz", "+", "a", " "],
+    "html": ["&amp;", "&lt", "&#x41;", "&#65;", "&notin;", "&not", "&", ";", "é", " ", "x"],
+    "morse": list(MORSE_ALPHABET),
+}
+
+
+def random_texts(tokens, count, seed, max_length=40):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(tokens) for _ in range(rng.randint(0, max_length))) for _ in range(count)]
+
+
+def chunked(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+@pytest.mark.parametrize("method", ["base64", "url", "html", "morse"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 7])
+def test_streaming_encoders_match_whole_string_encoders(app_module, method, chunk_size):
+    for text in random_texts(TEXT_ALPHABET, 200, seed=3):
+        if text:
+            streamed = ''.join(app_module.STREAM_ENCODERS[method](chunked(text, chunk_size)))
+            assert streamed == app_module.ENCODERS[method](text)
+
+
+@pytest.mark.parametrize("method", ["base64", "url", "html", "morse"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7])
+def test_streaming_decoders_match_whole_string_decoders(app_module, method, chunk_size):
+    encoded_texts = [app_module.ENCODERS[method](text) for text in random_texts(TEXT_ALPHABET, 200, seed=4) if text]
+    if method == "base64":
+        # Line breaks are ignored like any other character outside the alphabet
+        encoded_texts += [text[:5] + "\n" + text[5:] for text in encoded_texts]
+    else:
+        encoded_texts += random_texts(DECODER_TOKENS[method], 200, seed=5, max_length=20)
+    for text in encoded_texts:
+        if text:
+            streamed = ''.join(app_module.STREAM_DECODERS[method](chunked(text, chunk_size)))
+            assert streamed == app_module.DECODERS[method](text), text
+
+
+def test_streamed_decode_error_ends_the_body_with_an_error_line(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "CODEC_CHUNK_SIZE", 8)
+    body = b"YWJj" * 8 + b"Y"
+
+    response = client.post("/decode", data={"method": "base64", "stream": "true", "document_file": (io.BytesIO(body), "data.txt")})
+
+    text = response.get_data(as_text=True)
+    assert text.startswith("abc" * 8)
+    assert text[len("abc" * 8):].startswith(app_module.CODEC_STREAM_ERROR_PREFIX + "Decoding failed!")
+
+
+def test_streamed_decode_that_fails_at_once_returns_an_error_status(client):
+    response = client.post("/decode", data={"method": "base64", "stream": "true", "document_file": (io.BytesIO(b"/w=="), "data.txt")})
+
+    assert response.status_code == 500
+    assert response.get_json() == {"error": "Decoding failed!"}
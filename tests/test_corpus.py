@@ -0,0 +1,165 @@
+import hashlib
+import math
+import shutil
+
+import pytest
+
+
+class StubQAModel:
+    """Pipeline stand-in that answers with the last word of the question wherever the context contains it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, question, context, batch_size):
+        self.calls.append(list(zip(question, context)))
+        predictions = []
+        for q, c in zip(question, context):
+            word = q.rstrip("?").split()[-1]
+            start = c.find(word)
+            if start < 0:
+                predictions.append({"answer": "", "score": 0.01, "start": 0, "end": 0})
+            else:
+                predictions.append({"answer": word, "score": 0.9, "start": start, "end": start + len(word)})
+        return predictions
+
+
+@pytest.fixture
+def qa_model(app_module, monkeypatch):
+    model = StubQAModel()
+    monkeypatch.setattr(app_module, "get_qa_model", lambda: model)
+    monkeypatch.setitem(app_module.app.config, "QA_WINDOW_WORDS", 8)
+    monkeypatch.setitem(app_module.app.config, "QA_WINDOW_OVERLAP", 2)
+    return model
+
+
+def cache_document(app_module, name, pages):
+    """Store pages as a cached document whose id is derived from the name."""
+    document_id = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    return app_module.store_document(document_id, list(enumerate(pages, 1)), f"{name}.pdf")
+
+
+def create_corpus(client, *document_ids, corpus_id=None):
+    data = {"document_ids[]": list(document_ids)}
+    if corpus_id:
+        data["corpus_id"] = corpus_id
+    response = client.post("/corpus", data=data)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+REACTOR = [
+    "The reactor cools with water every single day. ",
+    "Core temperature readings are logged in kelvin by the night shift. ",
+    "The reactor budget rose sharply this year. ",
+]
+TURBINE = [
+    "The turbine hall holds four generators and spare parts. ",
+    "Turbine output is measured in megawatts at the grid connection point. ",
+]
+
+
+def test_corpus_id_depends_on_the_documents_and_their_order(app_module, client, qa_model):
+    a = cache_document(app_module, "ids-a", REACTOR).document_id
+    b = cache_document(app_module, "ids-b", TURBINE).document_id
+
+    both = create_corpus(client, a, b)
+    assert create_corpus(client, a, b, a)["corpus_id"] == both["corpus_id"]
+    assert create_corpus(client, b, a)["corpus_id"] != both["corpus_id"]
+    extended = create_corpus(client, b, corpus_id=create_corpus(client, a)["corpus_id"])
+    assert extended["corpus_id"] == both["corpus_id"]
+
+    manifest = client.get(f"/corpus/{both['corpus_id']}").get_json()
+    assert [(member["document_id"], member["pages"]) for member in manifest["documents"]] == [(a, 3), (b, 2)]
+    assert client.get(f"/corpus/{'0' * 64}").status_code == 404
+
+
+def naive_corpus_scores(passage_texts, query):
+    """BM25 of every (member, passage_id) with passage counts and lengths taken over the whole corpus."""
+    terms = {key: [term.strip(".,").lower() for term in text.split()] for key, text in passage_texts.items()}
+    average_length = sum(len(words) for words in terms.values()) / len(terms)
+    scores = {}
+    for key, words in terms.items():
+        score = 0.0
+        for term in set(query.lower().split()):
+            frequency = words.count(term)
+            if not frequency:
+                continue
+            containing = sum(term in other for other in terms.values())
+            idf = math.log(1.0 + (len(terms) - containing + 0.5) / (containing + 0.5))
+            norm = 1.5 * (1.0 - 0.75 + 0.75 * len(words) / average_length)
+            score += idf * frequency * 2.5 / (frequency + norm)
+        if score:
+            scores[key] = score
+    return scores
+
+
+def test_corpus_scores_compare_across_documents(app_module, client, qa_model):
+    a = cache_document(app_module, "score-a", REACTOR)
+    b = cache_document(app_module, "score-b", TURBINE)
+    corpus = app_module.load_corpus(create_corpus(client, a.document_id, b.document_id)["corpus_id"])
+    corpus_index = app_module.get_corpus_index(corpus)
+
+    passage_texts = {}
+    for member, document in enumerate([a, b]):
+        spans = corpus_index.indexes[member].passages
+        passage_texts.update({(member, passage_id): text for passage_id, text in enumerate(document.read_spans(spans))})
+    query = "reactor turbine megawatts"
+
+    hits = corpus_index.search(query, k=len(passage_texts))
+
+    expected = naive_corpus_scores(passage_texts, query)
+    assert {(member, passage_id) for _, member, passage_id in hits} == set(expected)
+    for score, member, passage_id in hits:
+        assert score == pytest.approx(expected[member, passage_id], rel=1e-5)
+    assert [score for score, _, _ in hits] == sorted((score for score, _, _ in hits), reverse=True)
+    assert {member for _, member, _ in hits} == {0, 1}
+    top = sorted(expected.values(), reverse=True)[:3]
+    assert [score for score, _, _ in corpus_index.search(query, k=3)] == pytest.approx(top, rel=1e-5)
+
+
+def test_read_passages_returns_each_passage_in_the_order_asked(app_module, client, qa_model):
+    a = cache_document(app_module, "read-a", REACTOR)
+    b = cache_document(app_module, "read-b", TURBINE)
+    corpus_index = app_module.get_corpus_index(app_module.load_corpus(create_corpus(client, a.document_id, b.document_id)["corpus_id"]))
+    texts = ["".join(REACTOR), "".join(TURBINE)]
+    passages = [(1, 1), (0, 2), (1, 0), (0, 0), (1, 1)]
+
+    read = corpus_index.read_passages(passages)
+
+    assert read == [texts[member][slice(*corpus_index.indexes[member].passages[passage_id])] for member, passage_id in passages]
+    assert corpus_index.read_spans(1, [(4, 11), (0, 3)]) == ["turbine", "The"]
+
+
+def test_answers_cite_the_document_and_page_they_came_from(app_module, client, qa_model):
+    a = cache_document(app_module, "cite-a", REACTOR)
+    b = cache_document(app_module, "cite-b", TURBINE)
+    corpus_id = create_corpus(client, a.document_id, b.document_id)["corpus_id"]
+
+    response = client.post(f"/corpus/{corpus_id}/qamodel", data={"questions[]": ["Which unit is used, megawatts?", "Logged in kelvin?"]})
+
+    assert response.status_code == 200
+    megawatts, kelvin = response.get_json()["answers"]
+    assert (megawatts["document_id"], megawatts["filename"], megawatts["page"]) == (b.document_id, "cite-b.pdf", 2)
+    assert b.read_spans([(megawatts["start"], megawatts["end"])]) == ["megawatts"]
+    assert (kelvin["document_id"], kelvin["page"], kelvin["answer"]) == (a.document_id, 2, "kelvin")
+    assert [match["score"] for match in kelvin["matches"]] == sorted((match["score"] for match in kelvin["matches"]), reverse=True)
+    assert len({(match["document_id"], match["start"]) for match in kelvin["matches"]}) == len(kelvin["matches"])
+    # Both questions went through the model in one batch
+    assert len(qa_model.calls) == 1
+
+
+def test_evicted_member_is_reported_as_not_found(app_module, client, qa_model):
+    a = cache_document(app_module, "evict-a", REACTOR)
+    b = cache_document(app_module, "evict-b", TURBINE)
+    corpus_id = create_corpus(client, a.document_id, b.document_id)["corpus_id"]
+    assert client.post(f"/corpus/{corpus_id}/qamodel", data={"questions[]": ["Where is the reactor?"]}).status_code == 200
+
+    shutil.rmtree(app_module.document_store.artifact_path(b.document_id, ""))
+
+    # The corpus index is still cached, but reading the passages finds the document gone
+    response = client.post(f"/corpus/{corpus_id}/qamodel", data={"questions[]": ["What is in megawatts?"]})
+    assert response.status_code == 404
+    assert b.document_id in response.get_json()["error"]
+    response = client.post(f"/corpus/{corpus_id}/summarize", data={"num_sentences": "2"})
+    assert response.status_code == 404
@@ -0,0 +1,116 @@
+import difflib
+import io
+import random
+import re
+
+import pytest
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@$")
+
+
+def random_line_pairs(count, seed):
+    """Pairs of line lists where the second is an edit of the first; a small vocabulary makes lines repeat."""
+    rng = random.Random(seed)
+    vocabulary = [f"line {i}" for i in range(8)] + ["", "}", "return x"]
+    pairs = []
+    for _ in range(count):
+        a = [rng.choice(vocabulary) for _ in range(rng.randint(0, 30))]
+        b = list(a)
+        for _ in range(rng.randint(0, 6)):
+            position = rng.randint(0, len(b))
+            edit = rng.choice(["insert", "delete", "replace"])
+            if edit == "insert" or not b or position == len(b):
+                b.insert(position, rng.choice(vocabulary))
+            elif edit == "delete":
+                del b[position]
+            else:
+                b[position] = rng.choice(vocabulary)
+        pairs.append((a, b))
+    return pairs
+
+
+def apply_opcodes(opcodes, a, b):
+    result = []
+    i = j = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        i, j = i2, j2
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            result.extend(a[i1:i2])
+        else:
+            result.extend(b[j1:j2])
+    assert (i, j) == (len(a), len(b))
+    return result
+
+
+def apply_unified_diff(diff_lines, a):
+    """Apply a unified diff to the lines of a and return the patched lines."""
+    result, position = [], 0
+    for line in diff_lines[2:]:
+        header = HUNK_HEADER.match(line)
+        if header:
+            start = int(header.group(1)) - (header.group(2) != "0")
+            result.extend(a[position:start])
+            position = start
+        elif line[0] in " -":
+            assert a[position] == line[1:]
+            if line[0] == " ":
+                result.append(line[1:])
+            position += 1
+        else:
+            result.append(line[1:])
+    return result + a[position:]
+
+
+@pytest.mark.parametrize("max_edits", [1000, 2])
+def test_opcodes_turn_the_first_text_into_the_second(app_module, monkeypatch, max_edits):
+    # A small edit budget exercises the fallback that reports a gap as replaced
+    monkeypatch.setitem(app_module.app.config, "DIFF_MAX_EDITS", max_edits)
+    for a, b in random_line_pairs(500, seed=1):
+        assert apply_opcodes(app_module.diff_opcodes(a, b), a, b) == b
+
+
+def test_unified_diff_round_trips(app_module):
+    for a, b in random_line_pairs(500, seed=2):
+        diff = list(app_module.unified_diff(a, b, "first", "second"))
+        if a == b:
+            assert diff == []
+        else:
+            assert diff[:2] == ["--- first", "+++ second"]
+            assert apply_unified_diff(diff, a) == b
+
+
+def test_unified_diff_matches_difflib_for_unambiguous_changes(app_module):
+    a = [f"line {i}" for i in range(40)]
+    b = a[:5] + ["inserted"] + a[5:20] + ["changed 20"] + a[21:35] + a[36:]
+
+    ours = list(app_module.unified_diff(a, b, "first", "second"))
+
+    assert ours == list(difflib.unified_diff(a, b, "first", "second", lineterm=""))
+
+
+def test_summary_flags_gaps_too_different_to_diff_exactly(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "DIFF_MAX_EDITS", 10)
+    first = "\n".join(["a", "b", "c", "d"] * 50) + "\n"
+    second = "\n".join(["b", "a", "d", "c"] * 50) + "\n"
+
+    def summary(text1, text2):
+        return client.post("/comparefile", data={
+            "mode": "summary",
+            "file1": (io.BytesIO(text1.encode()), "first.txt"),
+            "file2": (io.BytesIO(text2.encode()), "second.txt"),
+        }).get_json()
+
+    assert summary(first, second)["approximate"] is True
+    assert summary(first, first + "e\n")["approximate"] is False
+
+
+def test_negative_context_lines_are_rejected(client):
+    response = client.post("/comparefile", data={
+        "context_lines": "-1",
+        "file1": (io.BytesIO(b"a\nb\n"), "first.txt"),
+        "file2": (io.BytesIO(b"a\nc\n"), "second.txt"),
+    })
+
+    assert response.status_code == 400
@@ -0,0 +1,149 @@
+import io
+import os
+import random
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+import pytest
+
+from benchmarks import corpus
+
+
+def test_failed_extraction_is_reported_and_not_cached(app_module, client, monkeypatch):
+    pdf = corpus.pdf_document(8, lines_per_page=5, seed=4)
+    extract_text = PyPDF2.PageObject.extract_text
+    calls = []
+
+    def flaky_extract_text(page, *args, **kwargs):
+        calls.append(page)
+        if len(calls) == 4:
+            raise ValueError("broken content stream")
+        return extract_text(page, *args, **kwargs)
+
+    monkeypatch.setitem(app_module.app.config, "PDF_WORKERS", 1)
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", flaky_extract_text)
+    response = client.post("/search", data={"query": "model", "document_file": (io.BytesIO(pdf), "report.pdf")})
+
+    assert response.status_code == 422
+    assert "broken content stream" in response.get_json()["error"]
+    document_id = app_module.hash_stream(io.BytesIO(pdf), "report.pdf")
+    assert app_module.document_store.get(document_id) is None
+    assert not os.path.exists(app_module.document_store.artifact_path(document_id, ""))
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", extract_text)
+    response = client.post("/search", data={"query": "model", "document_file": (io.BytesIO(pdf), "report.pdf")})
+
+    assert response.status_code == 200
+    assert len(app_module.document_store.get(document_id).page_offsets) == 8
+
+
+def test_text_extractor_failure_after_first_page_is_not_truncated(app_module, monkeypatch):
+    def failing_extractor(stream):
+        yield "first line\n"
+        raise ValueError("parser gave up")
+
+    monkeypatch.setitem(app_module.TEXT_EXTRACTORS, "xml", failing_extractor)
+    monkeypatch.setitem(app_module.app.config, "TEXT_PAGE_CHARS", 5)
+    upload = io.BytesIO(b"<a>first line</a>")
+
+    with pytest.raises(app_module.DocumentReadError, match="parser gave up"):
+        app_module.store_document("f" * 64, app_module.iter_document_pages(upload, "broken.xml"), "broken.xml")
+    assert app_module.document_store.get("f" * 64) is None
+
+
+def test_upload_without_text_leaves_nothing_behind(app_module, client):
+    response = client.post("/search", data={"query": "model", "document_file": (io.BytesIO(b""), "empty.txt")})
+
+    assert response.status_code == 400
+    document_id = app_module.hash_stream(io.BytesIO(b""), "empty.txt")
+    assert not os.path.exists(app_module.document_store.artifact_path(document_id, ""))
+
+
+class BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("worker killed")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pdf_pool_is_replaced_and_pages_still_extracted(app_module, monkeypatch, tmp_path):
+    path = tmp_path / "large.pdf"
+    path.write_bytes(corpus.pdf_document(6, lines_per_page=3, seed=2))
+    expected = list(app_module.iter_pdf_pages(str(path)))
+    pool = BrokenPool()
+    monkeypatch.setattr(app_module, "_pdf_pool", pool)
+    monkeypatch.setitem(app_module.app.config, "PDF_WORKERS", 2)
+    monkeypatch.setitem(app_module.app.config, "PDF_PARALLEL_MIN_PAGES", 2)
+
+    assert list(app_module.iter_pdf_pages(str(path))) == expected
+    assert pool.shut_down
+    assert app_module._pdf_pool is None
+
+
+def test_atomic_write_replaces_the_file_or_leaves_it_untouched(app_module, tmp_path):
+    path = tmp_path / "meta.json"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with app_module.atomic_write(str(path)) as file:
+            file.write("partial")
+            raise RuntimeError("extraction failed")
+    assert path.read_text() == "old"
+
+    with app_module.atomic_write(str(path)) as file:
+        file.write("new")
+    assert path.read_text() == "new"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["meta.json"]
+
+
+def test_pdf_cut_to_the_page_limit_is_reported_and_keyed_by_the_limit(app_module, client, monkeypatch):
+    pdf = corpus.pdf_document(5, lines_per_page=5, seed=6)
+    monkeypatch.setitem(app_module.app.config, "PDF_WORKERS", 1)
+    monkeypatch.setitem(app_module.app.config, "PDF_MAX_PAGES", 3)
+
+    cut = client.post("/search", data={"query": "model", "document_file": (io.BytesIO(pdf), "long.pdf")}).get_json()
+
+    assert cut["truncated"] is True and cut["pages_total"] == 5
+    assert len(app_module.document_store.get(cut["document_id"]).page_offsets) == 3
+
+    monkeypatch.setitem(app_module.app.config, "PDF_MAX_PAGES", 10)
+    full = client.post("/search", data={"query": "model", "document_file": (io.BytesIO(pdf), "long.pdf")}).get_json()
+
+    assert full["document_id"] != cut["document_id"]
+    assert "truncated" not in full and "pages_total" not in full
+
+
+@pytest.mark.parametrize("endpoint, fields", [
+    ("/translate", {"target_lang": "fr"}),
+    ("/search", {"query": "page"}),
+    ("/comparefile", {}),
+])
+def test_first_page_past_the_end_is_rejected(client, endpoint, fields):
+    text = b"page one\n"
+    files = {"file1": (io.BytesIO(text), "a.txt"), "file2": (io.BytesIO(text), "b.txt")} if endpoint == "/comparefile" else {"document_file": (io.BytesIO(text), "a.txt")}
+
+    response = client.post(endpoint, data=dict(fields, first_page="2", **files))
+
+    assert response.status_code == 400
+    assert "past the last page" in response.get_json()["error"]
+
+
+def test_spans_and_pages_read_from_disk_match_the_text(app_module):
+    rng = random.Random(7)
+    pages = [(number, "".join(rng.choice("ab é✓😀\n") for _ in range(rng.randint(0, 300)))) for number in range(1, 9)]
+    text = "".join(page for _, page in pages)
+    document = app_module.store_document("d" * 64, pages, "pages.txt")
+    spans = [tuple(sorted(rng.sample(range(len(text) + 1), 2))) for _ in range(40)]
+
+    for byte_offsets in (document.page_byte_offsets, None):
+        # Documents cached before byte offsets were recorded are read from the start
+        copy = app_module.Document(
+            document.text_path, document.document_id, document.filename, document.page_offsets, document.length,
+            page_byte_offsets=byte_offsets,
+        )
+        assert copy.read_spans(spans) == [text[start:end] for start, end in spans]
+        assert list(copy.iter_pages(3, 4)) == pages[2:6]
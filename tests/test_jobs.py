@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def queues(app_module, tmp_path):
+    # Two queues sharing a folder stand in for two gunicorn workers
+    make = lambda: app_module.JobQueue(max_workers=1, max_pending=4, timeout=60, retention=3600, folder=str(tmp_path))
+    first, second = make(), make()
+    yield first, second
+    first.shutdown()
+    second.shutdown()
+
+
+def test_job_result_is_visible_from_another_worker(queues):
+    owner, other = queues
+    job = owner.submit("summarize", lambda: {"summary": "done"}, {})
+    job.future.result()
+
+    seen = other.get(job.job_id)
+
+    assert seen.status == "succeeded"
+    assert seen.to_dict()["result"] == {"summary": "done"}
+
+
+def test_job_cancelled_from_another_worker_does_not_store_a_result(queues):
+    owner, other = queues
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return {"summary": "late"}
+
+    job = owner.submit("summarize", work, {})
+    started.wait(5)
+    assert other.cancel(job.job_id).status == "cancelled"
+    release.set()
+    job.future.result()
+
+    assert owner.get(job.job_id).status == "cancelled"
+    assert other.get(job.job_id).status == "cancelled"
+
+
+def test_unknown_job_id_is_not_found(app_module, queues):
+    with pytest.raises(app_module.JobNotFoundError):
+        queues[1].get("../" + "0" * 30)
@@ -0,0 +1,59 @@
+import io
+import re
+
+
+def test_counter_and_histogram_render_in_the_prometheus_format(app_module):
+    registry = app_module.MetricsRegistry()
+    counter = registry.counter("test_events_total", "Events.", ("kind",))
+    histogram = registry.histogram("test_seconds", "Durations.", ("stage",), buckets=(0.1, 1))
+    counter.inc(kind='say "hi"')
+    counter.inc(2, kind='say "hi"')
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(5, stage="parse")
+
+    assert registry.render().splitlines() == [
+        "# HELP test_events_total Events.",
+        "# TYPE test_events_total counter",
+        'test_events_total{kind="say \\"hi\\""} 3',
+        "# HELP test_seconds Durations.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="parse",le="0.1"} 1',
+        'test_seconds_bucket{stage="parse",le="1"} 2',
+        'test_seconds_bucket{stage="parse",le="+Inf"} 3',
+        'test_seconds_sum{stage="parse"} 5.55',
+        'test_seconds_count{stage="parse"} 3',
+    ]
+
+
+def test_gauge_reads_its_callback_and_survives_its_errors(app_module):
+    registry = app_module.MetricsRegistry()
+    registry.gauge("test_size", "Sizes.", lambda: {("a",): 2, ("b",): 1}, ("name",))
+    registry.gauge("test_broken", "Broken.", lambda: 1 / 0)
+
+    assert registry.render().splitlines() == [
+        "# HELP test_size Sizes.",
+        "# TYPE test_size gauge",
+        'test_size{name="a"} 2.0',
+        'test_size{name="b"} 1.0',
+        "# HELP test_broken Broken.",
+        "# TYPE test_broken gauge",
+    ]
+
+
+def test_responses_carry_their_stage_timings(client):
+    response = client.post("/search", data={"document_file": (io.BytesIO(b"one two three\n"), "timing.txt"), "query": "two"})
+
+    assert response.status_code == 200
+    timings = dict(re.fullmatch(r"([\w.]+);dur=([\d.]+)", part).groups() for part in response.headers["Server-Timing"].split(", "))
+    assert {"upload_hash", "search", "total"} <= set(timings)
+    assert float(timings["search"]) <= float(timings["total"])
+
+
+def test_metrics_endpoint_counts_requests_by_route(client):
+    client.get("/corpus/" + "1" * 64)
+
+    body = client.get("/metrics").get_data(as_text=True)
+
+    assert 'docgpt_requests_total{endpoint="/corpus/<corpus_id>",method="GET",status="404"}' in body
+    assert "docgpt_stage_duration_seconds_bucket" in body
@@ -0,0 +1,58 @@
+import pytest
+
+
+def flaky_loader(failures):
+    calls = []
+
+    def load():
+        calls.append(len(calls))
+        if len(calls) <= failures:
+            raise OSError(f"download failed ({len(calls)})")
+        return "model"
+
+    return load, calls
+
+
+def test_failed_load_is_retried_after_a_doubling_backoff(app_module, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app_module.time, "time", lambda: now[0])
+    registry = app_module.ModelRegistry(retry_seconds=10)
+    load, calls = flaky_loader(failures=2)
+    registry.register("flaky", load)
+
+    assert registry.get("flaky") is None
+    assert registry.status() == {"flaky": "failed: download failed (1)"}
+    now[0] += 9
+    assert registry.get("flaky") is None
+    assert len(calls) == 1
+
+    now[0] += 1
+    assert registry.get("flaky") is None
+    assert registry.status() == {"flaky": "failed: download failed (2)"}
+    now[0] += 19
+    assert registry.get("flaky") is None
+    assert len(calls) == 2
+
+    now[0] += 1
+    assert registry.get("flaky") == "model"
+    assert registry.status() == {"flaky": "loaded"}
+    assert len(calls) == 3
+
+
+def test_load_all_retries_failed_models_at_once(app_module):
+    registry = app_module.ModelRegistry(retry_seconds=3600)
+    load, calls = flaky_loader(failures=1)
+    registry.register("flaky", load)
+
+    assert registry.get("flaky") is None
+    registry.load_all(warmup=False)
+
+    assert registry.get("flaky") == "model"
+    assert len(calls) == 2
+
+
+def test_summarizer_load_failure_is_reported(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.model_registry, "get", lambda name: None)
+
+    with pytest.raises(RuntimeError, match="Summarizer failed to initialize!"):
+        app_module.summarize_lsa("Some text. More text.")
@@ -0,0 +1,67 @@
+import random
+
+# Morse code as implemented before encoding and decoding were rewritten; the
+# current functions must give the same results
+ORIGINAL_MORSE_CODE_DICT = {
+    'A': '.-', 'B': '-...', 'C': '-.-.', 'D': '-..', 'E': '.', 'F': '..-.',
+    'G': '--.', 'H': '....', 'I': '..', 'J': '.---', 'K': '-.-', 'L': '.-..',
+    'M': '--', 'N': '-.', 'O': '---', 'P': '.--.', 'Q': '--.-', 'R': '.-.',
+    'S': '...', 'T': '-', 'U': '..-', 'V': '...-', 'W': '.--', 'X': '-..-',
+    'Y': '-.--', 'Z': '--..', '1': '.----', '2': '..---', '3': '...--',
+    '4': '....-', '5': '.....', '6': '-....', '7': '--...', '8': '---..',
+    '9': '----.', '0': '-----', ' ': '/', '.': '.-.-.-', ',': '--..--',
+    '?': '..--..', "'": '.----.', '!': '-.-.--', '/': '-..-.', '(': '-.--.',
+    ')': '-.--.-', '&': '.-...', ':': '---...', ';': '-.-.-.', '=': '-...-',
+    '+': '.-.-.', '-': '-....-', '_': '..--.-', '"': '.-..-.', '$': '...-..-',
+    '@': '.--.-.'
+}
+ORIGINAL_MORSE_CODE_REVERSE = {value: key for key, value in ORIGINAL_MORSE_CODE_DICT.items()}
+
+
+def original_encode_morse(text):
+    morse = []
+    for char in text.upper():
+        morse.append(ORIGINAL_MORSE_CODE_DICT.get(char, char))
+    return ' '.join(morse)
+
+
+def original_decode_morse(morse_code):
+    decoded_text = ''
+    for word in morse_code.strip().split(' / '):
+        for char in word.split(' '):
+            if char in ORIGINAL_MORSE_CODE_REVERSE:
+                decoded_text += ORIGINAL_MORSE_CODE_REVERSE[char]
+            elif char != '':
+                decoded_text += char
+        decoded_text += ' '
+    return decoded_text.strip()
+
+
+TEXT_ALPHABET = "abcXYZ019 .,?!/&;:#%=+-_\"'@()\n\téß€😀"
+MORSE_ALPHABET = ".-/ x\n"
+
+
+def random_texts(alphabet, count, seed, max_length=40):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length))) for _ in range(count)]
+
+
+def test_morse_matches_the_original_implementation(app_module):
+    for text in random_texts(TEXT_ALPHABET, 2000, seed=1):
+        encoded = app_module.encode_morse(text)
+        assert encoded == original_encode_morse(text)
+        assert app_module.decode_morse(encoded) == original_decode_morse(encoded)
+    for morse_code in random_texts(MORSE_ALPHABET, 2000, seed=2):
+        assert app_module.decode_morse(morse_code) == original_decode_morse(morse_code)
+
+
+def test_batches_match_item_by_item_results(app_module):
+    texts = random_texts(TEXT_ALPHABET, 300, seed=3, max_length=8) + ["", "", "a\x00b", None, " ", "\x00"]
+    random.Random(4).shuffle(texts)
+    morse_codes = random_texts(MORSE_ALPHABET, 300, seed=5, max_length=12) + ["", " / ", ".-\x00-", None, "\x00"]
+    random.Random(6).shuffle(morse_codes)
+
+    assert app_module.encode_morse_batch(texts) == [app_module.encode_morse(text) for text in texts]
+    assert app_module.decode_morse_batch(morse_codes) == [app_module.decode_morse(code) for code in morse_codes]
+    assert app_module.encode_morse_batch([]) == app_module.decode_morse_batch([]) == []
+    assert app_module.encode_morse_batch(["", ""]) == ["", ""]
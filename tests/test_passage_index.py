@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+
+
+def words(count, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def naive_bm25(index, text, query):
+    """BM25 of every passage computed term by term from the passage texts."""
+    passages = [index_terms(text[start:end]) for start, end in index.passages]
+    average_length = sum(len(terms) for terms in passages) / len(passages)
+    scores = []
+    for terms in passages:
+        score = 0.0
+        for term in set(index_terms(query)):
+            frequency = terms.count(term)
+            containing = sum(term in other for other in passages)
+            if not frequency:
+                continue
+            idf = math.log(1.0 + (len(passages) - containing + 0.5) / (containing + 0.5))
+            norm = index.K1 * (1.0 - index.B + index.B * len(terms) / average_length)
+            score += idf * frequency * (index.K1 + 1.0) / (frequency + norm)
+        scores.append(score)
+    return scores
+
+
+def index_terms(text):
+    return text.lower().replace(".", " ").split()
+
+
+TEXT = (
+    "The reactor cools with water. " * 3
+    + "Budget figures rose sharply this year. "
+    + "The reactor core temperature is monitored. "
+    + "Staff training covers safety drills and water checks. " * 2
+)
+
+
+def test_bm25_scores_match_the_formula_and_rank_the_best_passage_first(app_module):
+    index = app_module.PassageIndex.build(TEXT, window_words=8, overlap_words=2)
+    query = "reactor temperature"
+
+    assert np.allclose(index.scores(query), naive_bm25(index, TEXT, query), rtol=1e-5)
+    best = index.search(query, 2)[0]
+    start, end = index.passages[best]
+    assert "temperature" in TEXT[start:end]
+
+
+def test_search_returns_only_matching_passages_when_there_are_some(app_module):
+    index = app_module.PassageIndex.build(TEXT, window_words=8, overlap_words=2)
+
+    hits = index.search("budget", 5)
+
+    assert hits and all("Budget" in TEXT[slice(*index.passages[hit])] for hit in hits)
+
+
+def test_saved_index_loads_back_unchanged(app_module, tmp_path):
+    index = app_module.PassageIndex.build(TEXT, window_words=8, overlap_words=2)
+    path = str(tmp_path / "passages.npz")
+
+    index.save(path)
+    loaded = app_module.PassageIndex.load(path)
+
+    assert loaded.passages == index.passages
+    assert loaded.terms == index.terms
+    for field in ("term_ptr", "passage_ids", "term_freqs", "passage_lengths"):
+        assert np.array_equal(getattr(loaded, field), getattr(index, field))
+    assert loaded.search("water checks", 3) == index.search("water checks", 3)
+
+
+def test_changed_window_size_builds_a_new_passage_index(app_module, monkeypatch):
+    text = words(60)
+    document = app_module.store_document("e" * 64, [(1, text)], "windows.txt")
+    monkeypatch.setitem(app_module.app.config, "QA_WINDOW_OVERLAP", 2)
+
+    monkeypatch.setitem(app_module.app.config, "QA_WINDOW_WORDS", 10)
+    small = app_module.get_passage_index(document)
+    monkeypatch.setitem(app_module.app.config, "QA_WINDOW_WORDS", 20)
+    large = app_module.get_passage_index(document)
+
+    assert small.passages == app_module.split_into_windows(text, 10, 2)
+    assert large.passages == app_module.split_into_windows(text, 20, 2)
@@ -0,0 +1,95 @@
+import re
+
+import pytest
+
+
+TEXT = "  alpha beta\ngamma  delta epsilon zeta eta\ttheta iota kappa  "
+WORDS = [(match.start(), match.end()) for match in re.finditer(r"\S+", TEXT)]
+
+
+@pytest.mark.parametrize("window_words, overlap_words", [(4, 1), (3, 0), (10, 2), (20, 5), (2, 5)])
+def test_windows_start_and_end_on_word_boundaries_and_cover_the_text(app_module, window_words, overlap_words):
+    windows = app_module.split_into_windows(TEXT, window_words, overlap_words)
+
+    step = max(1, window_words - overlap_words)
+    expected = []
+    for first in range(0, len(WORDS), step):
+        last = min(first + window_words, len(WORDS)) - 1
+        expected.append((WORDS[first][0], WORDS[last][1]))
+        if last == len(WORDS) - 1:
+            break
+    assert windows == expected
+    assert windows[0][0] == WORDS[0][0] and windows[-1][1] == WORDS[-1][1]
+
+
+def test_text_without_words_has_no_windows(app_module):
+    assert app_module.split_into_windows(" \n\t ", 4, 1) == []
+
+
+class StubPipeline:
+    """run_qa_model stand-in answering with the last word of the question wherever the context contains it."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, questions, contexts):
+        self.batches.append(list(zip(questions, contexts)))
+        predictions = []
+        for question, context in zip(questions, contexts):
+            word = question.rstrip("?").split()[-1]
+            start = context.find(word)
+            if start < 0:
+                predictions.append({"answer": "", "score": 0.01, "start": 0, "end": 0})
+            else:
+                # Later occurrences score higher so the best window is not simply the first one
+                predictions.append({"answer": word, "score": 0.5 + start / 1000, "start": start, "end": start + len(word)})
+        return predictions
+
+
+@pytest.fixture
+def qa_pipeline(app_module, monkeypatch):
+    pipeline = StubPipeline()
+    monkeypatch.setattr(app_module, "run_qa_model", pipeline)
+    monkeypatch.setitem(app_module.app.config, "QA_WINDOW_WORDS", 4)
+    monkeypatch.setitem(app_module.app.config, "QA_WINDOW_OVERLAP", 1)
+    return pipeline
+
+
+def test_every_question_is_paired_with_every_window_in_one_batch(app_module, qa_pipeline):
+    questions = ["Where is delta?", "Where is kappa?", "Where is omega?"]
+
+    app_module.answer_questions(questions, TEXT)
+
+    windows = app_module.split_into_windows(TEXT)
+    assert len(qa_pipeline.batches) == 1
+    assert qa_pipeline.batches[0] == [(question, TEXT[start:end]) for question in questions for start, end in windows]
+
+
+def test_best_span_offsets_point_into_the_whole_context(app_module, qa_pipeline):
+    answers = app_module.answer_questions(["Where is delta?", "Where is kappa?", "Where is omega?"], TEXT)
+
+    windows = app_module.split_into_windows(TEXT)
+    for answer, word in zip(answers[:2], ["delta", "kappa"]):
+        assert TEXT[answer["start"]:answer["end"]] == word
+        chunk = answer["chunk"]
+        assert (chunk["start"], chunk["end"]) == windows[chunk["index"]]
+        assert chunk["start"] <= answer["start"] < answer["end"] <= chunk["end"]
+    # "delta" is in two overlapping windows; the stub scores it higher where it starts later in the window
+    delta_windows = [index for index, (start, end) in enumerate(windows) if "delta" in TEXT[start:end]]
+    assert answers[0]["chunk"]["index"] == delta_windows[0]
+    assert answers[2]["answer"] == "" and answers[2]["score"] == pytest.approx(0.01)
+
+
+def test_with_a_passage_index_only_retrieved_windows_are_read(app_module, qa_pipeline, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "QA_TOP_K", 1)
+    index = app_module.PassageIndex.build(TEXT)
+
+    answers = app_module.answer_questions(["Where is kappa?", "Where is alpha?"], TEXT, index=index)
+
+    assert [len(batch) for batch in qa_pipeline.batches] == [2]
+    assert [TEXT[answer["start"]:answer["end"]] for answer in answers] == ["kappa", "alpha"]
+
+
+def test_no_questions_do_not_run_the_model(app_module, qa_pipeline):
+    assert app_module.answer_questions([], TEXT) == []
+    assert qa_pipeline.batches == []
@@ -0,0 +1,36 @@
+import io
+
+
+def compare(client, first, second, name):
+    return client.post("/comparefile", data={
+        "file1": (io.BytesIO(first), name),
+        "file2": (io.BytesIO(second), name),
+    })
+
+
+def test_compare_sees_changes_that_text_extraction_drops(client):
+    csv_diff = compare(client, b"id,a,b\n1,,3\n", b"id,a,b\n1,3,\n", "table.csv").get_json()
+    html_diff = compare(client, b"<p>Hello</p>\n", b"<p>Hello</p>\n<script>track()</script>\n", "page.html").get_json()
+
+    assert "-1,,3" in csv_diff["comparison_result"] and "+1,3," in csv_diff["comparison_result"]
+    assert "+<script>track()</script>" in html_diff["comparison_result"]
+
+
+def test_encode_by_document_id_matches_encoding_the_upload(client):
+    content = b'{"name": "docgpt", "tags": ["a", "b"]}\n'
+    uploaded = client.post("/encode", data={"method": "base64", "document_file": (io.BytesIO(content), "data.json")}).get_json()
+    document_id = compare(client, content, content, "data.json").get_json()["document_id1"]
+
+    by_id = client.post("/encode", data={"method": "base64", "document_id": document_id}).get_json()
+
+    assert by_id["result"] == uploaded["result"]
+
+
+def test_extracted_text_id_is_refused_for_encoding(client):
+    content = b"<root><item>value</item></root>"
+    searched = client.post("/search", data={"query": "value", "document_file": (io.BytesIO(content), "data.xml")}).get_json()
+
+    response = client.post("/encode", data={"method": "base64", "document_id": searched["document_id"]})
+
+    assert response.status_code == 400
+    assert "upload the file itself" in response.get_json()["error"]
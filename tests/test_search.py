@@ -0,0 +1,42 @@
+import io
+
+
+def search(client, content, query, name="story.txt"):
+    return client.post("/search", data={"query": query, "document_file": (io.BytesIO(content), name)}).get_json()
+
+
+def test_snippet_is_the_original_text_with_whitespace_collapsed(client, app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "SEARCH_SNIPPET_CHARS", 22)
+    content = b"Once upon a time, the quick brown fox jumped over the lazy dog.\n\nThe quick fox ran away, far away."
+
+    result = search(client, content, "lazy dog")
+
+    assert result["hits"][0]["text"] == "lazy dog"
+    assert result["hits"][0]["snippet"] == "fox jumped over the lazy dog. The quick fox ran"
+
+
+def test_phrase_and_keyword_hits(client):
+    content = b"alpha beta gamma. beta alpha. alpha beta!"
+
+    phrase = search(client, content, "alpha beta")
+    keywords = client.post("/search", data={"query": "gamma", "mode": "keywords", "document_file": (io.BytesIO(content), "story.txt")}).get_json()
+
+    assert [hit["start"] for hit in phrase["hits"]] == [0, 30]
+    assert phrase["total_hits"] == 2
+    assert [hit["text"] for hit in keywords["hits"]] == ["gamma"]
+
+
+def test_hits_are_read_without_loading_the_whole_text(client, app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "SEARCH_SNIPPET_CHARS", 12)
+    content = b"filler words here. " * 50 + b"the needle sits near the end of the story."
+    search(client, content, "needle")
+
+    def whole_text(document):
+        raise AssertionError("search read the whole document")
+
+    monkeypatch.setattr(app_module.Document, "text", property(whole_text))
+    app_module._document_indexes.clear()
+    result = search(client, content, "needle")
+
+    assert result["hits"][0]["text"] == "needle"
+    assert result["hits"][0]["snippet"] == "here. the needle sits near"
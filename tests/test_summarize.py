@@ -0,0 +1,64 @@
+import io
+
+
+def test_upload_and_summarize_share_the_result_cache(app_module, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "summarize_text", lambda text, num_sentences, method: calls.append(text) or "summary")
+    content = b"A document that is summarized once and then served from the cache.\n"
+
+    first = client.post("/summarize", data={"document_file": (io.BytesIO(content), "notes.txt"), "num_sentences": "3"}).get_json()
+    second = client.post("/upload", data={"file": (io.BytesIO(content), "notes.txt"), "summary_length": "3"}).get_json()
+
+    assert first == second == {"summary": "summary", "document_id": first["document_id"]}
+    assert len(calls) == 1
+
+
+def sentences(text):
+    return [sentence.strip() + "." for sentence in text.split(".") if sentence.strip()]
+
+
+def test_sections_cut_at_line_or_sentence_ends(app_module):
+    text = "First line of text.\nSecond line. Third sentence goes on. Fourth sentence here.\n" * 5
+
+    sections = app_module.split_into_sections(text, 50)
+
+    assert "".join(sections) == text
+    assert all(len(section) <= 50 for section in sections)
+    assert all(section.endswith(("\n", ".")) for section in sections)
+
+
+def test_hierarchical_summary_summarizes_the_section_summaries(app_module, monkeypatch):
+    calls = []
+
+    def summarize_lsa(text, num_sentences=5):
+        calls.append(text)
+        return " ".join(sentences(text)[:num_sentences])
+
+    monkeypatch.setattr(app_module, "summarize_lsa", summarize_lsa)
+    monkeypatch.setitem(app_module.app.config, "SUMMARY_SECTION_CHARS", 200)
+    monkeypatch.setitem(app_module.app.config, "SUMMARY_LSA_MAX_CHARS", 150)
+    text = "".join(f"Section {i} sentence {j}.\n" for i in range(6) for j in range(10))
+
+    summary = app_module.summarize_hierarchical(text, num_sentences=2)
+
+    sections = app_module.split_into_sections(text, 200)
+    section_summaries = [" ".join(sentences(section)[:2]) for section in sections]
+    assert sorted(calls[:len(sections)]) == sorted(sections)
+    # The section summaries are still longer than SUMMARY_LSA_MAX_CHARS, so they are summarized in sections again
+    combined = " ".join(section_summaries)
+    assert len(combined) > 150 and calls[len(sections)] in combined
+    assert summary == " ".join(sentences(calls[-1])[:2])
+    assert summary.startswith("Section 0 sentence 0.")
+
+
+def test_hierarchical_summary_stops_when_summaries_do_not_shrink(app_module, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "summarize_lsa", lambda text, num_sentences=5: calls.append(text) or text)
+    monkeypatch.setitem(app_module.app.config, "SUMMARY_SECTION_CHARS", 20)
+    monkeypatch.setitem(app_module.app.config, "SUMMARY_LSA_MAX_CHARS", 10)
+    text = "One sentence.\n" * 10
+
+    summary = app_module.summarize_hierarchical(text, num_sentences=1)
+
+    assert summary == calls[-1]
+    assert len(calls) == len(app_module.split_into_sections(text, 20)) + 1
@@ -0,0 +1,24 @@
+import io
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16"])
+def test_json_text_is_the_same_in_every_encoding(app_module, encoding):
+    records = [{"id": i, "title": f"Café {i}", "draft": i % 2 == 0, "note": None} for i in range(3000)]
+    data = json.dumps({"records": records}).encode(encoding)
+
+    text = "".join(app_module.extract_json_text(io.BytesIO(data)))
+
+    lines = text.splitlines()
+    assert lines[:4] == ["id: 0", "title: Café 0", "draft: true", "id: 1"]
+    assert len(lines) == 3 * len(records)
+
+
+def test_xml_and_html_keep_only_text(app_module):
+    xml = b'<?xml version="1.0" encoding="ISO-8859-1"?><r a="1"><t>caf\xe9</t>tail<x>deep</x></r>'
+    html = b"<html><head><style>p {}</style></head><body><p>Hi &amp; bye</p><script>x()</script></body></html>"
+
+    assert "".join(app_module.extract_xml_text(io.BytesIO(xml))) == "café\ntail\ndeep\n"
+    assert "".join(app_module.extract_html_text(io.BytesIO(html))) == "Hi & bye\n"
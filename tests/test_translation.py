@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+
+class RecordingTranslator:
+    """Backend that, like GoogleTranslator, keeps the text on the instance while translating."""
+
+    calls = []
+    lock = threading.Lock()
+
+    def __init__(self, source, target):
+        self.target = target
+        self._text = None
+
+    def translate(self, text):
+        self._text = text
+        time.sleep(0.001)
+        with self.lock:
+            self.calls.append(text)
+        return f"[{self.target}] {self._text.upper()}"
+
+
+@pytest.fixture
+def recording_backend(app_module):
+    app_module.register_translation_backend("recording", RecordingTranslator)
+    config = app_module.app.config
+    saved = {key: config[key] for key in ("TRANSLATION_BACKEND", "TRANSLATION_CHUNK_CHARS")}
+    config["TRANSLATION_BACKEND"] = "recording"
+    RecordingTranslator.calls = []
+    app_module._translation_memory.clear()
+    yield RecordingTranslator
+    config.update(saved)
+    app_module._translation_memory.clear()
+
+
+def test_concurrent_chunks_keep_their_own_translation(app_module, recording_backend):
+    app_module.app.config["TRANSLATION_CHUNK_CHARS"] = 30
+    paragraphs = [f"Paragraph number {i} is here." for i in range(40)]
+
+    translated = app_module.translate_text("\n\n".join(paragraphs), "fr")
+
+    assert translated == "\n\n".join(f"[fr] {paragraph.upper()}" for paragraph in paragraphs)
+    assert sorted(recording_backend.calls) == sorted(paragraphs)
+
+
+def test_short_paragraphs_are_packed_into_one_request(app_module, recording_backend):
+    text = "\n\n".join(f"Line {i}." for i in range(300))
+    assert len(text) < app_module.app.config["TRANSLATION_CHUNK_CHARS"]
+
+    translated = app_module.translate_text(text, "de")
+
+    assert len(recording_backend.calls) == 1
+    assert translated == f"[de] {text.upper()}"
+
+
+@pytest.mark.parametrize("max_chars", [1, 7, 40, 4500])
+def test_split_for_translation_round_trips_within_limit(app_module, max_chars):
+    text = "First sentence. Second one!\n\n  \n\nA very long paragraph without any break " * 5 + "\n\ntail"
+
+    chunks = app_module.split_for_translation(text, max_chars)
+
+    assert "".join(chunks) == text
+    assert all(0 < len(chunk) <= max_chars for chunk in chunks)